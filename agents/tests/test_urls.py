@@ -3,6 +3,7 @@ from leads.tests import CRMTestCase
 from agents.views import (
     AgentListView,
     AgentCreateView,
+    AgentAutocompleteView,
     AgentDetailView,
     AgentUpdateView,
     AgentDeleteView,
@@ -18,6 +19,10 @@ class TestUrls(CRMTestCase):
         url = reverse("agents:agent-create")
         self.assertEqual(resolve(url).func.view_class, AgentCreateView)
 
+    def test_agent_autocomplete_url_resolves(self):
+        url = reverse("agents:agent-autocomplete")
+        self.assertEqual(resolve(url).func.view_class, AgentAutocompleteView)
+
     def test_agent_detail_url_resolves(self):
         url = reverse("agents:agent-detail", args=[self.default_agent.pk])
         self.assertEqual(resolve(url).func.view_class, AgentDetailView)
@@ -1,6 +1,7 @@
+from django.core import mail
 from django.urls import reverse
 from leads.tests import ViewTestCase
-from leads.models import Agent, User
+from leads.models import Agent, QueuedEmail, User
 
 
 class TestAgentListView(ViewTestCase):
@@ -47,6 +48,25 @@ class TestAgentListView(ViewTestCase):
         self.assert_unauthenticated_users_get_redirected_to(url, redirect_url)
 
 
+class TestAgentAutocompleteView(ViewTestCase):
+    def test_returns_matching_agents_as_json(self):
+        response = self.client.get(reverse("agents:agent-autocomplete"), {"q": "age"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {"results": [{"id": self.default_agent.pk, "text": "agentuser"}]},
+        )
+
+    def test_agents_get_redirected(self):
+        self.client.login(username="agentuser", password="testpass")
+        self.default_agent.user.is_organiser = False
+        self.default_agent.user.save()
+        response = self.client.get(reverse("agents:agent-autocomplete"))
+        self.assertRedirects(
+            response, reverse("leads:lead-list"), fetch_redirect_response=False
+        )
+
+
 class TestAgentCreateView(ViewTestCase):
     def setUp(self) -> None:
         super().setUp()
@@ -75,6 +95,19 @@ class TestAgentCreateView(ViewTestCase):
         except User.DoesNotExist:
             self.fail("User was not created")
 
+    def test_queues_invite_email_instead_of_sending_it(self):
+        url = reverse("agents:agent-create")
+        data = {
+            "first_name": "New",
+            "last_name": "Agent",
+            "username": "newagent",
+            "email": "newagent@agents.com",
+        }
+        self.client.post(url, data)
+        self.assertEqual(len(mail.outbox), 0)
+        email = QueuedEmail.objects.get()
+        self.assertEqual(email.recipient_list, ["newagent@agents.com"])
+
     def test_redirects_to_agent_list_view(self):
         url = reverse("agents:agent-create")
         data = {
@@ -187,6 +220,25 @@ class TestAgentUpdateView(ViewTestCase):
         self.assert_unauthenticated_users_get_redirected_to(url, redirect_url)
 
 
+class TestAgentsOfOtherOrganisations(ViewTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        other_user = User.objects.create_user(username="otheruser", password="testpass")
+        self.other_agent = Agent.objects.create(
+            user=User.objects.create_user(username="otheragent", password="testpass"),
+            organisation=other_user.userprofile,
+        )
+
+    def test_cannot_be_updated(self):
+        url = reverse("agents:agent-update", kwargs={"pk": self.other_agent.pk})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_cannot_be_deleted(self):
+        url = reverse("agents:agent-delete", kwargs={"pk": self.other_agent.pk})
+        self.assertEqual(self.client.post(url).status_code, 404)
+        self.assertTrue(Agent.objects.filter(pk=self.other_agent.pk).exists())
+
+
 class TestAgentDeleteView(ViewTestCase):
     def setUp(self) -> None:
         super().setUp()
@@ -2,6 +2,7 @@ from django.urls import path
 from .views import (
     AgentListView,
     AgentCreateView,
+    AgentAutocompleteView,
     AgentDetailView,
     AgentUpdateView,
     AgentDeleteView,
@@ -12,6 +13,7 @@ app_name = "agents"
 urlpatterns = [
     path("", AgentListView.as_view(), name="agent-list"),
     path("create/", AgentCreateView.as_view(), name="agent-create"),
+    path("autocomplete/", AgentAutocompleteView.as_view(), name="agent-autocomplete"),
     path("<int:pk>/", AgentDetailView.as_view(), name="agent-detail"),
     path("<int:pk>/update/", AgentUpdateView.as_view(), name="agent-update"),
     path("<int:pk>/delete/", AgentDeleteView.as_view(), name="agent-delete"),
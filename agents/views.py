@@ -1,7 +1,8 @@
 import random
 from typing import Any, Dict
 
-from django.core.mail import send_mail
+from django.db import transaction
+from django.http import JsonResponse
 from django.urls import reverse
 from django.views.generic import (
     CreateView,
@@ -9,24 +10,37 @@ from django.views.generic import (
     DetailView,
     ListView,
     UpdateView,
+    View,
 )
 
+from leads.autocomplete import autocomplete_agents
 from leads.models import Agent
+from leads.outbox import queue_mail
+from leads.replicas import PrimaryPinMixin, ReplicaReadMixin
 
 from .forms import AgentModelForm
 from .mixins import OrganisorAndLoginRequiredMixin
 
 
-class AgentListView(OrganisorAndLoginRequiredMixin, ListView):
+class AgentListView(OrganisorAndLoginRequiredMixin, ReplicaReadMixin, ListView):
     template_name = "agents/agent_list.html"
     context_object_name = "agents"
 
     def get_queryset(self):
-        organisation = self.request.user.userprofile
-        return Agent.objects.filter(organisation=organisation)
+        return Agent.objects.for_user(
+            self.request.user, self.request.organisation
+        ).select_related("user")
 
 
-class AgentCreateView(OrganisorAndLoginRequiredMixin, CreateView):
+class AgentAutocompleteView(OrganisorAndLoginRequiredMixin, View):
+    """JSON typeahead of the agents whose username starts with `q`."""
+
+    def get(self, request, *args, **kwargs):
+        results = autocomplete_agents(request.organisation, request.GET.get("q", ""))
+        return JsonResponse({"results": results})
+
+
+class AgentCreateView(OrganisorAndLoginRequiredMixin, PrimaryPinMixin, CreateView):
     template_name = "agents/agent_create.html"
     form_class = AgentModelForm
 
@@ -38,50 +52,58 @@ class AgentCreateView(OrganisorAndLoginRequiredMixin, CreateView):
         user.is_agent = True
         user.is_organiser = False
         user.set_password(f"{random.randint(0, 1000000)}")
-        user.save()
-        Agent.objects.create(user=user, organisation=self.request.user.userprofile)
-        send_mail(
-            subject="You are invited to be an agent",
-            message="You were added as an agent on DJCRM. Please come login to start working.",
-            from_email="admin@test.com",
-            recipient_list=[user.email],
-        )
+        with transaction.atomic():
+            user.save()
+            Agent.objects.create(user=user, organisation=self.request.organisation)
+            queue_mail(
+                subject="You are invited to be an agent",
+                message="You were added as an agent on DJCRM. Please come login to start working.",
+                from_email="admin@test.com",
+                recipient_list=[user.email],
+            )
         return super().form_valid(form)
 
 
-class AgentDetailView(OrganisorAndLoginRequiredMixin, DetailView):
+class AgentDetailView(OrganisorAndLoginRequiredMixin, ReplicaReadMixin, DetailView):
     template_name = "agents/agent_detail.html"
     context_object_name = "agent"
 
     def get_queryset(self):
-        organisation = self.request.user.userprofile
-        return Agent.objects.filter(organisation=organisation)
+        return Agent.objects.for_user(
+            self.request.user, self.request.organisation
+        ).select_related("user")
 
 
-class AgentUpdateView(OrganisorAndLoginRequiredMixin, UpdateView):
+class AgentUpdateView(OrganisorAndLoginRequiredMixin, PrimaryPinMixin, UpdateView):
     template_name = "agents/agent_update.html"
     form_class = AgentModelForm
-    queryset = Agent.objects.all()
     context_object_name = "user"
+    agent = None
+
+    def get_queryset(self):
+        return Agent.objects.for_user(
+            self.request.user, self.request.organisation
+        ).select_related("user")
 
     def get_object(self, queryset=None) -> Any:
-        agent = super().get_object(queryset=queryset)
-        return agent.user
+        self.agent = super().get_object(queryset=queryset)
+        return self.agent.user
 
     def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        context["agent"] = Agent.objects.get(user=self.object)
+        context["agent"] = self.agent
         return context
 
     def get_success_url(self):
-        agent = Agent.objects.get(user=self.object)
-        return reverse("agents:agent-detail", kwargs={"pk": agent.pk})
+        return reverse("agents:agent-detail", kwargs={"pk": self.agent.pk})
 
 
-class AgentDeleteView(OrganisorAndLoginRequiredMixin, DeleteView):
+class AgentDeleteView(OrganisorAndLoginRequiredMixin, PrimaryPinMixin, DeleteView):
     template_name = "agents/agent_delete.html"
-    queryset = Agent.objects.all()
     context_object_name = "agent"
 
+    def get_queryset(self):
+        return Agent.objects.for_user(self.request.user, self.request.organisation)
+
     def get_success_url(self):
         return reverse("agents:agent-list")
@@ -0,0 +1,112 @@
+"""PostgreSQL backend that borrows its connections from a client-side pool.
+
+Django opens a connection when a request first needs one and closes it when
+the request ends (CONN_MAX_AGE = 0). With this backend those connects and
+closes only take a connection from a per-process psycopg2 pool and put it
+back, so short views skip the TCP, TLS and authentication handshakes.
+
+The pool is configured by the `POOL` key of the database settings:
+- MIN_SIZE: connections opened up front; psycopg2 keeps at most this many
+  idle connections and closes the others when they are put back.
+- MAX_SIZE: the most connections open at once.
+- TIMEOUT: seconds to wait for a free connection before failing.
+"""
+import threading
+
+import psycopg2
+from psycopg2 import pool as psycopg2_pool
+from django.db.backends.postgresql import base
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """A thread-safe pool that waits up to `timeout` for a free connection.
+
+    psycopg2's own pool fails straight away once `max_size` connections are
+    out; the semaphore makes callers queue instead.
+    """
+
+    def __init__(self, min_size, max_size, timeout, **conn_params):
+        self.pool = psycopg2_pool.ThreadedConnectionPool(
+            min_size, max_size, **conn_params
+        )
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.timeout = timeout
+
+    def getconn(self):
+        # released by putconn
+        # pylint: disable-next=consider-using-with
+        if not self.slots.acquire(timeout=self.timeout):
+            raise psycopg2.OperationalError(
+                f"No database connection became free within {self.timeout}s."
+            )
+        try:
+            connection = self.pool.getconn()
+            if connection.closed:
+                # dropped by the server while idle in the pool
+                self.pool.putconn(connection, close=True)
+                connection = self.pool.getconn()
+        except BaseException:
+            self.slots.release()
+            raise
+        return connection
+
+    def putconn(self, connection, close=False):
+        # psycopg2 rolls back any open transaction before pooling it
+        try:
+            self.pool.putconn(connection, close=close or bool(connection.closed))
+        finally:
+            self.slots.release()
+
+
+def get_pool(alias, options, conn_params):
+    # keyed by the connection parameters too, since the test runner points
+    # the same alias at another database
+    key = (alias, repr(sorted(conn_params.items())))
+    with pools_lock:
+        if key not in pools:
+            pools[key] = ConnectionPool(
+                options.get("MIN_SIZE", 1),
+                options.get("MAX_SIZE", 10),
+                options.get("TIMEOUT", 10.0),
+                **conn_params,
+            )
+        return pools[key]
+
+
+class PooledDatabase:
+    """Stands in for the psycopg2 module, connecting through a pool."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def connect(self, **conn_params):  # pylint: disable=unused-argument
+        return self.pool.getconn()
+
+    def __getattr__(self, name):
+        return getattr(psycopg2, name)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        self.pool = get_pool(
+            self.alias, self.settings_dict.get("POOL", {}), conn_params
+        )
+        # the parent sets the connection up as usual around our connect()
+        self.Database = PooledDatabase(self.pool)  # pylint: disable=invalid-name
+        try:
+            return super().get_new_connection(conn_params)
+        finally:
+            del self.Database
+
+    def _close(self):
+        if self.connection is None or self.pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            # a connection that failed its usability check isn't pooled again
+            self.pool.putconn(self.connection, close=self.errors_occurred)
+        return None
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 
-from .models import User, Lead, Agent, UserProfile, Category
+from .models import User, Lead, Agent, UserProfile, Category, QueuedEmail
 
 
 admin.site.register(User)
@@ -9,3 +9,4 @@ admin.site.register(UserProfile)
 admin.site.register(Lead)
 admin.site.register(Agent)
 admin.site.register(Category)
+admin.site.register(QueuedEmail)
@@ -1,6 +1,36 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+
+from .search import install_search_index
+from .sqlite import configure_sqlite_signal
+
+
+def install_search_index_after_migrate(using, **kwargs):
+    # only SQLite's table rebuilds drop the triggers; PostgreSQL's index is
+    # left alone, as reinstalling it would lock and scan leads_lead
+    connection = connections[using]
+    if connection.vendor == "sqlite":
+        install_search_index(connection)
 
 
 class LeadsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "leads"
+
+    def ready(self):
+        # imported here since it needs the models, which aren't loaded yet above
+        # pylint: disable=import-outside-toplevel
+        from .autocomplete import invalidate_autocomplete_signal, rename_agent_signal
+        from .events import publish_lead_deleted_signal, publish_lead_saved_signal
+        from .models import Agent, Lead, User
+
+        connection_created.connect(configure_sqlite_signal)
+        post_migrate.connect(install_search_index_after_migrate, sender=self)
+        for model in (Lead, Agent):
+            post_save.connect(invalidate_autocomplete_signal, sender=model)
+            post_delete.connect(invalidate_autocomplete_signal, sender=model)
+        post_save.connect(rename_agent_signal, sender=User)
+        post_save.connect(publish_lead_saved_signal, sender=Lead)
+        post_delete.connect(publish_lead_deleted_signal, sender=Lead)
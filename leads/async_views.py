@@ -0,0 +1,182 @@
+"""Async variants of the busiest read-only views, for ASGI deployments.
+
+They reuse the querysets, validators and templates of their sync
+counterparts in `leads.views` but run every query through the async ORM, so
+one ASGI worker can wait on many slow clients at once. Only loading the
+session and user still goes through `sync_to_async`, as Django 4.2 has no
+async API for them. Everything a template needs is fetched before it is
+rendered, except what a cached fragment makes unnecessary.
+
+`ASYNC_VIEWS = True` puts them behind the usual URLs; see `leads/urls.py`.
+`LeadEventStreamView` only runs async and always needs ASGI, and
+`LEAD_EVENTS_ENABLED`.
+"""
+# the views override sync handlers with async ones and set what their sync
+# get() would have set
+# pylint: disable=invalid-overridden-method,attribute-defined-outside-init
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.views.generic import View
+
+from . import events
+from .conditional import aconditional_response
+from .middleware import aget_organisation
+from .models import Agent
+from .replicas import is_pinned_to_primary, use_replica
+from .views import (
+    CategoryDetailView,
+    CategoryListView,
+    LeadDetailView,
+    LeadListView,
+)
+
+
+async def aget_user(request):
+    """`request.user`, loaded along with the session off the event loop."""
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+class AsyncReadViewMixin:
+    """Async `dispatch` for a read-only view of `leads.views`.
+
+    It stands in for `LoginRequiredMixin` and `ReplicaReadMixin`, whose
+    `dispatch` would touch the database on the event loop.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await aget_user(request)
+        if not user.is_authenticated:
+            return self.handle_no_permission()
+        await aget_organisation(request)
+        method = request.method.lower()
+        if method not in self.http_method_names or not hasattr(self, method):
+            return await self.http_method_not_allowed(request, *args, **kwargs)
+        handler = getattr(self, method)
+        if is_pinned_to_primary(request):
+            return await handler(request, *args, **kwargs)
+        with use_replica():
+            return await handler(request, *args, **kwargs)
+
+    async def aget_object(self):
+        queryset = self.get_queryset()
+        try:
+            return await queryset.aget(pk=self.kwargs[self.pk_url_kwarg])
+        except queryset.model.DoesNotExist as error:
+            raise Http404(
+                f"No {queryset.model._meta.verbose_name} found matching the query"
+            ) from error
+
+
+class AsyncLeadListView(AsyncReadViewMixin, LeadListView):
+    async def get(self, request, *args, **kwargs):
+        return await aconditional_response(
+            request, self.get_etag(), self.get_last_modified(), self.render_page
+        )
+
+    async def render_page(self):
+        self.object_list = self.get_queryset()
+        context = self.get_context_data()
+        if not await self.ahas_cached_fragment("lead_list"):
+            await context["page_obj"].afetch()
+            if "unassigned_leads" in context:
+                context["unassigned_leads"] = [
+                    lead async for lead in context["unassigned_leads"]
+                ]
+        return self.render_to_response(context)
+
+
+class AsyncLeadDetailView(AsyncReadViewMixin, LeadDetailView):
+    async def get(self, request, *args, **kwargs):
+        self.validators = await self.get_validators_queryset().afirst()
+        return await aconditional_response(
+            request, self.get_etag(), self.get_last_modified(), self.render_object
+        )
+
+    async def render_object(self):
+        self.object = await self.aget_object()
+        context = self.get_context_data(object=self.object)
+        await context["events"].afetch()
+        return self.render_to_response(context)
+
+
+class AsyncCategoryListView(AsyncReadViewMixin, CategoryListView):
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        context = self.get_context_data()
+        if not await self.ahas_cached_fragment("category_list"):
+            context["categories"] = [category async for category in self.object_list]
+        return self.render_to_response(context)
+
+
+class AsyncCategoryDetailView(AsyncReadViewMixin, CategoryDetailView):
+    async def get(self, request, *args, **kwargs):
+        return await aconditional_response(
+            request, self.get_etag(), self.get_last_modified(), self.render_object
+        )
+
+    async def render_object(self):
+        self.object = await self.aget_object()
+        context = self.get_context_data(object=self.object)
+        context["leads"] = [lead async for lead in context["leads"]]
+        return self.render_to_response(context)
+
+
+class LeadEventStreamView(AsyncReadViewMixin, LoginRequiredMixin, View):
+    """Server-sent events for the leads the user's lead list shows.
+
+    Each event is named after its type (created, assigned, updated or
+    deleted) and carries the lead as JSON. `listed` says whether the lead
+    now belongs in the user's table of assigned leads, so the page can add,
+    replace or remove its row without reloading.
+
+    Under WSGI Django would collect the endless stream into a list and hold
+    the worker forever, so it answers 204 instead, which stops EventSource
+    from reconnecting.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        if not settings.LEAD_EVENTS_ENABLED or not isinstance(request, ASGIRequest):
+            return HttpResponse(status=204)
+        agent_id = None
+        if not request.user.is_organiser:
+            agent_id = await (
+                Agent.objects.filter(user_id=request.user.pk)
+                .values_list("pk", flat=True)
+                .afirst()
+            )
+        return StreamingHttpResponse(
+            self.stream(request.organisation.pk, agent_id),
+            content_type="text/event-stream",
+            # proxies mustn't hold the events back
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    async def stream(self, organisation_id, agent_id):
+        subscription = events.broker.subscribe(
+            organisation_id, settings.LEAD_EVENTS_HEARTBEAT
+        )
+        try:
+            yield "retry: 5000\n\n"
+            async for event in subscription:
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                lead = event["lead"]
+                if agent_id is None:
+                    listed = lead["agent_id"] is not None
+                elif agent_id in (lead["agent_id"], event["previous_agent_id"]):
+                    listed = lead["agent_id"] == agent_id
+                else:
+                    continue
+                data = json.dumps(
+                    {**event, "listed": listed and event["type"] != "deleted"}
+                )
+                yield f"event: {event['type']}\ndata: {data}\n\n"
+        finally:
+            subscription.close()
@@ -0,0 +1,138 @@
+"""Prefix autocomplete for leads and agents.
+
+Lookups run against the normalised `lookup_*` columns, which are indexed per
+organisation for `LIKE 'prefix%'`. Results for hot prefixes are kept in a
+small in-process LRU; any write to an organisation's leads or agents moves it
+to a new generation, so its cached results are never served again.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+from django.urls import reverse
+
+from .models import Agent, Lead, normalise_lookup
+
+
+class PrefixCache:
+    """A thread-safe LRU of autocomplete results, keyed per organisation.
+
+    Entries also expire after `timeout` seconds, which bounds how stale a
+    result can be when another process wrote to the organisation.
+    """
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.lock = threading.Lock()
+
+    def make_key(self, organisation_id, *parts):
+        return (organisation_id, self.generations.get(organisation_id, 0), *parts)
+
+    def get(self, organisation_id, *parts):
+        with self.lock:
+            key = self.make_key(organisation_id, *parts)
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, organisation_id, *parts, value):
+        with self.lock:
+            key = self.make_key(organisation_id, *parts)
+            self.entries[key] = (time.monotonic() + self.timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, organisation_id):
+        # old generation entries can't be hit any more and age out of the LRU
+        with self.lock:
+            self.generations[organisation_id] = (
+                self.generations.get(organisation_id, 0) + 1
+            )
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generations.clear()
+
+
+prefix_cache = PrefixCache(
+    maxsize=settings.AUTOCOMPLETE_CACHE_SIZE,
+    timeout=settings.AUTOCOMPLETE_CACHE_TIMEOUT,
+)
+
+
+def autocomplete_leads(user, organisation, prefix, limit=10):
+    """Leads `user` may see whose name or email starts with `prefix`."""
+    prefix = normalise_lookup(prefix)
+    if not prefix:
+        return []
+    # agents only see their own leads, so they get their own entries
+    scope = None if user.is_organiser else user.pk
+    results = prefix_cache.get(organisation.pk, "lead", scope, prefix, limit)
+    if results is None:
+        leads = (
+            Lead.objects.for_user(user, organisation)
+            .filter(
+                Q(lookup_name__startswith=prefix) | Q(lookup_email__startswith=prefix)
+            )
+            .only("first_name", "last_name", "email")
+            .order_by("lookup_name", "id")[:limit]
+        )
+        results = [
+            {
+                "id": lead.pk,
+                "text": str(lead),
+                "email": lead.email,
+                "url": reverse("leads:lead-detail", kwargs={"pk": lead.pk}),
+            }
+            for lead in leads
+        ]
+        prefix_cache.set(organisation.pk, "lead", scope, prefix, limit, value=results)
+    return results
+
+
+def autocomplete_agents(organisation, prefix, limit=10):
+    """Agents of `organisation` whose username starts with `prefix`."""
+    prefix = normalise_lookup(prefix)
+    results = prefix_cache.get(organisation.pk, "agent", prefix, limit)
+    if results is None:
+        agents = Agent.objects.filter(organisation=organisation)
+        if prefix:
+            agents = agents.filter(lookup_name__startswith=prefix)
+        results = [
+            {"id": agent.pk, "text": agent.user.username}
+            for agent in agents.select_related("user")
+            .only("user__username")
+            .order_by("lookup_name", "id")[:limit]
+        ]
+        prefix_cache.set(organisation.pk, "agent", prefix, limit, value=results)
+    return results
+
+
+def invalidate_autocomplete_signal(instance, **kwargs):
+    prefix_cache.invalidate(instance.organisation_id)
+
+
+def rename_agent_signal(instance, created, update_fields, **kwargs):
+    # keep the agent autocomplete key in step with renames; update() skips
+    # the agents' own signals
+    if created or (update_fields is not None and "username" not in update_fields):
+        return
+    agents = Agent.objects.filter(user=instance)
+    organisation_ids = list(agents.values_list("organisation_id", flat=True))
+    if organisation_ids:
+        agents.update(lookup_name=normalise_lookup(instance.username))
+    for organisation_id in organisation_ids:
+        prefix_cache.invalidate(organisation_id)
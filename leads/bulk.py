@@ -0,0 +1,124 @@
+"""Reassign or recategorise many leads at once, one `UPDATE` per chunk."""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, When
+
+from .autocomplete import prefix_cache
+from .events import publish_lead_events
+from .models import (
+    Category,
+    LeadEvent,
+    UserProfile,
+    adjust_agent_lead_counts,
+    bump_cache_version,
+)
+from .timeline import KIND_FIELDS, describe, record
+
+
+def bulk_update_leads(leads, organisation, changes, chunk_size=1000, actor=""):
+    """Set the `changes` (`agent` and/or `category`) on every lead of `leads`.
+
+    `leads` is narrowed to `organisation` first. Each chunk of `chunk_size`
+    leads is locked and updated in its own short transaction, with the same
+    handful of queries whatever its size. The timeline events name `actor`.
+    Returns the number of leads updated.
+    """
+    leads = leads.filter(organisation=organisation).order_by("pk")
+    updated = last_pk = 0
+    while True:
+        with transaction.atomic():
+            pks = list(
+                leads.filter(pk__gt=last_pk)
+                .select_for_update()
+                .values_list("pk", flat=True)[:chunk_size]
+            )
+            if not pks:
+                break
+            updated += update_chunk(
+                leads.filter(pk__in=pks), organisation, changes, actor
+            )
+        last_pk = pks[-1]
+    if updated:
+        prefix_cache.invalidate(organisation.pk)
+    return updated
+
+
+def get_deltas(counts, target_id):
+    """How a move to `target_id` changes the counters of the current values."""
+    deltas = defaultdict(int)
+    for current_id, total in counts.items():
+        if current_id != target_id:
+            deltas[current_id] -= total
+            deltas[target_id] += total
+    return deltas
+
+
+def read_moves(chunk, changes, actor):
+    """How many of the chunk's leads have each current agent and category,
+    the timeline events of the leads that `changes` moves and their
+    `(event_type, pk, previous_agent_id)` lead events.
+
+    The current values are read by id for the counters and the lead events
+    and by name for the timeline, in one query.
+    """
+    fields = [name for name in ("category", "agent") if name in changes]
+    counts = {name: defaultdict(int) for name in fields}
+    events, moves = [], []
+    if not fields:
+        return counts, events, moves
+    for pk, category_id, category, agent_id, agent in chunk.values_list(
+        "pk", "category_id", "category__name", "agent_id", "agent__user__username"
+    ):
+        current = {"category": (category_id, category), "agent": (agent_id, agent)}
+        for name in fields:
+            counts[name][current[name][0]] += 1
+        moved = [
+            name
+            for name in fields
+            if current[name][0] != getattr(changes[name], "pk", None)
+        ]
+        for name in moved:
+            events.append(
+                LeadEvent(
+                    lead_id=pk,
+                    kind=KIND_FIELDS[name],
+                    actor=actor,
+                    changes={
+                        name: [describe(current[name][1]), describe(changes[name])]
+                    },
+                )
+            )
+        if moved:
+            moves.append(("assigned" if "agent" in moved else "updated", pk, agent_id))
+    return counts, events, moves
+
+
+def update_chunk(chunk, organisation, changes, actor=""):
+    counts, events, moves = read_moves(chunk, changes, actor)
+    updated = chunk.update_and_touch(**changes)
+
+    # the leads stay in the organisation, so only the per-category and
+    # per-agent counters move, with one update for each kind of counter
+    if "category" in changes:
+        deltas = get_deltas(
+            counts["category"], getattr(changes["category"], "pk", None)
+        )
+        uncategorised = deltas.pop(None, 0)
+        if deltas:
+            Category.objects.filter(pk__in=deltas).update(
+                lead_count=F("lead_count")
+                + Case(*(When(pk=pk, then=delta) for pk, delta in deltas.items()))
+            )
+        if uncategorised:
+            UserProfile.objects.filter(pk=organisation.pk).update(
+                uncategorised_lead_count=F("uncategorised_lead_count") + uncategorised
+            )
+    if "agent" in changes:
+        adjust_agent_lead_counts(
+            get_deltas(counts["agent"], getattr(changes["agent"], "pk", None))
+        )
+    record(events)
+    bump_cache_version(organisation.pk)
+    publish_lead_events(organisation.pk, moves)
+    return updated
@@ -0,0 +1,144 @@
+"""A two-tier cache backend: an in-process LRU in front of a shared cache.
+
+Reads are served from a per-process `LocMemCache` when possible and fall back
+to the shared cache alias named by `LOCATION`; writes go to both. Another
+process's local tier only learns about a write or delete once its copy
+expires after `LOCAL_TIMEOUT`, so this tier is meant for values whose keys
+change when they do, such as the versioned template fragments.
+
+Hits and misses are counted per process and added to counters in the shared
+cache every `STATS_FLUSH_EVERY` lookups, so `manage.py cache_stats` can report
+them for all processes.
+"""
+import threading
+from collections import Counter
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+STATS = ("local_hits", "shared_hits", "misses")
+
+_missing = object()
+_pending_stats = {}
+_stats_lock = threading.Lock()
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.shared_alias = location
+        self.local_timeout = options.get("LOCAL_TIMEOUT", 30)
+        self.stats_flush_every = options.get("STATS_FLUSH_EVERY", 100)
+        # LocMemCache keeps its entries per name, shared by every thread
+        self.local = LocMemCache(
+            f"two-tier:{location}",
+            {
+                "TIMEOUT": self.local_timeout,
+                "OPTIONS": {"MAX_ENTRIES": options.get("LOCAL_MAX_ENTRIES", 1000)},
+            },
+        )
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def get_local_timeout(self, timeout):
+        # never keep a local copy longer than the shared one
+        if timeout is None:
+            return self.local_timeout
+        return max(0, min(self.local_timeout, timeout))
+
+    def get(self, key, default=None, version=None):
+        value = self.local.get(key, _missing, version=version)
+        if value is not _missing:
+            self.record("local_hits")
+            return value
+        value = self.shared.get(key, _missing, version=version)
+        if value is _missing:
+            self.record("misses")
+            return default
+        self.record("shared_hits")
+        self.local.set(key, value, version=version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        self.shared.set(key, value, timeout, version=version)
+        self.local.set(key, value, self.get_local_timeout(timeout), version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self.local.set(key, value, self.get_local_timeout(timeout), version=version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        self.local.delete(key, version=version)
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.local.delete(key, version=version)
+        return self.shared.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        return self.local.has_key(key, version=version) or self.shared.has_key(
+            key, version=version
+        )
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(key, version=version)
+        return self.shared.incr(key, delta, version=version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def record(self, stat):
+        with _stats_lock:
+            pending = _pending_stats.setdefault(self.shared_alias, Counter())
+            pending[stat] += 1
+            if sum(pending.values()) < self.stats_flush_every:
+                return
+            flushed = dict(pending)
+            pending.clear()
+        self.add_stats(flushed)
+
+    def add_stats(self, counts):
+        for stat, count in counts.items():
+            key = self.get_stats_key(stat)
+            self.shared.add(key, 0, None)
+            try:
+                self.shared.incr(key, count)
+            except ValueError:
+                # evicted between add and incr
+                self.shared.set(key, count, None)
+
+    def get_stats_key(self, stat):
+        return f"two-tier-stats:{self.shared_alias}:{stat}"
+
+    def flush_stats(self):
+        """Add this process's not yet flushed counts to the shared counters."""
+        with _stats_lock:
+            flushed = dict(_pending_stats.pop(self.shared_alias, {}))
+        if flushed:
+            self.add_stats(flushed)
+
+    def get_stats(self):
+        """Hit and miss counts of every process, plus the hit rate."""
+        self.flush_stats()
+        keys = {self.get_stats_key(stat): stat for stat in STATS}
+        found = self.shared.get_many(keys)
+        stats = {stat: found.get(key, 0) for key, stat in keys.items()}
+        lookups = sum(stats.values())
+        hits = stats["local_hits"] + stats["shared_hits"]
+        stats["hit_rate"] = hits / lookups if lookups else None
+        return stats
+
+    def reset_stats(self):
+        with _stats_lock:
+            _pending_stats.pop(self.shared_alias, None)
+        self.shared.delete_many([self.get_stats_key(stat) for stat in STATS])
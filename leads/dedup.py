@@ -0,0 +1,125 @@
+"""Find and merge leads that share an email address or phone number.
+
+Leads are matched on their normalised `lookup_email` and `lookup_phone`
+keys, which are indexed per organisation. New leads are checked when they
+are created or imported. `find_duplicate_leads` clusters the duplicates
+already stored and can merge each cluster into its oldest lead.
+"""
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Lead, LeadEvent, normalise_lookup, normalise_phone
+
+# filled in on the lead a cluster is merged into, if it has no value of its own
+MERGED_FIELDS = ("age", "agent_id", "category_id", "description")
+
+
+def lead_keys(lead):
+    """The duplicate keys of `lead`, whose lookup keys must be set."""
+    keys = {("email", lead.lookup_email), ("phone", lead.lookup_phone)}
+    return {key for key in keys if key[1]}
+
+
+def find_duplicate(organisation, email, phone_number, exclude_pk=None):
+    """A lead of `organisation` with the same email or phone number, or `None`."""
+    email, phone = normalise_lookup(email), normalise_phone(phone_number)
+    if not email and not phone:
+        return None
+    matches = Q(lookup_email=email) if email else Q()
+    if phone:
+        matches |= Q(lookup_phone=phone)
+    return (
+        Lead.objects.filter(matches, organisation=organisation)
+        .exclude(pk=exclude_pk)
+        .order_by("pk")
+        .first()
+    )
+
+
+def find_existing_keys(organisation, leads):
+    """The duplicate keys of `leads` the organisation's stored leads already
+    have, from one query for the whole batch."""
+    emails = {lead.lookup_email for lead in leads} - {""}
+    phones = {lead.lookup_phone for lead in leads} - {""}
+    if not emails and not phones:
+        return set()
+    keys = set()
+    for email, phone in Lead.objects.filter(
+        Q(lookup_email__in=emails) | Q(lookup_phone__in=phones),
+        organisation=organisation,
+    ).values_list("lookup_email", "lookup_phone"):
+        keys |= {("email", email), ("phone", phone)}
+    return keys
+
+
+def cluster_duplicates(organisation, chunk_size=2000):
+    """The pks of the organisation's duplicate leads, one sorted list per
+    cluster of leads linked by a shared email or phone number.
+
+    The database groups the leads by key, so only the duplicated ones are
+    read, in a single pass that merges clusters with a union-find.
+    """
+    leads = Lead.objects.filter(organisation=organisation)
+    duplicated = Q()
+    for key in ("lookup_email", "lookup_phone"):
+        keys = (
+            leads.exclude(**{key: ""})
+            .order_by()
+            .values(key)
+            .annotate(total=Count("id"))
+            .filter(total__gt=1)
+            .values(key)
+        )
+        duplicated |= Q(**{f"{key}__in": keys})
+
+    parents = {}
+
+    def find(pk):
+        while parents[pk] != pk:
+            parents[pk] = parents[parents[pk]]
+            pk = parents[pk]
+        return pk
+
+    first_with_key = {}
+    rows = (
+        leads.filter(duplicated)
+        .order_by("pk")
+        .values_list("pk", "lookup_email", "lookup_phone")
+    )
+    for pk, email, phone in rows.iterator(chunk_size=chunk_size):
+        parents[pk] = pk
+        for key in (("email", email), ("phone", phone)):
+            if key[1]:
+                roots = find(pk), find(first_with_key.setdefault(key, pk))
+                # the oldest lead stays the root
+                parents[max(roots)] = min(roots)
+
+    clusters = {}
+    for pk in parents:
+        # in pk order, so each cluster's oldest lead comes first
+        clusters.setdefault(find(pk), []).append(pk)
+    return [pks for pks in clusters.values() if len(pks) > 1]
+
+
+def merge_duplicates(pks):
+    """Merge the leads `pks` into the oldest and delete the others.
+
+    The oldest keeps its own values and takes the first value the others
+    have for each of the `MERGED_FIELDS` it lacks, and its timeline records
+    the merge. Returns the merged lead.
+    """
+    with transaction.atomic():
+        leads = list(Lead.objects.filter(pk__in=pks).select_for_update().order_by("pk"))
+        lead, duplicates = leads[0], leads[1:]
+        for field in MERGED_FIELDS:
+            if getattr(lead, field) in (None, ""):
+                for duplicate in duplicates:
+                    if getattr(duplicate, field) not in (None, ""):
+                        setattr(lead, field, getattr(duplicate, field))
+                        break
+        lead.save()
+        LeadEvent.objects.create(lead=lead, kind=LeadEvent.MERGED)
+        # deleted one by one by the collector, so the signals keep the
+        # counters right
+        Lead.objects.filter(pk__in=[duplicate.pk for duplicate in duplicates]).delete()
+    return lead
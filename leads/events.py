@@ -0,0 +1,232 @@
+"""Publish lead changes to the browsers watching the lead list."""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from .models import Category, Lead
+
+
+class Subscription:
+    """The events of one organisation, as an async iterator for one stream.
+
+    It yields `None` after `heartbeat` seconds without events, so the stream
+    can keep the connection alive.
+    """
+
+    # pylint: disable-next=redefined-outer-name
+    def __init__(self, broker, organisation_id, heartbeat, maxsize):
+        self.broker = broker
+        self.organisation_id = organisation_id
+        self.heartbeat = heartbeat
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await asyncio.wait_for(self.queue.get(), self.heartbeat)
+        except asyncio.TimeoutError:
+            return None
+
+    def deliver(self, event):
+        if self.queue.full():
+            # a client too slow to keep up loses its oldest events
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """Deliver events to the subscribers in this process."""
+
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, organisation_id, heartbeat):
+        subscription = Subscription(self, organisation_id, heartbeat, self.maxsize)
+        with self.lock:
+            self.subscriptions[organisation_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions[subscription.organisation_id].discard(subscription)
+
+    def publish(self, organisation_id, event):
+        with self.lock:
+            subscriptions = list(self.subscriptions[organisation_id])
+        for subscription in subscriptions:
+            # publishers run in sync code, outside the streams' event loop
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # its loop was closed under it
+                subscription.close()
+
+
+class CacheBroker(LocalBroker):
+    """Relay events between processes through the `alias` cache.
+
+    Each organisation's events are numbered by a counter in the cache and
+    kept for `timeout` seconds. Every process polls the counters of the
+    organisations it has subscribers for and delivers new events locally.
+    """
+
+    def __init__(self, alias="default", poll_interval=1.0, timeout=60, maxsize=100):
+        super().__init__(maxsize)
+        self.alias = alias
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.pollers = {}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_counter_key(self, organisation_id):
+        return f"lead-events:{organisation_id}"
+
+    def publish(self, organisation_id, event):
+        key = self.get_counter_key(organisation_id)
+        self.cache.add(key, 0, None)
+        number = self.cache.incr(key)
+        self.cache.set(f"{key}:{number}", event, self.timeout)
+
+    def subscribe(self, organisation_id, heartbeat):
+        subscription = super().subscribe(organisation_id, heartbeat)
+        with self.lock:
+            poller = self.pollers.get((subscription.loop, organisation_id))
+            if poller is None or poller.done():
+                self.pollers[
+                    (subscription.loop, organisation_id)
+                ] = subscription.loop.create_task(
+                    self.poll(subscription.loop, organisation_id)
+                )
+        return subscription
+
+    async def poll(self, loop, organisation_id):
+        key = self.get_counter_key(organisation_id)
+        seen = await self.cache.aget(key, 0)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            with self.lock:
+                subscriptions = [
+                    subscription
+                    for subscription in self.subscriptions[organisation_id]
+                    if subscription.loop is loop
+                ]
+                if not subscriptions:
+                    # the next subscriber starts a new poller
+                    del self.pollers[(loop, organisation_id)]
+                    return
+            latest = await self.cache.aget(key, 0)
+            if latest <= seen:
+                continue
+            keys = [f"{key}:{number}" for number in range(seen + 1, latest + 1)]
+            events = await self.cache.aget_many(keys)
+            for event_key in keys:
+                if event_key in events:
+                    for subscription in subscriptions:
+                        subscription.deliver(events[event_key])
+            seen = latest
+
+
+broker = import_string(settings.LEAD_EVENTS_BROKER)()
+
+
+def get_category_name(lead):
+    if not lead.category_id:
+        return None
+    # looked up rather than followed, as it may be gone with the lead
+    return (
+        Category.objects.filter(pk=lead.category_id)
+        .values_list("name", flat=True)
+        .first()
+    )
+
+
+def make_lead_event(event_type, lead, pk, previous_agent_id, category_name):
+    return {
+        "type": event_type,
+        "previous_agent_id": previous_agent_id,
+        "lead": {
+            "id": pk,
+            "first_name": lead.first_name,
+            "last_name": lead.last_name,
+            "age": lead.age,
+            "email": lead.email,
+            "phone_number": lead.phone_number,
+            "category": category_name,
+            "agent_id": lead.agent_id,
+            "update_url": reverse("leads:lead-update", kwargs={"pk": pk}),
+        },
+    }
+
+
+def publish_lead_event(event_type, lead, previous_agent_id):
+    if not settings.LEAD_EVENTS_ENABLED:
+        return
+    # a deleted lead has lost its pk by the time the transaction commits
+    pk = lead.pk
+
+    def publish():
+        # built after the commit, so a rolled back save costs no queries
+        event = make_lead_event(
+            event_type, lead, pk, previous_agent_id, get_category_name(lead)
+        )
+        broker.publish(lead.organisation_id, event)
+
+    transaction.on_commit(publish)
+
+
+def publish_lead_events(organisation_id, moves):
+    """Publish an event for each `(event_type, pk, previous_agent_id)` of
+    `moves` once the transaction commits, for the paths that change leads
+    with `update()` and so skip the signals. The leads are read with one
+    query after the commit."""
+    if not settings.LEAD_EVENTS_ENABLED or not moves:
+        return
+
+    def publish():
+        leads = Lead.objects.select_related("category").in_bulk(
+            [pk for _, pk, _ in moves]
+        )
+        for event_type, pk, previous_agent_id in moves:
+            if pk in leads:
+                category_name = getattr(leads[pk].category, "name", None)
+                event = make_lead_event(
+                    event_type, leads[pk], pk, previous_agent_id, category_name
+                )
+                broker.publish(organisation_id, event)
+
+    transaction.on_commit(publish)
+
+
+def publish_lead_saved_signal(instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous_agent_id = getattr(instance, "_assigned_to", instance.agent_id)
+    if created:
+        event_type = "created"
+    elif previous_agent_id != instance.agent_id:
+        event_type = "assigned"
+    else:
+        event_type = "updated"
+    publish_lead_event(event_type, instance, None if created else previous_agent_id)
+    instance._assigned_to = instance.agent_id  # pylint: disable=protected-access
+
+
+def publish_lead_deleted_signal(instance, **kwargs):
+    publish_lead_event("deleted", instance, instance.agent_id)
@@ -2,8 +2,10 @@ from django import forms
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm as DjangoUserCreationForm
 from django.contrib.auth.forms import UsernameField
+from django.urls import reverse_lazy
 
-from .models import Lead, Category
+from .dedup import find_duplicate
+from .models import Agent, Category, Lead
 
 User = get_user_model()
 
@@ -15,6 +17,28 @@ class UserCreationForm(DjangoUserCreationForm):
         field_classes = {"username": UsernameField}
 
 
+class AgentAutocompleteWidget(forms.Widget):
+    """Picks an agent by typing its username, instead of listing every agent."""
+
+    template_name = "leads/widgets/agent_autocomplete.html"
+    url = reverse_lazy("agents:agent-autocomplete")
+
+    class Media:
+        js = ("js/autocomplete.js",)
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        label = ""
+        if value:
+            label = (
+                Agent.objects.filter(pk=value)
+                .values_list("user__username", flat=True)
+                .first()
+            ) or ""
+        context["widget"].update({"label": label, "url": self.url})
+        return context
+
+
 class LeadModelForm(forms.ModelForm):
     class Meta:
         model = Lead
@@ -28,6 +52,98 @@ class LeadModelForm(forms.ModelForm):
             "phone_number",
             "email",
         )
+        widgets = {"agent": AgentAutocompleteWidget}
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # leads of an organisation, i.e. not import rows, which are checked
+        # in batches; existing duplicates stay editable
+        if self.instance.organisation_id and (
+            "email" in self.changed_data or "phone_number" in self.changed_data
+        ):
+            duplicate = find_duplicate(
+                self.instance.organisation_id,
+                cleaned_data.get("email"),
+                cleaned_data.get("phone_number"),
+                exclude_pk=self.instance.pk,
+            )
+            if duplicate:
+                raise forms.ValidationError(
+                    f"{duplicate} already has this email address or phone number."
+                )
+        return cleaned_data
+
+
+class LeadRowForm(LeadModelForm):
+    """Validates a row of a lead import; its agent and category are looked up by name."""
+
+    class Meta(LeadModelForm.Meta):
+        fields = tuple(
+            field
+            for field in LeadModelForm.Meta.fields
+            if field not in ("agent", "category")
+        )
+
+
+class LeadImportForm(forms.Form):
+    file = forms.FileField(help_text="A CSV file with a header row.")
+
+
+class LeadBulkUpdateForm(forms.Form):
+    """Picks the leads to move, and the agent and/or category to move them to.
+
+    The view limits the querysets to the organisation's agents and categories.
+    """
+
+    agent = forms.ModelChoiceField(
+        Agent.objects.none(),
+        required=False,
+        label="Leads of agent",
+        widget=AgentAutocompleteWidget,
+    )
+    unassigned = forms.BooleanField(required=False, label="Only unassigned leads")
+    category = forms.ModelChoiceField(
+        Category.objects.none(), required=False, label="Leads in category"
+    )
+    new_agent = forms.ModelChoiceField(
+        Agent.objects.none(),
+        required=False,
+        label="Assign them to",
+        widget=AgentAutocompleteWidget,
+    )
+    new_category = forms.ModelChoiceField(
+        Category.objects.none(), required=False, label="Move them to category"
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("agent") and cleaned_data.get("unassigned"):
+            raise forms.ValidationError("Pick an agent or unassigned leads, not both.")
+        # without a filter every lead of the organisation would be moved
+        if not self.get_filters():
+            raise forms.ValidationError(
+                "Pick the leads to move by agent, unassigned or category."
+            )
+        if not self.get_changes():
+            raise forms.ValidationError("Pick an agent or a category to move them to.")
+        return cleaned_data
+
+    def get_filters(self):
+        filters = {}
+        if self.cleaned_data.get("unassigned"):
+            filters["agent__isnull"] = True
+        elif self.cleaned_data.get("agent"):
+            filters["agent"] = self.cleaned_data["agent"]
+        if self.cleaned_data.get("category"):
+            filters["category"] = self.cleaned_data["category"]
+        return filters
+
+    def get_changes(self):
+        return {
+            name: self.cleaned_data[f"new_{name}"]
+            for name in ("agent", "category")
+            if self.cleaned_data.get(f"new_{name}")
+        }
 
 
 class CategoryModelForm(forms.ModelForm):
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+
+
+class FragmentCacheMixin:
+    """Give templates what they need to `{% cache %}` per-organisation fragments.
+
+    `fragment_cache_key` changes with the organisation's `cache_version`, so
+    a fragment is rebuilt as soon as one of its leads, categories or agents
+    changes. Agents see a different subset of leads than organisers and get
+    fragments of their own.
+    """
+
+    # the cache the templates' {% cache %} tags use
+    fragment_cache_alias = "tiered"
+
+    def get_fragment_cache_key(self):
+        user, organisation = self.request.user, self.request.organisation
+        role = "organiser" if user.is_organiser else f"agent-{user.pk}"
+        return f"{organisation.pk}:{organisation.cache_version}:{role}"
+
+    async def ahas_cached_fragment(self, fragment_name):
+        """Whether the template's `fragment_name` block will come from the cache."""
+        key = make_template_fragment_key(fragment_name, [self.get_fragment_cache_key()])
+        return await caches[self.fragment_cache_alias].ahas_key(key)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(
+            {
+                "fragment_cache_key": self.get_fragment_cache_key(),
+                "fragment_cache_timeout": settings.FRAGMENT_CACHE_TIMEOUT,
+            }
+        )
+        return context
@@ -0,0 +1,183 @@
+import csv
+import io
+from collections import Counter
+from itertools import islice
+
+from django.db import transaction
+
+from .autocomplete import prefix_cache
+from .dedup import find_existing_keys, lead_keys
+from .events import publish_lead_events
+from .forms import LeadRowForm
+from .models import (
+    Agent,
+    Category,
+    Lead,
+    LeadEvent,
+    adjust_agent_lead_counts,
+    adjust_lead_counters,
+    bump_cache_version,
+)
+from .outbox import queue_mail
+from .routing import route_new_leads
+from .timeline import record
+
+
+class ImportResult:  # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+
+def normalise_header(header):
+    """Map both field names and the export's headers ("First Name") to fields."""
+    return header.strip().lower().replace(" ", "_")
+
+
+def is_undecodable(row):
+    """Whether the row has bytes that weren't UTF-8, which `surrogateescape`
+    decodes to lone surrogates."""
+    return any(
+        "\udc80" <= character <= "\udcff"
+        for value in row.values()
+        if isinstance(value, str)
+        for character in value
+    )
+
+
+def read_rows(file, result):
+    """Lazily yield `(line_number, row)` from a binary or text CSV file.
+
+    Rows that aren't UTF-8 are reported in `result` and skipped. A malformed
+    file is reported at the line it breaks on and read no further.
+    """
+    if not isinstance(file, io.TextIOBase):
+        file = io.TextIOWrapper(
+            file, encoding="utf-8-sig", errors="surrogateescape", newline=""
+        )
+    reader = csv.DictReader(file)
+    try:
+        reader.fieldnames = [normalise_header(name) for name in reader.fieldnames or []]
+        for row in reader:
+            if is_undecodable(row):
+                result.add_error(reader.line_num, "The row isn't valid UTF-8.")
+                continue
+            yield reader.line_num, row
+    except csv.Error as error:
+        # line_num still counts up to the last row read whole
+        result.add_error(
+            reader.line_num + 1, f"Malformed CSV ({error}), the rest was not imported."
+        )
+
+
+def import_leads(file, organisation, batch_size=500, notify=True, actor=""):
+    """Import leads from a CSV file into `organisation`.
+
+    Rows are validated with `LeadRowForm` and inserted with `bulk_create` one
+    batch at a time, so the file is never held in memory. Invalid rows, and
+    rows sharing an email or phone number with a lead or an earlier row, are
+    reported in the returned `ImportResult` and don't stop the import, and
+    neither do rows that aren't UTF-8. The new leads' timelines start with an
+    event naming `actor`.
+    """
+    result = ImportResult()
+    rows = read_rows(file, result)
+    while batch := list(islice(rows, batch_size)):
+        import_batch(batch, organisation, result, batch_size, actor)
+    # the unreadable rows are reported as they're read, the invalid ones
+    # with their batch
+    result.errors.sort()
+
+    if notify and result.created:
+        queue_mail(
+            subject="Leads have been imported.",
+            message=f"{result.created} leads were imported. "
+            "Go to the site to see the new leads.",
+            from_email="djcrm@djcrm.com",
+            recipient_list=["general@djcrm.com"],
+        )
+    return result
+
+
+# pylint: disable-next=too-many-locals
+def import_batch(batch, organisation, result, batch_size, actor=""):
+    # one lookup per batch for every category and agent name it mentions
+    category_names = {row.get("category") for _, row in batch} - {None, ""}
+    agent_names = {row.get("agent") for _, row in batch} - {None, ""}
+    categories = {
+        category.name: category
+        for category in Category.objects.filter(
+            organisation=organisation, name__in=category_names
+        )
+    }
+    agents = {
+        agent.user.username: agent
+        for agent in Agent.objects.filter(
+            organisation=organisation, user__username__in=agent_names
+        ).select_related("user")
+    }
+
+    rows = []
+    for line, row in batch:
+        form = LeadRowForm(data=row)
+        if not form.is_valid():
+            for field, errors in form.errors.items():
+                result.add_error(line, f"{field}: {' '.join(errors)}")
+            continue
+
+        lead = form.save(commit=False)
+        lead.organisation = organisation
+        category_name, agent_name = row.get("category"), row.get("agent")
+        if category_name:
+            if category_name not in categories:
+                result.add_error(line, f"category: Unknown category {category_name}.")
+                continue
+            lead.category = categories[category_name]
+        if agent_name:
+            if agent_name not in agents:
+                result.add_error(line, f"agent: Unknown agent {agent_name}.")
+                continue
+            lead.agent = agents[agent_name]
+        lead.set_lookup_keys()
+        rows.append((line, lead))
+
+    # one lookup per batch for the leads the rows duplicate
+    seen = find_existing_keys(organisation, [lead for _, lead in rows])
+    leads = []
+    for line, lead in rows:
+        keys = lead_keys(lead)
+        if keys & seen:
+            result.add_error(line, "Duplicate of an existing lead.")
+            continue
+        seen |= keys
+        leads.append(lead)
+
+    with transaction.atomic():
+        route_new_leads(leads, organisation)
+        Lead.objects.bulk_create(leads, batch_size=batch_size)
+        # bulk_create skips the save signals that maintain the counters
+        counts = Counter(lead.category_id for lead in leads)
+        for category_id, count in counts.items():
+            adjust_lead_counters(organisation.pk, category_id, count)
+        adjust_agent_lead_counts(Counter(lead.agent_id for lead in leads))
+        # backends that can't return the new pks leave the timelines and the
+        # open lead lists without them
+        created = [lead for lead in leads if lead.pk is not None]
+        record(
+            [
+                LeadEvent(lead=lead, kind=LeadEvent.CREATED, actor=actor)
+                for lead in created
+            ]
+        )
+        publish_lead_events(
+            organisation.pk, [("created", lead.pk, None) for lead in created]
+        )
+        if leads:
+            bump_cache_version(organisation.pk)
+    if leads:
+        # bulk_create skips the signals that invalidate it too
+        prefix_cache.invalidate(organisation.pk)
+    result.created += len(leads)
@@ -0,0 +1,156 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from leads.sqlite import apply_pragmas
+
+SCHEMA = """
+    CREATE TABLE organisation (id INTEGER PRIMARY KEY, lead_count INTEGER);
+    CREATE TABLE lead (
+        id INTEGER PRIMARY KEY,
+        organisation_id INTEGER REFERENCES organisation (id),
+        first_name TEXT,
+        last_name TEXT,
+        email TEXT,
+        description TEXT,
+        date_added TEXT
+    );
+    CREATE INDEX lead_org_date_added ON lead (organisation_id, date_added, id);
+"""
+INSERT_LEAD = (
+    "INSERT INTO lead (organisation_id, first_name, last_name, email, description, "
+    "date_added) VALUES (?, 'Jane', 'Doe', 'jane@doe.com', ?, datetime('now'))"
+)
+READ_PAGE = (
+    "SELECT id, first_name, last_name, email FROM lead WHERE organisation_id = ? "
+    "ORDER BY date_added, id LIMIT 50"
+)
+ORGANISATIONS = 10
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent reads and writes on a scratch SQLite database, with "
+        "SQLite's default pragmas and with SQLITE_PRAGMAS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument(
+            "--seconds", type=float, default=5.0, help="How long each run lasts."
+        )
+        parser.add_argument(
+            "--rows", type=int, default=10000, help="Leads to start with."
+        )
+
+    def handle(self, *args, **options):
+        profiles = (
+            ("SQLite defaults", {}),
+            ("SQLITE_PRAGMAS", settings.SQLITE_PRAGMAS),
+        )
+        for label, pragmas in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "benchmark.sqlite3")
+                self.create_database(path, pragmas, options["rows"])
+                result = self.run_workload(path, pragmas, options)
+            self.stdout.write(
+                f"{label}: {result['reads'] / options['seconds']:.0f} reads/s, "
+                f"{result['writes'] / options['seconds']:.0f} writes/s, "
+                f"p95 read latency {result['read_p95'] * 1000:.2f} ms, "
+                f"{result['errors']} locked errors."
+            )
+
+    def connect(self, path, pragmas):
+        # autocommit with explicit transactions, like Django's connections
+        connection = sqlite3.connect(
+            path, timeout=5, isolation_level=None, check_same_thread=False
+        )
+        apply_pragmas(connection.cursor(), pragmas)
+        return connection
+
+    def create_database(self, path, pragmas, rows):
+        connection = self.connect(path, pragmas)
+        connection.executescript(SCHEMA)
+        connection.execute("BEGIN")
+        connection.executemany(
+            "INSERT INTO organisation VALUES (?, 0)",
+            [(pk,) for pk in range(1, ORGANISATIONS + 1)],
+        )
+        connection.executemany(
+            INSERT_LEAD,
+            [(row % ORGANISATIONS + 1, "x" * 200) for row in range(rows)],
+        )
+        connection.execute("COMMIT")
+        connection.close()
+
+    def run_workload(self, path, pragmas, options):
+        deadline = time.monotonic() + options["seconds"]
+        lock = threading.Lock()
+        result = {"reads": 0, "writes": 0, "errors": 0, "read_latencies": []}
+
+        def read():
+            connection = self.connect(path, pragmas)
+            count, latencies, errors = 0, [], 0
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                try:
+                    connection.execute(
+                        READ_PAGE, (count % ORGANISATIONS + 1,)
+                    ).fetchall()
+                except sqlite3.OperationalError:
+                    errors += 1
+                    continue
+                latencies.append(time.monotonic() - started)
+                count += 1
+            connection.close()
+            with lock:
+                result["reads"] += count
+                result["errors"] += errors
+                result["read_latencies"] += latencies
+
+        def write():
+            connection = self.connect(path, pragmas)
+            count, errors = 0, 0
+            while time.monotonic() < deadline:
+                organisation_id = count % ORGANISATIONS + 1
+                try:
+                    # the lead insert and counter update of LeadCreateView
+                    connection.execute("BEGIN")
+                    connection.execute(INSERT_LEAD, (organisation_id, "x" * 200))
+                    connection.execute(
+                        "UPDATE organisation SET lead_count = lead_count + 1 "
+                        "WHERE id = ?",
+                        (organisation_id,),
+                    )
+                    connection.execute("COMMIT")
+                except sqlite3.OperationalError:
+                    errors += 1
+                    if connection.in_transaction:
+                        connection.execute("ROLLBACK")
+                    continue
+                count += 1
+            connection.close()
+            with lock:
+                result["writes"] += count
+                result["errors"] += errors
+
+        threads = [threading.Thread(target=read) for _ in range(options["readers"])]
+        threads += [threading.Thread(target=write) for _ in range(options["writers"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        latencies = result.pop("read_latencies")
+        if len(latencies) >= 2:
+            result["read_p95"] = statistics.quantiles(latencies, n=20)[-1]
+        else:
+            result["read_p95"] = latencies[0] if latencies else 0
+        return result
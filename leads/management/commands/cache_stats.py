@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+from leads.cache import TwoTierCache
+
+
+class Command(BaseCommand):
+    help = "Report the hit rate of the two-tier caches across all processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Zero the counters afterwards."
+        )
+
+    def handle(self, *args, **options):
+        for alias in settings.CACHES:
+            cache = caches[alias]
+            if not isinstance(cache, TwoTierCache):
+                continue
+            stats = cache.get_stats()
+            hit_rate = (
+                "n/a" if stats["hit_rate"] is None else f"{stats['hit_rate']:.1%}"
+            )
+            self.stdout.write(
+                f"{alias}: {stats['local_hits']} local hits, "
+                f"{stats['shared_hits']} shared hits, {stats['misses']} misses, "
+                f"hit rate {hit_rate}."
+            )
+            if options["reset"]:
+                cache.reset_stats()
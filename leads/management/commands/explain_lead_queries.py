@@ -0,0 +1,95 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from agents.views import AgentListView
+from leads.middleware import resolve_organisation
+from leads.models import Agent, Lead, User
+from leads.views import (
+    CategoryListView,
+    LeadDetailView,
+    LeadListView,
+)
+
+
+class Command(BaseCommand):
+    help = "Print the EXPLAIN plan of the queryset behind each tenant-scoped view."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--organiser",
+            help="Username of the organiser to explain the queries for. "
+            "Defaults to the first organiser.",
+        )
+        parser.add_argument(
+            "--agent",
+            help="Username of the agent to explain the queries for. "
+            "Defaults to the first agent in the organiser's organisation.",
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Run EXPLAIN ANALYZE (PostgreSQL only).",
+        )
+
+    def handle(self, *args, **options):
+        organiser = self.get_organiser(options["organiser"])
+        agent_user = self.get_agent_user(organiser, options["agent"])
+        explain_options = {"analyze": True} if options["analyze"] else {}
+
+        for label, queryset in self.get_querysets(organiser, agent_user):
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write("")
+
+    def get_organiser(self, username):
+        organisers = User.objects.filter(is_organiser=True).order_by("id")
+        if username:
+            organisers = organisers.filter(username=username)
+        organiser = organisers.first()
+        if organiser is None:
+            raise CommandError("No organiser found.")
+        return organiser
+
+    def get_agent_user(self, organiser, username):
+        agents = Agent.objects.filter(organisation=organiser.userprofile)
+        if username:
+            agents = agents.filter(user__username=username)
+        agent = agents.select_related("user").order_by("id").first()
+        if agent is None and username:
+            raise CommandError(f"No agent {username} found in this organisation.")
+        return agent.user if agent else None
+
+    def get_view(self, view_class, user, **kwargs):
+        request = RequestFactory().get("/")
+        request.user = user
+        request.organisation = resolve_organisation(user)
+        view = view_class()
+        view.setup(request, **kwargs)
+        return view
+
+    def get_querysets(self, organiser, agent_user):
+        lead = Lead.objects.filter(organisation=organiser.userprofile).first()
+        users = [("organiser", organiser)]
+        if agent_user is not None:
+            users.append(("agent", agent_user))
+
+        for role, user in users:
+            view = self.get_view(LeadListView, user)
+            queryset = view.get_queryset().order_by("date_added", "id")
+            yield f"LeadListView ({role})", queryset[: view.paginate_by + 1]
+            if user.is_organiser:
+                yield (
+                    f"LeadListView unassigned leads ({role})",
+                    view.get_unassigned_queryset(),
+                )
+
+            if lead is not None:
+                view = self.get_view(LeadDetailView, user, pk=lead.pk)
+                yield f"LeadDetailView ({role})", view.get_queryset().filter(pk=lead.pk)
+
+            view = self.get_view(CategoryListView, user)
+            yield f"CategoryListView ({role})", view.get_queryset()
+
+        view = self.get_view(AgentListView, organiser)
+        yield "AgentListView (organiser)", view.get_queryset()
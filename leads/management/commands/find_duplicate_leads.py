@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from leads.dedup import cluster_duplicates, merge_duplicates
+from leads.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "List the leads that share an email address or phone number, and "
+        "optionally merge each cluster of duplicates into its oldest lead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "usernames",
+            nargs="*",
+            help="Only look in the organisations of these organisers.",
+        )
+        parser.add_argument(
+            "--merge",
+            action="store_true",
+            help="Merge each cluster into its oldest lead and delete the others.",
+        )
+
+    def handle(self, *args, **options):
+        organisations = UserProfile.objects.order_by("id")
+        if options["usernames"]:
+            organisations = organisations.filter(
+                user__username__in=options["usernames"]
+            )
+
+        clusters = duplicates = 0
+        for organisation in organisations.iterator():
+            for pks in cluster_duplicates(organisation):
+                clusters += 1
+                duplicates += len(pks) - 1
+                self.stdout.write(
+                    f"{organisation}: lead {pks[0]} is duplicated by "
+                    f"{', '.join(str(pk) for pk in pks[1:])}"
+                )
+                if options["merge"]:
+                    merge_duplicates(pks)
+
+        verb = "Merged" if options["merge"] else "Found"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {duplicates} duplicate leads in {clusters} clusters."
+            )
+        )
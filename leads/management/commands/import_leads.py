@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from leads.imports import import_leads
+from leads.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Import leads from a CSV file into an organisation."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path of the CSV file to import.")
+        parser.add_argument(
+            "--organiser",
+            required=True,
+            help="Username of the organiser whose organisation gets the leads.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--no-notify",
+            action="store_false",
+            dest="notify",
+            help="Don't send the summary email.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            organisation = UserProfile.objects.get(
+                user__username=options["organiser"], user__is_organiser=True
+            )
+        except UserProfile.DoesNotExist as error:
+            raise CommandError(f"No organiser {options['organiser']} found.") from error
+
+        try:
+            with open(options["path"], "rb") as file:
+                result = import_leads(
+                    file,
+                    organisation,
+                    batch_size=options["batch_size"],
+                    notify=options["notify"],
+                )
+        except OSError as error:
+            raise CommandError(str(error)) from error
+
+        for line, message in result.errors:
+            self.stderr.write(f"Line {line}: {message}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {result.created} leads, {len(result.errors)} errors."
+            )
+        )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from leads.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Repair the denormalised per-organisation and per-category lead counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "usernames",
+            nargs="*",
+            help="Only recount the organisations of these organisers.",
+        )
+
+    def handle(self, *args, **options):
+        organisations = UserProfile.objects.order_by("id")
+        if options["usernames"]:
+            organisations = organisations.filter(
+                user__username__in=options["usernames"]
+            )
+
+        repaired = 0
+        for organisation in organisations.iterator():
+            with transaction.atomic():
+                repaired += organisation.recount_leads()
+
+        self.stdout.write(self.style.SUCCESS(f"Repaired {repaired} lead counters."))
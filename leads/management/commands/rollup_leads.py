@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from leads.models import UserProfile
+from leads.rollups import SETTLE_TIME, rollup_leads
+
+
+class Command(BaseCommand):
+    help = (
+        "Add the leads added since the last run to the analytics rollups, "
+        "or rebuild them from scratch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "usernames",
+            nargs="*",
+            help="Only roll up the leads of these organisers' organisations.",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rebuild the rollups from every lead, to take in the leads "
+            "moved or deleted since they were rolled up.",
+        )
+
+    def handle(self, *args, **options):
+        organisations = UserProfile.objects.order_by("id")
+        if options["usernames"]:
+            organisations = organisations.filter(
+                user__username__in=options["usernames"]
+            )
+
+        # the same high-water mark for every organisation
+        until = timezone.now() - SETTLE_TIME
+        counted = 0
+        for organisation in organisations.iterator():
+            counted += rollup_leads(organisation, until, options["full"])
+
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {counted} leads."))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from leads.models import UserProfile
+from leads.routing import ROUTERS, get_router_class, route_leads
+
+
+class Command(BaseCommand):
+    help = "Assign the backlog of unassigned leads to agents, in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "usernames",
+            nargs="*",
+            help="Only route the leads of these organisers' organisations.",
+        )
+        parser.add_argument(
+            "--strategy",
+            help=f"One of {', '.join(ROUTERS)} or the dotted path of a router. "
+            "Defaults to the LEAD_ROUTING_STRATEGY setting.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="How many leads to assign per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        router_class = get_router_class(options["strategy"])
+        if router_class is None:
+            raise CommandError("Pass --strategy or set LEAD_ROUTING_STRATEGY.")
+
+        organisations = UserProfile.objects.order_by("id")
+        if options["usernames"]:
+            organisations = organisations.filter(
+                user__username__in=options["usernames"]
+            )
+
+        routed = 0
+        for organisation in organisations.iterator():
+            routed += route_leads(organisation, router_class, options["chunk_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Routed {routed} leads."))
@@ -0,0 +1,61 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+from .models import UserProfile
+
+
+def resolve_organisation(user):
+    """Return the organisation (UserProfile) `user` works in, in one query."""
+    if not user.is_authenticated:
+        return None
+    if user.is_organiser:
+        return UserProfile.objects.filter(user_id=user.pk).first()
+    return UserProfile.objects.filter(agent__user_id=user.pk).first()
+
+
+async def aresolve_organisation(user):
+    """Like `resolve_organisation`, through the async ORM."""
+    if not user.is_authenticated:
+        return None
+    if user.is_organiser:
+        return await UserProfile.objects.filter(user_id=user.pk).afirst()
+    return await UserProfile.objects.filter(agent__user_id=user.pk).afirst()
+
+
+def get_organisation(request):
+    # pylint: disable=protected-access
+    if not hasattr(request, "_cached_organisation"):
+        request._cached_organisation = resolve_organisation(request.user)
+    return request._cached_organisation
+
+
+async def aget_organisation(request):
+    """Resolve `request.organisation` ahead of time from async code.
+
+    `request.user` must already be loaded.
+    """
+    # pylint: disable=protected-access
+    if not hasattr(request, "_cached_organisation"):
+        request._cached_organisation = await aresolve_organisation(request.user)
+    return request._cached_organisation
+
+
+class OrganisationMiddleware:  # pylint: disable=too-few-public-methods
+    """Resolve the tenant of the logged in user once per request.
+
+    `request.organisation` is lazy, like `request.user`, so requests that
+    never look at it don't pay for the query. It runs in either mode, so an
+    async view under ASGI doesn't get pushed onto a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.organisation = SimpleLazyObject(lambda: get_organisation(request))
+        return self.get_response(request)
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.6 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leads", "0012_alter_lead_description"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["organisation", "agent", "date_added"],
+                name="lead_org_agent_added_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                condition=models.Q(("agent__isnull", False)),
+                fields=["organisation", "date_added", "id"],
+                name="lead_org_assigned_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                condition=models.Q(("agent__isnull", True)),
+                fields=["organisation", "date_added"],
+                name="lead_org_unassigned_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["organisation", "category"], name="lead_org_category_idx"
+            ),
+        ),
+    ]
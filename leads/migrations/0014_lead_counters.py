@@ -0,0 +1,54 @@
+# Generated by Django 4.2.6 on 2026-10-18 18:23
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_leads(apps, schema_editor):
+    Lead = apps.get_model("leads", "Lead")
+    Category = apps.get_model("leads", "Category")
+    UserProfile = apps.get_model("leads", "UserProfile")
+
+    def lead_count(**filters):
+        leads = (
+            Lead.objects.filter(**filters)
+            .order_by()
+            .values("organisation")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        return Coalesce(Subquery(leads), Value(0))
+
+    Category.objects.update(lead_count=lead_count(category=OuterRef("pk")))
+    UserProfile.objects.update(
+        lead_count=lead_count(organisation=OuterRef("pk")),
+        uncategorised_lead_count=lead_count(
+            organisation=OuterRef("pk"), category__isnull=True
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leads", "0013_lead_tenant_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="lead_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="lead_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="uncategorised_lead_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_leads, migrations.RunPython.noop),
+    ]
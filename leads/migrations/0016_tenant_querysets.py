@@ -0,0 +1,34 @@
+# Generated by Django 4.2.6 on 2026-10-18 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leads", "0015_queuedemail"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="agent",
+            options={"ordering": ["id"]},
+        ),
+        migrations.AlterModelOptions(
+            name="category",
+            options={"ordering": ["name"]},
+        ),
+        migrations.AlterModelOptions(
+            name="lead",
+            options={"ordering": ["date_added", "id"]},
+        ),
+        migrations.AddIndex(
+            model_name="agent",
+            index=models.Index(fields=["organisation", "id"], name="agent_org_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(
+                fields=["organisation", "name"], name="category_org_name_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+from leads.search import install_search_index
+
+# the search index lives outside the model, maintained by a trigger
+POSTGRESQL_INSTALL = [
+    "ALTER TABLE leads_lead ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    """
+    CREATE OR REPLACE FUNCTION leads_lead_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple',
+                coalesce(NEW.first_name, '') || ' ' || coalesce(NEW.last_name, '')), 'A') ||
+            setweight(to_tsvector('simple',
+                coalesce(NEW.email, '') || ' ' || coalesce(NEW.phone_number, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS leads_lead_search_vector_trigger ON leads_lead",
+    """
+    CREATE TRIGGER leads_lead_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF first_name, last_name, email, phone_number, description
+    ON leads_lead FOR EACH ROW EXECUTE FUNCTION leads_lead_search_vector_update()
+    """,
+    # fires the trigger for rows that predate it
+    "UPDATE leads_lead SET first_name = first_name WHERE search_vector IS NULL",
+    "CREATE INDEX IF NOT EXISTS leads_lead_search_idx "
+    "ON leads_lead USING gin (search_vector)",
+]
+
+POSTGRESQL_UNINSTALL = [
+    "DROP INDEX IF EXISTS leads_lead_search_idx",
+    "DROP TRIGGER IF EXISTS leads_lead_search_vector_trigger ON leads_lead",
+    "DROP FUNCTION IF EXISTS leads_lead_search_vector_update()",
+    "ALTER TABLE leads_lead DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def install(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        for statement in POSTGRESQL_INSTALL:
+            schema_editor.execute(statement)
+    install_search_index(connection)
+
+
+def uninstall(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for statement in POSTGRESQL_UNINSTALL:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leads", "0016_tenant_querysets"),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
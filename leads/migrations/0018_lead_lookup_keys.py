@@ -0,0 +1,79 @@
+# Generated by Django 4.2.6 on 2026-10-18 18:54
+
+from django.db import migrations, models
+
+
+def normalise_lookup(value):
+    # frozen copy of leads.models.normalise_lookup
+    return " ".join(str(value or "").split()).lower()
+
+
+def fill_lookup_keys(apps, schema_editor):
+    Lead = apps.get_model("leads", "Lead")
+    Agent = apps.get_model("leads", "Agent")
+
+    batch = []
+    for lead in Lead.objects.only("first_name", "last_name", "email").iterator(
+        chunk_size=1000
+    ):
+        lead.lookup_name = normalise_lookup(f"{lead.first_name} {lead.last_name}")
+        lead.lookup_email = normalise_lookup(lead.email)
+        batch.append(lead)
+        if len(batch) == 1000:
+            Lead.objects.bulk_update(batch, ["lookup_name", "lookup_email"])
+            batch = []
+    Lead.objects.bulk_update(batch, ["lookup_name", "lookup_email"])
+
+    agents = list(Agent.objects.select_related("user"))
+    for agent in agents:
+        agent.lookup_name = normalise_lookup(agent.user.username)
+    Agent.objects.bulk_update(agents, ["lookup_name"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leads", "0017_lead_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="agent",
+            name="lookup_name",
+            field=models.CharField(default="", editable=False, max_length=150),
+        ),
+        migrations.AddField(
+            model_name="lead",
+            name="lookup_email",
+            field=models.CharField(default="", editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name="lead",
+            name="lookup_name",
+            field=models.CharField(default="", editable=False, max_length=41),
+        ),
+        migrations.AddIndex(
+            model_name="agent",
+            index=models.Index(
+                fields=["organisation", "lookup_name"],
+                name="agent_org_lookup_name_idx",
+                opclasses=["int8_ops", "text_pattern_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["organisation", "lookup_name"],
+                name="lead_org_lookup_name_idx",
+                opclasses=["int8_ops", "text_pattern_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["organisation", "lookup_email"],
+                name="lead_org_lookup_email_idx",
+                opclasses=["int8_ops", "text_pattern_ops"],
+            ),
+        ),
+        migrations.RunPython(fill_lookup_keys, migrations.RunPython.noop),
+    ]
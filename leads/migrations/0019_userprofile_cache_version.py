@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leads", "0018_lead_lookup_keys"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="cache_version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.6 on 2026-10-18 19:11
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    # the best known modification time of existing leads is their creation
+    Lead = apps.get_model("leads", "Lead")
+    Lead.objects.update(updated_at=F("date_added"))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leads", "0019_userprofile_cache_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lead",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="changed_at",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
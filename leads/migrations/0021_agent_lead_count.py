@@ -0,0 +1,45 @@
+# Generated by Django 4.2.6 on 2026-10-18 20:26
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_agent_leads(apps, schema_editor):
+    Lead = apps.get_model("leads", "Lead")
+    Agent = apps.get_model("leads", "Agent")
+    leads = (
+        Lead.objects.filter(agent=OuterRef("pk"))
+        .order_by()
+        .values("agent")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    Agent.objects.update(lead_count=Coalesce(Subquery(leads), Value(0)))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leads", "0020_lead_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="agent",
+            name="categories",
+            field=models.ManyToManyField(
+                blank=True, related_name="agents", to="leads.category"
+            ),
+        ),
+        migrations.AddField(
+            model_name="agent",
+            name="lead_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="routing_cursor",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_agent_leads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.6 on 2026-10-18 20:34
+
+from django.db import migrations, models
+
+
+def normalise_phone(value):
+    # frozen copy of leads.models.normalise_phone
+    return "".join(character for character in str(value or "") if character.isdigit())
+
+
+def fill_lookup_phone(apps, schema_editor):
+    Lead = apps.get_model("leads", "Lead")
+
+    batch = []
+    for lead in Lead.objects.only("phone_number").iterator(chunk_size=1000):
+        lead.lookup_phone = normalise_phone(lead.phone_number)
+        batch.append(lead)
+        if len(batch) == 1000:
+            Lead.objects.bulk_update(batch, ["lookup_phone"])
+            batch = []
+    Lead.objects.bulk_update(batch, ["lookup_phone"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leads", "0021_agent_lead_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lead",
+            name="lookup_phone",
+            field=models.CharField(default="", editable=False, max_length=20),
+        ),
+        migrations.RunPython(fill_lookup_phone, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["organisation", "lookup_phone"],
+                name="lead_org_lookup_phone_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.6 on 2026-10-18 20:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leads", "0022_lead_lookup_phone"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeadEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("created", "Created"),
+                            ("updated", "Updated"),
+                            ("assigned", "Assigned"),
+                            ("categorised", "Categorised"),
+                            ("merged", "Merged with duplicates"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("actor", models.CharField(blank=True, max_length=150)),
+                ("changes", models.JSONField(default=dict)),
+                (
+                    "lead",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="events",
+                        to="leads.lead",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at", "-id"],
+                "indexes": [
+                    models.Index(
+                        fields=["lead", "created_at", "id"],
+                        include=("kind", "actor", "changes"),
+                        name="lead_event_timeline_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.6 on 2026-10-18 23:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leads", "0024_lead_rollup"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="lead",
+            name="lead_org_agent_added_idx",
+        ),
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["organisation", "agent", "date_added", "id"],
+                name="lead_org_agent_added_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.6 on 2026-10-18 23:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leads", "0025_lead_org_agent_added_idx_id"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="leadevent",
+            name="lead_event_timeline_idx",
+        ),
+        migrations.AddIndex(
+            model_name="leadevent",
+            index=models.Index(
+                fields=["lead", "created_at", "id"], name="lead_event_timeline_idx"
+            ),
+        ),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models import Case, Count, F, Subquery, When
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -8,12 +11,139 @@ class User(AbstractUser):
     is_agent = models.BooleanField(default=False)
 
 
+def normalise_lookup(value):
+    """The form names and emails are stored in for prefix autocomplete."""
+    return " ".join(str(value or "").split()).lower()
+
+
+def normalise_phone(value):
+    """The digits of a phone number, so differently formatted copies match."""
+    return "".join(character for character in str(value or "") if character.isdigit())
+
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
+    # maintained by the lead signals below, repaired by `recount_leads`
+    lead_count = models.IntegerField(default=0, editable=False)
+    uncategorised_lead_count = models.IntegerField(default=0, editable=False)
+    # part of the cache key of this organisation's cached template fragments;
+    # bumped by the signals below whenever what they render changes
+    cache_version = models.PositiveIntegerField(default=0, editable=False)
+    changed_at = models.DateTimeField(null=True, editable=False)
+    # the pk of the agent round-robin routing assigned a lead to last
+    routing_cursor = models.PositiveIntegerField(default=0, editable=False)
+    # the high-water mark on Lead.date_added of the leads in the rollups
+    rolled_up_until = models.DateTimeField(null=True, editable=False)
 
     def __str__(self):
         return str(self.user.username)
 
+    def recount_leads(self):
+        """Recompute this organisation's lead counters from the lead table.
+
+        Returns the number of counters that had drifted.
+        """
+        self.refresh_from_db(fields=["lead_count", "uncategorised_lead_count"])
+        agent_counts = dict(
+            Lead.objects.filter(organisation=self, agent__isnull=False)
+            .order_by()
+            .values("agent")
+            .annotate(total=Count("id"))
+            .values_list("agent", "total")
+        )
+        drifted_agents = [
+            agent
+            for agent in Agent.objects.filter(organisation=self)
+            if agent.lead_count != agent_counts.get(agent.pk, 0)
+        ]
+        for agent in drifted_agents:
+            agent.lead_count = agent_counts.get(agent.pk, 0)
+        Agent.objects.bulk_update(drifted_agents, ["lead_count"])
+
+        counts = dict(
+            Lead.objects.filter(organisation=self)
+            .order_by()
+            .values("category")
+            .annotate(total=Count("id"))
+            .values_list("category", "total")
+        )
+
+        drifted = [
+            category
+            for category in Category.objects.filter(organisation=self)
+            if category.lead_count != counts.get(category.pk, 0)
+        ]
+        for category in drifted:
+            category.lead_count = counts.get(category.pk, 0)
+        Category.objects.bulk_update(drifted, ["lead_count"])
+
+        totals = {
+            "lead_count": sum(counts.values()),
+            "uncategorised_lead_count": counts.get(None, 0),
+        }
+        changed = [
+            name for name, total in totals.items() if getattr(self, name) != total
+        ]
+        for name in changed:
+            setattr(self, name, totals[name])
+        if changed:
+            self.save(update_fields=changed)
+        if drifted or changed:
+            bump_cache_version(self.pk)
+        return len(drifted_agents) + len(drifted) + len(changed)
+
+
+class TenantQuerySet(models.QuerySet):
+    def for_user(self, user, organisation=None):
+        """Rows in the organisation `user` works in.
+
+        Pass the already resolved `organisation` (e.g. `request.organisation`)
+        to filter on the indexed column directly instead of joining to it.
+        """
+        if organisation is not None:
+            return self.filter(organisation=organisation)
+        if user.is_organiser:
+            return self.filter(organisation__user=user)
+        return self.filter(organisation__agent__user=user)
+
+
+class LeadQuerySet(TenantQuerySet):
+    # the columns the lead list renders; see lead_list.html
+    list_fields = (
+        "first_name",
+        "last_name",
+        "age",
+        "email",
+        "phone_number",
+        "date_added",
+        "organisation",
+        "agent",
+        "category",
+        "category__name",
+    )
+
+    def for_user(self, user, organisation=None):
+        """Leads `user` may see: all of the organisation's for organisers,
+        only the ones assigned to them for agents."""
+        queryset = super().for_user(user, organisation)
+        if not user.is_organiser:
+            # resolve the agent in a scalar subquery rather than joining to
+            # it, so the filter lands on lead_org_agent_added_idx
+            agent = Agent.objects.filter(user=user).values("pk")[:1]
+            queryset = queryset.filter(agent_id=Subquery(agent))
+        return queryset
+
+    def update_and_touch(self, **values):
+        """`update()` that also sets `updated_at`, which it skips as an
+        auto_now field but the conditional GET validators rely on."""
+        return self.update(updated_at=Now(), **values)
+
+    def for_list(self):
+        return self.select_related("category").only(*self.list_fields)
+
+    def for_detail(self):
+        return self.select_related("category", "agent__user")
+
 
 class Lead(models.Model):
     first_name = models.CharField(max_length=20)
@@ -30,16 +160,116 @@ class Lead(models.Model):
     )
     description = models.TextField(null=True, blank=True)
     date_added = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     phone_number = models.CharField(max_length=20)
     email = models.EmailField()
 
+    # normalised copies for prefix autocomplete, kept by `set_lookup_keys`
+    lookup_name = models.CharField(max_length=41, default="", editable=False)
+    lookup_email = models.CharField(max_length=254, default="", editable=False)
+    # and for finding duplicates, along with lookup_email; see leads/dedup.py
+    lookup_phone = models.CharField(max_length=20, default="", editable=False)
+
+    objects = LeadQuerySet.as_manager()
+
+    class Meta:
+        # backed by lead_org_assigned_idx and lead_org_agent_added_idx
+        ordering = ["date_added", "id"]
+        indexes = [
+            # an agent's own leads, in list order
+            models.Index(
+                fields=["organisation", "agent", "date_added", "id"],
+                name="lead_org_agent_added_idx",
+            ),
+            # an organiser's assigned leads, in list order
+            models.Index(
+                fields=["organisation", "date_added", "id"],
+                name="lead_org_assigned_idx",
+                condition=models.Q(agent__isnull=False),
+            ),
+            # the unassigned leads panel
+            models.Index(
+                fields=["organisation", "date_added"],
+                name="lead_org_unassigned_idx",
+                condition=models.Q(agent__isnull=True),
+            ),
+            # per-category counts and listings, including uncategorised leads
+            models.Index(
+                fields=["organisation", "category"],
+                name="lead_org_category_idx",
+            ),
+            # prefix autocomplete; text_pattern_ops lets PostgreSQL serve
+            # LIKE 'prefix%' from the index whatever the database collation
+            models.Index(
+                fields=["organisation", "lookup_name"],
+                name="lead_org_lookup_name_idx",
+                opclasses=["int8_ops", "text_pattern_ops"],
+            ),
+            models.Index(
+                fields=["organisation", "lookup_email"],
+                name="lead_org_lookup_email_idx",
+                opclasses=["int8_ops", "text_pattern_ops"],
+            ),
+            # duplicate checks
+            models.Index(
+                fields=["organisation", "lookup_phone"],
+                name="lead_org_lookup_phone_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember which counters this lead is counted in, so a save that
+        # moves it can adjust them without re-reading the old row
+        if (
+            "organisation_id" in instance.__dict__
+            and "category_id" in instance.__dict__
+        ):
+            # pylint: disable-next=protected-access
+            instance._counted_as = (instance.organisation_id, instance.category_id)
+        if "agent_id" in instance.__dict__:
+            # and who it was assigned to, for the lead events and agent counters
+            # pylint: disable-next=protected-access
+            instance._assigned_to = instance.agent_id
+            # pylint: disable-next=protected-access
+            instance._counted_for = instance.agent_id
+        return instance
+
+    def set_lookup_keys(self):
+        """Refresh the autocomplete and duplicate keys; `bulk_create` callers
+        must call this."""
+        self.lookup_name = normalise_lookup(f"{self.first_name} {self.last_name}")
+        self.lookup_email = normalise_lookup(self.email)
+        self.lookup_phone = normalise_phone(self.phone_number)
+
 
 class Agent(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     organisation = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
+    # normalised username for prefix autocomplete
+    lookup_name = models.CharField(max_length=150, default="", editable=False)
+    # the categories category affinity routing prefers this agent for
+    categories = models.ManyToManyField("Category", blank=True, related_name="agents")
+    # leads assigned to the agent, maintained by the lead signals below and
+    # repaired by `recount_leads`; what load based routing balances
+    lead_count = models.IntegerField(default=0, editable=False)
+
+    objects = TenantQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["organisation", "id"], name="agent_org_idx"),
+            models.Index(
+                fields=["organisation", "lookup_name"],
+                name="agent_org_lookup_name_idx",
+                opclasses=["int8_ops", "text_pattern_ops"],
+            ),
+        ]
 
     def __str__(self):
         return str(self.user.username)
@@ -51,12 +281,131 @@ class Category(models.Model):
     )  # New, Contacted, Converted, Unconverted
     organisation = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
 
+    lead_count = models.IntegerField(default=0, editable=False)
+
+    objects = TenantQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["name"]
+        indexes = [
+            models.Index(fields=["organisation", "name"], name="category_org_name_idx"),
+        ]
+
     def __str__(self):
         return str(self.name)
 
-    @property
-    def count(self):
-        return self.leads.count()
+
+class LeadEvent(models.Model):
+    """One change to a lead, for its timeline; see leads/timeline.py.
+
+    Rows are only ever inserted. The actor and the changed values are stored
+    as the text the timeline shows, so reading it needs no joins.
+    """
+
+    CREATED = "created"
+    UPDATED = "updated"
+    ASSIGNED = "assigned"
+    CATEGORISED = "categorised"
+    MERGED = "merged"
+    KINDS = [
+        (CREATED, "Created"),
+        (UPDATED, "Updated"),
+        (ASSIGNED, "Assigned"),
+        (CATEGORISED, "Categorised"),
+        (MERGED, "Merged with duplicates"),
+    ]
+
+    # indexed by lead_event_timeline_idx only, to keep inserts cheap
+    lead = models.ForeignKey(
+        Lead, on_delete=models.CASCADE, related_name="events", db_index=False
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+    kind = models.CharField(max_length=20, choices=KINDS)
+    actor = models.CharField(max_length=150, blank=True)
+    # field name -> [old, new]
+    changes = models.JSONField(default=dict)
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            # the timeline, newest first
+            models.Index(
+                fields=["lead", "created_at", "id"],
+                name="lead_event_timeline_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.lead_id}"
+
+    def get_changes(self):
+        """`(label, old, new)` for each change, for display."""
+        return [
+            (Lead._meta.get_field(name).verbose_name, old, new)
+            for name, (old, new) in self.changes.items()
+        ]
+
+
+class LeadRollup(models.Model):
+    """How many leads an organisation added in a day or a week, by category
+    and agent; see leads/rollups.py."""
+
+    DAY = "day"
+    WEEK = "week"
+    PERIODS = [(DAY, "Day"), (WEEK, "Week")]
+
+    # indexed by lead_rollup_bucket_idx
+    organisation = models.ForeignKey(
+        UserProfile, on_delete=models.CASCADE, db_index=False
+    )
+    period = models.CharField(max_length=10, choices=PERIODS)
+    # the first day of the day or week
+    bucket = models.DateField()
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    agent = models.ForeignKey(
+        Agent, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    lead_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # the dashboard's range of buckets
+            models.Index(
+                fields=["organisation", "period", "bucket"],
+                name="lead_rollup_bucket_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.organisation_id} {self.period} {self.bucket}: {self.lead_count}"
+
+
+class QueuedEmail(models.Model):
+    """An email written in the sender's transaction and sent by `send_queued_mail`."""
+
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipient_list = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                name="queuedemail_pending_idx",
+                condition=models.Q(sent_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return str(self.subject)
 
 
 def post_user_created_signal(instance, created, **kwargs):
@@ -64,4 +413,91 @@ def post_user_created_signal(instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
 
 
+def pre_lead_saved_signal(instance, **kwargs):
+    instance.set_lookup_keys()
+
+
+def pre_agent_saved_signal(instance, **kwargs):
+    instance.lookup_name = normalise_lookup(instance.user.username)
+
+
+def bump_cache_version(organisation_id):
+    """Invalidate the organisation's cached fragments and conditional GET
+    validators, on every process at once."""
+    UserProfile.objects.filter(pk=organisation_id).update(
+        cache_version=F("cache_version") + 1, changed_at=Now()
+    )
+
+
+def organisation_changed_signal(instance, **kwargs):
+    bump_cache_version(instance.organisation_id)
+
+
+def adjust_lead_counters(organisation_id, category_id, delta):
+    if category_id is None:
+        UserProfile.objects.filter(pk=organisation_id).update(
+            lead_count=F("lead_count") + delta,
+            uncategorised_lead_count=F("uncategorised_lead_count") + delta,
+        )
+    else:
+        UserProfile.objects.filter(pk=organisation_id).update(
+            lead_count=F("lead_count") + delta
+        )
+        Category.objects.filter(pk=category_id).update(
+            lead_count=F("lead_count") + delta
+        )
+
+
+def adjust_agent_lead_counts(deltas):
+    """Add `deltas`, a mapping of agent pks to changes, to the agents' lead
+    counts in one query. Unassigned (`None`) and zero deltas are skipped."""
+    deltas = {pk: delta for pk, delta in deltas.items() if pk is not None and delta}
+    if deltas:
+        Agent.objects.filter(pk__in=deltas).update(
+            lead_count=F("lead_count")
+            + Case(*(When(pk=pk, then=delta) for pk, delta in deltas.items()))
+        )
+
+
+def post_lead_saved_signal(instance, created, raw, **kwargs):
+    if raw:
+        return
+    counted_as = (instance.organisation_id, instance.category_id)
+    previous = None if created else getattr(instance, "_counted_as", counted_as)
+    if previous != counted_as:
+        if previous is not None:
+            adjust_lead_counters(*previous, -1)
+        adjust_lead_counters(*counted_as, 1)
+    instance._counted_as = counted_as  # pylint: disable=protected-access
+
+    agent_id = instance.agent_id
+    previous_agent_id = None if created else getattr(instance, "_counted_for", agent_id)
+    if previous_agent_id != agent_id:
+        adjust_agent_lead_counts({previous_agent_id: -1, agent_id: 1})
+    instance._counted_for = agent_id  # pylint: disable=protected-access
+
+
+def post_lead_deleted_signal(instance, **kwargs):
+    counted_as = getattr(
+        instance, "_counted_as", (instance.organisation_id, instance.category_id)
+    )
+    adjust_lead_counters(*counted_as, -1)
+    adjust_agent_lead_counts({getattr(instance, "_counted_for", instance.agent_id): -1})
+
+
+def post_category_deleted_signal(instance, **kwargs):
+    # the category's leads were moved to the null category by SET_NULL
+    UserProfile.objects.filter(pk=instance.organisation_id).update(
+        uncategorised_lead_count=F("uncategorised_lead_count") + instance.lead_count
+    )
+
+
 post_save.connect(post_user_created_signal, sender=User)
+pre_save.connect(pre_lead_saved_signal, sender=Lead)
+pre_save.connect(pre_agent_saved_signal, sender=Agent)
+post_save.connect(post_lead_saved_signal, sender=Lead)
+post_delete.connect(post_lead_deleted_signal, sender=Lead)
+post_delete.connect(post_category_deleted_signal, sender=Category)
+for model in (Lead, Category, Agent):
+    post_save.connect(organisation_changed_signal, sender=model)
+    post_delete.connect(organisation_changed_signal, sender=model)
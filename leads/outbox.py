@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import QueuedEmail
+
+
+def queue_mail(subject, message, from_email, recipient_list):
+    """Queue an email in the current transaction instead of sending it inline.
+
+    The row only becomes visible to the `send_queued_mail` worker once the
+    surrounding transaction commits, so nothing is sent for rolled back work.
+    """
+    return QueuedEmail.objects.create(
+        subject=subject,
+        message=message,
+        from_email=from_email,
+        recipient_list=list(recipient_list),
+    )
+
+
+def get_backoff(attempts):
+    delay = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.EMAIL_OUTBOX_MAX_RETRY_DELAY))
+
+
+def send_queued_mail(batch_size=100, max_attempts=5):
+    """Send one batch of due emails over a single connection.
+
+    Failed emails are retried with exponential backoff until they have been
+    tried `max_attempts` times. Returns `(sent, failed)`.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # skip_locked lets several workers drain the queue on PostgreSQL
+        emails = list(
+            QueuedEmail.objects.select_for_update(skip_locked=True)
+            .filter(
+                sent_at__isnull=True,
+                next_attempt_at__lte=now,
+                attempts__lt=max_attempts,
+            )
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        if not emails:
+            return 0, 0
+
+        sent = failed = 0
+        with get_connection() as connection:
+            for email in emails:
+                email.attempts += 1
+                try:
+                    EmailMessage(
+                        subject=email.subject,
+                        body=email.message,
+                        from_email=email.from_email,
+                        to=email.recipient_list,
+                        connection=connection,
+                    ).send()
+                except Exception as error:  # pylint: disable=broad-exception-caught
+                    email.last_error = f"{type(error).__name__}: {error}"
+                    email.next_attempt_at = timezone.now() + get_backoff(email.attempts)
+                    failed += 1
+                else:
+                    email.sent_at = timezone.now()
+                    sent += 1
+
+        QueuedEmail.objects.bulk_update(
+            emails, ["attempts", "last_error", "next_attempt_at", "sent_at"]
+        )
+    return sent, failed
@@ -0,0 +1,150 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import SimpleLazyObject, cached_property
+
+
+def encode_cursor(position, reverse=False):
+    """Encode a `(date_added, pk)` style position into an opaque URL-safe token."""
+    date_added, pk = position
+    payload = json.dumps([date_added.isoformat(), pk, reverse])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Decode a token produced by `encode_cursor`.
+
+    Returns `((date_added, pk), reverse)` and raises `ValueError` on any
+    malformed input.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date_added, pk, reverse = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as error:
+        raise ValueError("Invalid cursor.") from error
+    date_added = parse_datetime(date_added) if isinstance(date_added, str) else None
+    if date_added is None or not isinstance(pk, int) or not isinstance(reverse, bool):
+        raise ValueError("Invalid cursor.")
+    return (date_added, pk), reverse
+
+
+class KeysetPage:
+    """A single page of a keyset paginated queryset.
+
+    The page is only fetched when it is first used, so a response rendered
+    from a cached template fragment never runs the query. `position_field`
+    is the field the queryset seeks on along with the pk.
+    """
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(
+        self, queryset, page_size, has_position, reverse, position_field="date_added"
+    ):
+        self.queryset = queryset
+        self.page_size = page_size
+        self.has_position = has_position
+        self.reverse = reverse
+        self.position_field = position_field
+
+    @cached_property
+    def fetched(self):  # pylint: disable=method-hidden
+        return self.split(list(self.queryset[: self.page_size + 1]))
+
+    async def afetch(self):
+        """Fetch the page through the async ORM, ahead of rendering."""
+        limited = self.queryset[: self.page_size + 1]
+        self.fetched = self.split([obj async for obj in limited])
+
+    def split(self, object_list):
+        has_more = len(object_list) > self.page_size
+        object_list = object_list[: self.page_size]
+        if self.reverse:
+            object_list.reverse()
+            return object_list, True, has_more
+        return object_list, has_more, self.has_position
+
+    @property
+    def object_list(self):
+        return self.fetched[0]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self.fetched[1]
+
+    def has_previous(self):
+        return self.fetched[2]
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next() or not self.object_list:
+            return None
+        last = self.object_list[-1]
+        return encode_cursor((getattr(last, self.position_field), last.pk))
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous() or not self.object_list:
+            return None
+        first = self.object_list[0]
+        return encode_cursor(
+            (getattr(first, self.position_field), first.pk), reverse=True
+        )
+
+
+class KeysetPaginationMixin:  # pylint: disable=too-few-public-methods
+    """Paginate a ListView by seeking on `(date_added, id)` instead of OFFSET.
+
+    Every page is fetched with a `WHERE (date_added, id) > cursor LIMIT n`
+    style query, so the cost of a page does not depend on how deep it is.
+    """
+
+    cursor_kwarg = "cursor"
+
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.request.GET.get(self.cursor_kwarg)
+        position, reverse = None, False
+        if cursor:
+            try:
+                position, reverse = decode_cursor(cursor)
+            except ValueError as error:
+                raise Http404("Invalid cursor.") from error
+
+        if reverse:
+            queryset = queryset.order_by("-date_added", "-id")
+        else:
+            queryset = queryset.order_by("date_added", "id")
+
+        if position is not None:
+            date_added, pk = position
+            # the redundant bound on date_added alone is what PostgreSQL can
+            # seek the index to; it can't turn the OR into a range
+            if reverse:
+                queryset = queryset.filter(
+                    Q(date_added__lt=date_added) | Q(date_added=date_added, id__lt=pk),
+                    date_added__lte=date_added,
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(date_added__gt=date_added) | Q(date_added=date_added, id__gt=pk),
+                    date_added__gte=date_added,
+                )
+
+        page = KeysetPage(queryset, page_size, position is not None, reverse)
+        # the page is passed as the object list too, so nothing is fetched
+        # until the template iterates it
+        return (None, page, page, SimpleLazyObject(page.has_other_pages))
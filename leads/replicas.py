@@ -0,0 +1,83 @@
+"""Send the reads of read-only views to a replica database.
+
+`ReplicaRouter` routes reads to the `replica` alias while a view wrapped in
+`ReplicaReadMixin` handles a request, and leaves every other query on the
+primary. Replicas lag behind the primary, so `PrimaryPinMixin` keeps a
+session on the primary for `DATABASE_REPLICA_PIN_SECONDS` after it writes,
+which lets users always see their own changes.
+
+Without a `replica` database configured everything stays on the primary.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+REPLICA = "replica"
+PINNED_UNTIL_SESSION_KEY = "primary_pinned_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+read_alias = ContextVar("read_alias", default=None)
+
+
+@contextmanager
+def use_replica():
+    """Route the reads made inside the block to the replica, if there is one."""
+    token = read_alias.set(REPLICA if REPLICA in connections else None)
+    try:
+        yield
+    finally:
+        read_alias.reset(token)
+
+
+class ReplicaRouter:
+    # pylint: disable=unused-argument
+    def db_for_read(self, model, **hints):
+        return read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same rows as the primary
+        return True
+
+
+def pin_to_primary(request):
+    request.session[PINNED_UNTIL_SESSION_KEY] = (
+        time.time() + settings.DATABASE_REPLICA_PIN_SECONDS
+    )
+
+
+def is_pinned_to_primary(request):
+    return request.session.get(PINNED_UNTIL_SESSION_KEY, 0) > time.time()
+
+
+class ReplicaReadMixin:  # pylint: disable=too-few-public-methods
+    """Serve the view from the replica unless the session recently wrote.
+
+    Put it after the access mixins, so the session and the user are still
+    loaded from the primary. The response is rendered inside the block since
+    lazy querysets only run when the template uses them.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if is_pinned_to_primary(request):
+            return super().dispatch(request, *args, **kwargs)
+        with use_replica():
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, "render"):
+                response.render()
+        return response
+
+
+class PrimaryPinMixin:  # pylint: disable=too-few-public-methods
+    """Pin the session to the primary after the view handles a write."""
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request)
+        return response
@@ -0,0 +1,155 @@
+"""Lead counts per day and per week, pre-aggregated for the analytics dashboard.
+
+`LeadRollup` holds one row per organisation, period, bucket, category and
+agent. `rollup_leads` adds the leads added since the organisation's
+high-water mark, `UserProfile.rolled_up_until`, with one grouped query per
+period over the `(organisation, date_added)` index, so each run only reads
+the new leads. The dashboard reads the rollups alone, so its cost depends on
+how many buckets it shows, not on how many leads there are.
+
+The rollups count each lead under the category and agent it had when it was
+rolled up, and keep counting deleted leads. `rollup_leads --full` rebuilds
+them from the lead table to take later changes in.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, DateField
+from django.db.models.functions import TruncDay, TruncWeek
+from django.utils import timezone
+
+from .models import Lead, LeadRollup, UserProfile
+
+TRUNCATIONS = {LeadRollup.DAY: TruncDay, LeadRollup.WEEK: TruncWeek}
+BUCKET_SIZES = {LeadRollup.DAY: timedelta(days=1), LeadRollup.WEEK: timedelta(weeks=1)}
+# leads still being written when a run starts may commit with an earlier
+# date_added than its high-water mark, so runs stop short of the present
+SETTLE_TIME = timedelta(minutes=5)
+
+
+def rollup_leads(organisation, until=None, full=False, batch_size=1000):
+    """Add the organisation's leads added up to `until` to its rollups.
+
+    Only the leads added after its high-water mark are counted, unless
+    `full` rebuilds the rollups from scratch. Returns the number of leads
+    counted.
+    """
+    if until is None:
+        until = timezone.now() - SETTLE_TIME
+    with transaction.atomic():
+        # one run at a time per organisation
+        organisation = UserProfile.objects.select_for_update().get(pk=organisation.pk)
+        since = None if full else organisation.rolled_up_until
+        if since is not None and since >= until:
+            return 0
+        if full:
+            LeadRollup.objects.filter(organisation=organisation).delete()
+
+        leads = Lead.objects.filter(organisation=organisation, date_added__lte=until)
+        if since is not None:
+            leads = leads.filter(date_added__gt=since)
+        counted = 0
+        for period, truncate in TRUNCATIONS.items():
+            counts = {
+                (bucket, category_id, agent_id): total
+                for bucket, category_id, agent_id, total in leads.annotate(
+                    bucket=truncate("date_added", output_field=DateField())
+                )
+                .order_by()
+                .values("bucket", "category", "agent")
+                .annotate(total=Count("id"))
+                .values_list("bucket", "category", "agent", "total")
+            }
+            add_counts(organisation, period, counts, batch_size)
+            counted = sum(counts.values())
+
+        organisation.rolled_up_until = until
+        organisation.save(update_fields=["rolled_up_until"])
+    return counted
+
+
+def add_counts(organisation, period, counts, batch_size):
+    """Add `counts`, by `(bucket, category_id, agent_id)`, to the rollups."""
+    if not counts:
+        return
+    # new leads only land in the latest buckets, so this reads a few rows
+    rollups = {
+        (rollup.bucket, rollup.category_id, rollup.agent_id): rollup
+        for rollup in LeadRollup.objects.filter(
+            organisation=organisation,
+            period=period,
+            bucket__gte=min(bucket for bucket, _, _ in counts),
+        )
+    }
+    changed, created = [], []
+    for key, total in counts.items():
+        if key in rollups:
+            rollups[key].lead_count += total
+            changed.append(rollups[key])
+        else:
+            bucket, category_id, agent_id = key
+            created.append(
+                LeadRollup(
+                    organisation=organisation,
+                    period=period,
+                    bucket=bucket,
+                    category_id=category_id,
+                    agent_id=agent_id,
+                    lead_count=total,
+                )
+            )
+    LeadRollup.objects.bulk_update(changed, ["lead_count"], batch_size=batch_size)
+    LeadRollup.objects.bulk_create(created, batch_size=batch_size)
+
+
+def get_buckets(period, count, today=None):
+    """The first days of the latest `count` buckets of `period`, oldest first."""
+    today = today or timezone.localdate()
+    if period == LeadRollup.WEEK:
+        today -= timedelta(days=today.weekday())
+    return [today - BUCKET_SIZES[period] * i for i in reversed(range(count))]
+
+
+def chart(rows, buckets):
+    """Lay `(bucket, label, lead_count)` rows out as a table.
+
+    Returns the sorted `labels` and the `rows`: for each bucket, its counts
+    by label, its total and that total as a percentage of the largest one.
+    """
+    counts = defaultdict(lambda: defaultdict(int))
+    for bucket, label, lead_count in rows:
+        counts[bucket][label] += lead_count
+    labels = sorted({label for by_label in counts.values() for label in by_label})
+    totals = [sum(counts[bucket].values()) for bucket in buckets]
+    largest = max(totals, default=0) or 1
+    return {
+        "labels": labels,
+        "rows": [
+            (
+                bucket,
+                [counts[bucket][label] for label in labels],
+                total,
+                total * 100 // largest,
+            )
+            for bucket, total in zip(buckets, totals)
+        ],
+    }
+
+
+def read_charts(organisation, period, count):
+    """`(title, chart)` of the organisation's leads per bucket of `period`,
+    by category and by agent, over the latest `count` buckets; from one
+    query of the rollups."""
+    buckets = get_buckets(period, count)
+    rows = LeadRollup.objects.filter(
+        organisation=organisation, period=period, bucket__gte=buckets[0]
+    ).values_list("bucket", "category__name", "agent__user__username", "lead_count")
+    by_category, by_agent = [], []
+    for bucket, category, agent, lead_count in rows:
+        by_category.append((bucket, category or "Uncategorised", lead_count))
+        by_agent.append((bucket, agent or "Unassigned", lead_count))
+    return [
+        ("By category", chart(by_category, buckets)),
+        ("By agent", chart(by_agent, buckets)),
+    ]
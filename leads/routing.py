@@ -0,0 +1,205 @@
+"""Assign unassigned leads to the organisation's agents automatically."""
+import heapq
+from bisect import bisect_right
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, When
+from django.utils.module_loading import import_string
+
+from .autocomplete import prefix_cache
+from .events import publish_lead_events
+from .models import (
+    Agent,
+    Lead,
+    LeadEvent,
+    UserProfile,
+    adjust_agent_lead_counts,
+    bump_cache_version,
+)
+from .timeline import describe, record
+
+
+class Router:
+    """Picks agents for the leads of `organisation`.
+
+    Subclasses implement `choose`, and `save` if they carry state over from
+    one batch to the next.
+    """
+
+    def __init__(self, organisation):
+        self.organisation = organisation
+        # with their users, whose names the timeline records
+        self.agents = list(
+            Agent.objects.filter(organisation=organisation).select_related("user")
+        )
+
+    def choose(self, lead):
+        raise NotImplementedError
+
+    def route(self, lead):
+        """Assign `lead` to the chosen agent, unsaved, and return the agent.
+
+        Returns `None` and leaves the lead alone if there are no agents.
+        """
+        if not self.agents:
+            return None
+        agent = self.choose(lead)
+        agent.lead_count += 1
+        lead.agent = agent
+        return agent
+
+    def save(self):
+        pass
+
+
+class RoundRobinRouter(Router):
+    """Take the agents in turn, from `UserProfile.routing_cursor` on."""
+
+    def __init__(self, organisation):
+        super().__init__(organisation)
+        self.pks = [agent.pk for agent in self.agents]
+
+    def choose(self, lead):
+        # the agent after the last one routed to, wrapping around
+        index = bisect_right(self.pks, self.organisation.routing_cursor)
+        agent = self.agents[index % len(self.agents)]
+        self.organisation.routing_cursor = agent.pk
+        return agent
+
+    def save(self):
+        UserProfile.objects.filter(pk=self.organisation.pk).update(
+            routing_cursor=self.organisation.routing_cursor
+        )
+
+
+class LeastOpenLeadsRouter(Router):
+    """Pick the agent with the fewest assigned leads (`Agent.lead_count`)."""
+
+    def __init__(self, organisation):
+        super().__init__(organisation)
+        self.heaps = {}
+
+    def get_candidates(self, lead):  # pylint: disable=unused-argument
+        """A key for the agents `lead` may go to, and the agents."""
+        return None, self.agents
+
+    def choose(self, lead):
+        key, agents = self.get_candidates(lead)
+        if key not in self.heaps:
+            self.heaps[key] = [(agent.lead_count, agent.pk, agent) for agent in agents]
+            heapq.heapify(self.heaps[key])
+        heap = self.heaps[key]
+        # entries of agents routed to through another heap are stale
+        while heap[0][0] != heap[0][2].lead_count:
+            agent = heap[0][2]
+            heapq.heapreplace(heap, (agent.lead_count, agent.pk, agent))
+        agent = heap[0][2]
+        heapq.heapreplace(heap, (agent.lead_count + 1, agent.pk, agent))
+        return agent
+
+
+class CategoryAffinityRouter(LeastOpenLeadsRouter):
+    """Pick the least loaded agent preferring the lead's category, if any."""
+
+    def __init__(self, organisation):
+        super().__init__(organisation)
+        agents = {agent.pk: agent for agent in self.agents}
+        self.affinities = defaultdict(list)
+        for category_id, agent_id in Agent.categories.through.objects.filter(
+            agent__organisation=organisation
+        ).values_list("category", "agent"):
+            self.affinities[category_id].append(agents[agent_id])
+
+    def get_candidates(self, lead):
+        if self.affinities.get(lead.category_id):
+            return lead.category_id, self.affinities[lead.category_id]
+        return super().get_candidates(lead)
+
+
+ROUTERS = {
+    "round-robin": RoundRobinRouter,
+    "least-open-leads": LeastOpenLeadsRouter,
+    "category-affinity": CategoryAffinityRouter,
+}
+
+
+def get_router_class(strategy=None):
+    """The router `strategy` names, a key of `ROUTERS` or a dotted path.
+
+    Defaults to `LEAD_ROUTING_STRATEGY`; `None` if that is empty.
+    """
+    strategy = settings.LEAD_ROUTING_STRATEGY if strategy is None else strategy
+    if not strategy:
+        return None
+    return ROUTERS.get(strategy) or import_string(strategy)
+
+
+def route_new_leads(leads, organisation):
+    """Pick agents for the unsaved `leads` that have none, with
+    `LEAD_ROUTING_STRATEGY`. Saving them maintains the agents' counters."""
+    router_class = get_router_class()
+    unassigned = [lead for lead in leads if lead.agent_id is None]
+    if router_class is None or not unassigned:
+        return
+    router = router_class(organisation)
+    for lead in unassigned:
+        router.route(lead)
+    router.save()
+
+
+def route_leads(organisation, router_class, chunk_size=500):
+    """Assign the organisation's unassigned leads with `router_class`.
+
+    The leads are locked and updated `chunk_size` at a time, each chunk with
+    one `UPDATE`, and one insert of their timeline events, in its own
+    transaction, whose commit publishes their lead events. Returns the number
+    of leads assigned.
+    """
+    router = router_class(organisation)
+    if not router.agents:
+        return 0
+    leads = (
+        Lead.objects.filter(organisation=organisation, agent__isnull=True)
+        .order_by("pk")
+        .only("pk", "category")
+    )
+    routed = last_pk = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(leads.filter(pk__gt=last_pk).select_for_update()[:chunk_size])
+            if not chunk:
+                break
+            routed += assign_chunk(chunk, router, organisation)
+        last_pk = chunk[-1].pk
+    if routed:
+        prefix_cache.invalidate(organisation.pk)
+    return routed
+
+
+def assign_chunk(leads, router, organisation):
+    assigned = defaultdict(list)
+    events = []
+    for lead in leads:
+        agent = router.route(lead)
+        assigned[agent.pk].append(lead.pk)
+        events.append(
+            LeadEvent(
+                lead=lead,
+                kind=LeadEvent.ASSIGNED,
+                changes={"agent": ["", describe(agent)]},
+            )
+        )
+    Lead.objects.filter(pk__in=[lead.pk for lead in leads]).update_and_touch(
+        agent=Case(*(When(pk__in=pks, then=pk) for pk, pks in assigned.items()))
+    )
+    adjust_agent_lead_counts({pk: len(pks) for pk, pks in assigned.items()})
+    record(events)
+    router.save()
+    bump_cache_version(organisation.pk)
+    # the leads were unassigned
+    publish_lead_events(
+        organisation.pk, [("assigned", lead.pk, None) for lead in leads]
+    )
+    return len(leads)
@@ -0,0 +1,123 @@
+"""Full-text search over leads, kept current by database triggers."""
+import re
+
+from django.db import NotSupportedError, connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+SEARCH_FIELDS = ("first_name", "last_name", "email", "phone_number", "description")
+
+SQLITE_COLUMNS = ", ".join(SEARCH_FIELDS)
+SQLITE_NEW_VALUES = ", ".join(f"new.{field}" for field in SEARCH_FIELDS)
+SQLITE_OLD_VALUES = ", ".join(f"old.{field}" for field in SEARCH_FIELDS)
+SQLITE_TRIGGERS = {
+    "leads_lead_fts_insert": f"""
+        CREATE TRIGGER leads_lead_fts_insert AFTER INSERT ON leads_lead BEGIN
+            INSERT INTO leads_lead_fts (rowid, {SQLITE_COLUMNS})
+            VALUES (new.id, {SQLITE_NEW_VALUES});
+        END
+    """,
+    "leads_lead_fts_delete": f"""
+        CREATE TRIGGER leads_lead_fts_delete AFTER DELETE ON leads_lead BEGIN
+            INSERT INTO leads_lead_fts (leads_lead_fts, rowid, {SQLITE_COLUMNS})
+            VALUES ('delete', old.id, {SQLITE_OLD_VALUES});
+        END
+    """,
+    "leads_lead_fts_update": f"""
+        CREATE TRIGGER leads_lead_fts_update AFTER UPDATE ON leads_lead BEGIN
+            INSERT INTO leads_lead_fts (leads_lead_fts, rowid, {SQLITE_COLUMNS})
+            VALUES ('delete', old.id, {SQLITE_OLD_VALUES});
+            INSERT INTO leads_lead_fts (rowid, {SQLITE_COLUMNS})
+            VALUES (new.id, {SQLITE_NEW_VALUES});
+        END
+    """,
+}
+
+
+def install_search_index(connection):
+    """Create or repair the FTS5 index of an SQLite `connection`.
+
+    This is idempotent, and run after every migration, since rebuilding
+    `leads_lead` to alter it drops the triggers that feed FTS5. PostgreSQL's
+    index is created by a migration.
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS leads_lead_fts USING fts5("
+            f"{SQLITE_COLUMNS}, content='leads_lead', content_rowid='id')"
+        )
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = 'leads_lead' AND name LIKE 'leads_lead_fts_%'"
+        )
+        missing = set(SQLITE_TRIGGERS) - {name for (name,) in cursor.fetchall()}
+        for name in sorted(missing):
+            cursor.execute(SQLITE_TRIGGERS[name])
+        if missing:
+            cursor.execute(
+                "INSERT INTO leads_lead_fts (leads_lead_fts) VALUES ('rebuild')"
+            )
+
+
+def get_match_expression(query):
+    """Turn free text into an FTS5 query that ANDs its quoted terms."""
+    terms = re.findall(r"\w+", query)
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def search_leads(queryset, query):
+    """Filter `queryset` to leads matching `query`, best matches first.
+
+    Only the search index is consulted; there is deliberately no `icontains`
+    fallback, which would scan the whole table.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == "postgresql":
+        if not query.strip():
+            return queryset.none()
+        tsquery = "websearch_to_tsquery('simple', %s)"
+        return (
+            queryset.filter(
+                RawSQL(
+                    f"leads_lead.search_vector @@ {tsquery}",
+                    [query],
+                    output_field=BooleanField(),
+                )
+            )
+            .annotate(
+                rank=RawSQL(
+                    f"ts_rank(leads_lead.search_vector, {tsquery})",
+                    [query],
+                    output_field=FloatField(),
+                )
+            )
+            .order_by("-rank", "id")
+        )
+    if vendor == "sqlite":
+        match = get_match_expression(query)
+        if not match:
+            return queryset.none()
+        return (
+            queryset.filter(
+                RawSQL(
+                    "leads_lead.id IN (SELECT rowid FROM leads_lead_fts "
+                    "WHERE leads_lead_fts MATCH %s)",
+                    [match],
+                    output_field=BooleanField(),
+                )
+            )
+            .annotate(
+                # bm25 is lower for better matches; weights follow SEARCH_FIELDS
+                rank=RawSQL(
+                    "SELECT bm25(leads_lead_fts, 10.0, 10.0, 5.0, 5.0, 1.0) "
+                    "FROM leads_lead_fts "
+                    "WHERE leads_lead_fts MATCH %s AND rowid = leads_lead.id",
+                    [match],
+                    output_field=FloatField(),
+                )
+            )
+            .order_by("rank", "id")
+        )
+    raise NotSupportedError(f"Lead search is not supported on {vendor}.")
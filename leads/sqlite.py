@@ -0,0 +1,21 @@
+"""Tune every new SQLite connection with the `SQLITE_PRAGMAS` setting.
+
+The default rollback journal makes a writer lock readers out until it
+commits. In WAL mode readers keep reading the last committed state while one
+writer appends to the log, and `synchronous=NORMAL` only syncs at
+checkpoints, which is still safe from corruption in that mode.
+"""
+from django.conf import settings
+
+
+def apply_pragmas(cursor, pragmas):
+    """Run `PRAGMA name = value` for each item of `pragmas`, in order."""
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def configure_sqlite_signal(connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, settings.SQLITE_PRAGMAS)
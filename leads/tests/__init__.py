@@ -1,10 +1,30 @@
 from django.contrib.staticfiles.testing import StaticLiveServerTestCase
-from django.test import TestCase
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from leads.autocomplete import prefix_cache
 from leads.models import User, Agent, Lead, Category
 
+# in-process caches, so the tests never clear the configured ones (a file
+# cache in the checkout by default) and parallel runs don't share them
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "tiered": {"BACKEND": "leads.cache.TwoTierCache", "LOCATION": "default"},
+}
 
+
+def clear_caches():
+    # caches outlive the rolled back test transactions
+    for cache in caches.all():
+        cache.clear()
+    prefix_cache.clear()
+
+
+@override_settings(CACHES=CACHES)
 class CRMTestCase(TestCase):
     def setUp(self) -> None:
+        clear_caches()
         self.default_username = "testuser"
         self.default_password = "testpass"
         self.default_user = User.objects.create_user(
@@ -26,8 +46,10 @@ class CRMTestCase(TestCase):
         )
 
 
+@override_settings(CACHES=CACHES)
 class CRMStaticLiveServerTestCase(StaticLiveServerTestCase):
     def setUp(self) -> None:
+        clear_caches()
         self.default_username = "testuser"
         self.default_password = "testpass"
         self.default_user = User.objects.create_user(
@@ -69,3 +91,28 @@ class ViewTestCase(CRMTestCase):
         self.client.logout()
         response = self.client.get(url, follow=True)
         self.assertRedirects(response, redirect_url)
+
+    def assert_query_count_is_flat(self, url, add_rows, rows=5):
+        """Assert that adding `rows` more rows via `add_rows` doesn't add queries."""
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        add_rows(rows)
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(url)
+        self.assertEqual(
+            len(before),
+            len(after),
+            f"{url} ran {len(before)} queries before adding {rows} rows "
+            f"and {len(after)} after.",
+        )
+
+    def assert_conditional_get_until(self, url, change):
+        """Assert that `url` answers revalidation with 304 until `change()`."""
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.templates)
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
@@ -0,0 +1,104 @@
+import importlib
+
+from django.conf import settings
+from django.test import AsyncClient, override_settings
+from django.urls import clear_url_caches, reverse
+
+import djcrm.urls
+import leads.urls
+from leads.async_views import AsyncLeadDetailView, AsyncLeadListView
+from leads.models import Lead
+from leads.tests import ViewTestCase
+
+
+@override_settings(ASYNC_VIEWS=True)
+class TestAsyncViews(ViewTestCase):
+    @classmethod
+    def setUpClass(cls):
+        # registered first so it runs last, once ASYNC_VIEWS is restored
+        cls.addClassCleanup(cls.reload_urls)
+        super().setUpClass()
+        cls.reload_urls()
+
+    @staticmethod
+    def reload_urls():
+        importlib.reload(leads.urls)
+        importlib.reload(djcrm.urls)
+        clear_url_caches()
+
+    def setUp(self):
+        super().setUp()
+        self.async_client.force_login(self.default_user)
+        self.unassigned_lead = Lead.objects.create(
+            first_name="Unassigned",
+            last_name="Lead",
+            description="Nobody owns this lead.",
+            organisation=self.default_user.userprofile,
+        )
+
+    def test_urls_use_the_async_views(self):
+        response = self.client.get(reverse("leads:lead-list"))
+        self.assertIsInstance(response.context["view"], AsyncLeadListView)
+        url = reverse("leads:lead-detail", args=[self.default_lead.pk])
+        response = self.client.get(url)
+        self.assertIsInstance(response.context["view"], AsyncLeadDetailView)
+
+    async def test_lead_list(self):
+        response = await self.async_client.get(reverse("leads:lead-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, self.default_lead.first_name)
+        self.assertContains(response, "Nobody owns this lead.")
+        self.assertIn("ETag", response.headers)
+
+    async def test_lead_list_answers_conditional_requests(self):
+        url = reverse("leads:lead-list")
+        response = await self.async_client.get(url)
+        response = await self.async_client.get(
+            url, headers={"If-None-Match": response.headers["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_cached_lead_list_skips_the_lead_queries(self):
+        url = reverse("leads:lead-list")
+        self.client.get(url)
+        # the user and organisation; the session comes from the cache
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertContains(response, self.default_lead.first_name)
+
+    async def test_lead_detail(self):
+        url = reverse("leads:lead-detail", args=[self.default_lead.pk])
+        response = await self.async_client.get(url)
+        self.assertContains(response, self.default_agent.user.username)
+        self.assertIn("Last-Modified", response.headers)
+        response = await self.async_client.get(
+            url, headers={"If-None-Match": response.headers["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_missing_lead_is_not_found(self):
+        url = reverse("leads:lead-detail", args=[self.default_lead.pk + 100])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_category_list(self):
+        response = await self.async_client.get(reverse("leads:category-list"))
+        self.assertContains(response, self.default_category.name)
+
+    async def test_category_detail(self):
+        self.default_lead.category = self.default_category
+        await self.default_lead.asave()
+        url = reverse("leads:category-detail", args=[self.default_category.pk])
+        response = await self.async_client.get(url)
+        self.assertContains(response, self.default_lead.last_name)
+
+    async def test_anonymous_users_are_redirected_to_login(self):
+        url = reverse("leads:lead-list")
+        response = await AsyncClient().get(url)
+        self.assertRedirects(
+            response, f"{settings.LOGIN_URL}?next={url}", fetch_redirect_response=False
+        )
+
+    async def test_only_get_is_allowed(self):
+        response = await self.async_client.post(reverse("leads:category-list"))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,154 @@
+import io
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+from leads.autocomplete import (
+    PrefixCache,
+    autocomplete_agents,
+    autocomplete_leads,
+)
+from leads.imports import import_leads
+from leads.models import Agent, Lead, User
+from leads.tests import CRMTestCase
+
+
+class TestPrefixCache(SimpleTestCase):
+    def test_evicts_least_recently_used_entries(self):
+        cache = PrefixCache(maxsize=2, timeout=60)
+        cache.set(1, "a", value=["a"])
+        cache.set(1, "b", value=["b"])
+        cache.get(1, "a")
+        cache.set(1, "c", value=["c"])
+        self.assertEqual(cache.get(1, "a"), ["a"])
+        self.assertIsNone(cache.get(1, "b"))
+        self.assertEqual(cache.get(1, "c"), ["c"])
+
+    def test_invalidate_only_drops_that_organisation(self):
+        cache = PrefixCache(maxsize=10, timeout=60)
+        cache.set(1, "a", value=["one"])
+        cache.set(2, "a", value=["two"])
+        cache.invalidate(1)
+        self.assertIsNone(cache.get(1, "a"))
+        self.assertEqual(cache.get(2, "a"), ["two"])
+
+    def test_entries_expire(self):
+        cache = PrefixCache(maxsize=10, timeout=60)
+        with mock.patch("leads.autocomplete.time.monotonic", return_value=0):
+            cache.set(1, "a", value=["a"])
+        with mock.patch("leads.autocomplete.time.monotonic", return_value=61):
+            self.assertIsNone(cache.get(1, "a"))
+
+
+class TestAutocompleteLeads(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organisation = self.default_user.userprofile
+        self.ada = Lead.objects.create(
+            first_name="Ada",
+            last_name="Lovelace",
+            email="countess@engines.com",
+            organisation=self.organisation,
+            agent=self.default_agent,
+        )
+        self.adam = Lead.objects.create(
+            first_name="Adam",
+            last_name="Smith",
+            email="adam@market.com",
+            organisation=self.organisation,
+        )
+
+    def ids(self, results):
+        return [result["id"] for result in results]
+
+    def test_matches_name_and_email_prefixes(self):
+        self.assertEqual(
+            self.ids(autocomplete_leads(self.default_user, self.organisation, " ADA")),
+            [self.ada.pk, self.adam.pk],
+        )
+        self.assertEqual(
+            self.ids(autocomplete_leads(self.default_user, self.organisation, "count")),
+            [self.ada.pk],
+        )
+        self.assertEqual(
+            self.ids(
+                autocomplete_leads(self.default_user, self.organisation, "ada  lov")
+            ),
+            [self.ada.pk],
+        )
+
+    def test_empty_prefix_matches_nothing(self):
+        self.assertEqual(
+            autocomplete_leads(self.default_user, self.organisation, ""), []
+        )
+
+    def test_agents_only_get_their_own_leads(self):
+        agent_user = self.default_agent.user
+        agent_user.is_organiser = False
+        agent_user.save()
+        # an organiser's cached results must not leak to the agent
+        autocomplete_leads(self.default_user, self.organisation, "ada")
+        self.assertEqual(
+            self.ids(autocomplete_leads(agent_user, self.organisation, "ada")),
+            [self.ada.pk],
+        )
+
+    def test_hot_prefixes_are_served_from_the_cache(self):
+        autocomplete_leads(self.default_user, self.organisation, "ada")
+        with CaptureQueriesContext(connection) as queries:
+            autocomplete_leads(self.default_user, self.organisation, "ada")
+        self.assertEqual(len(queries), 0)
+
+    def test_importing_leads_invalidates_the_cache(self):
+        autocomplete_leads(self.default_user, self.organisation, "jan")
+        file = io.BytesIO(
+            b"first_name,last_name,email,phone_number\nJane,Doe,jane@doe.com,123\n"
+        )
+        import_leads(file, self.organisation)
+        self.assertEqual(
+            self.ids(autocomplete_leads(self.default_user, self.organisation, "jan")),
+            [Lead.objects.get(first_name="Jane").pk],
+        )
+
+    def test_saving_a_lead_invalidates_the_cache(self):
+        autocomplete_leads(self.default_user, self.organisation, "ada")
+        self.ada.first_name = "Grace"
+        self.ada.save()
+        self.assertEqual(
+            self.ids(autocomplete_leads(self.default_user, self.organisation, "ada")),
+            [self.adam.pk],
+        )
+        self.assertEqual(
+            self.ids(autocomplete_leads(self.default_user, self.organisation, "grace")),
+            [self.ada.pk],
+        )
+
+
+class TestAutocompleteAgents(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organisation = self.default_user.userprofile
+
+    def test_matches_username_prefix_in_organisation(self):
+        other_user = User.objects.create_user(username="otheruser", password="testpass")
+        Agent.objects.create(
+            user=User.objects.create_user(username="agentother", password="testpass"),
+            organisation=other_user.userprofile,
+        )
+        self.assertEqual(
+            autocomplete_agents(self.organisation, "Agent"),
+            [{"id": self.default_agent.pk, "text": "agentuser"}],
+        )
+        self.assertEqual(autocomplete_agents(self.organisation, "x"), [])
+
+    def test_follows_username_changes(self):
+        autocomplete_agents(self.organisation, "ren")
+        user = self.default_agent.user
+        user.username = "renamed"
+        user.save()
+        self.assertEqual(
+            autocomplete_agents(self.organisation, "ren"),
+            [{"id": self.default_agent.pk, "text": "renamed"}],
+        )
@@ -0,0 +1,167 @@
+from unittest import mock
+
+from django.test import override_settings
+
+from leads.autocomplete import prefix_cache
+from leads.bulk import bulk_update_leads
+from leads.models import Agent, Category, Lead, LeadEvent, User, UserProfile
+from leads.tests import CRMTestCase
+
+
+class TestBulkUpdateLeads(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organisation = self.default_user.userprofile
+        self.other_agent = Agent.objects.create(
+            user=User.objects.create_user(username="otheragent", password="testpass"),
+            organisation=self.organisation,
+        )
+        self.other_category = Category.objects.create(
+            name="Contacted", organisation=self.organisation
+        )
+        for i in range(4):
+            Lead.objects.create(
+                first_name=f"Lead{i}",
+                last_name="Doe",
+                organisation=self.organisation,
+                agent=self.default_agent if i % 2 else None,
+                category=self.default_category if i < 2 else None,
+            )
+
+    def assert_counters_match_the_leads(self):
+        organisation = UserProfile.objects.get(pk=self.organisation.pk)
+        self.assertEqual(organisation.recount_leads(), 0)
+
+    def test_reassigns_an_agents_leads(self):
+        updated = bulk_update_leads(
+            Lead.objects.filter(agent=self.default_agent),
+            self.organisation,
+            {"agent": self.other_agent},
+        )
+        self.assertEqual(updated, 3)
+        self.assertFalse(Lead.objects.filter(agent=self.default_agent).exists())
+        self.assertEqual(Lead.objects.filter(agent=self.other_agent).count(), 3)
+
+    def test_recategorises_leads_and_adjusts_the_counters(self):
+        updated = bulk_update_leads(
+            Lead.objects.all(), self.organisation, {"category": self.other_category}
+        )
+        self.assertEqual(updated, 5)
+        self.other_category.refresh_from_db()
+        self.assertEqual(self.other_category.lead_count, 5)
+        self.assert_counters_match_the_leads()
+
+    def test_assigns_unassigned_leads_to_an_agent_and_category(self):
+        bulk_update_leads(
+            Lead.objects.filter(agent__isnull=True),
+            self.organisation,
+            {"agent": self.other_agent, "category": self.default_category},
+        )
+        self.assertEqual(
+            Lead.objects.filter(
+                agent=self.other_agent, category=self.default_category
+            ).count(),
+            2,
+        )
+        self.assert_counters_match_the_leads()
+
+    def test_records_the_moves_of_the_leads_that_changed(self):
+        bulk_update_leads(
+            Lead.objects.all(),
+            self.organisation,
+            {"agent": self.other_agent},
+            actor="testuser",
+        )
+        events = LeadEvent.objects.filter(kind=LeadEvent.ASSIGNED)
+        self.assertEqual(
+            sorted(event.changes["agent"][0] for event in events),
+            ["", "", "agentuser", "agentuser", "agentuser"],
+        )
+        self.assertEqual(
+            {(event.actor, event.changes["agent"][1]) for event in events},
+            {("testuser", "otheragent")},
+        )
+
+        bulk_update_leads(
+            Lead.objects.all(), self.organisation, {"agent": self.other_agent}
+        )
+        self.assertEqual(events.count(), 5)
+
+    @override_settings(LEAD_EVENTS_ENABLED=True)
+    def test_publishes_the_lead_events_of_each_chunk(self):
+        previous_agents = list(Lead.objects.order_by("pk").values_list("pk", "agent"))
+        with self.captureOnCommitCallbacks() as callbacks:
+            bulk_update_leads(
+                Lead.objects.all(),
+                self.organisation,
+                {"agent": self.other_agent},
+                chunk_size=2,
+            )
+            bulk_update_leads(
+                Lead.objects.all(),
+                self.organisation,
+                {"category": self.other_category},
+            )
+        # one for each chunk, which reads its leads with one query
+        self.assertEqual(len(callbacks), 4)
+        with mock.patch("leads.events.broker") as broker:
+            for callback in callbacks:
+                with self.assertNumQueries(1):
+                    callback()
+        published = [call.args[1] for call in broker.publish.call_args_list]
+        self.assertEqual(
+            [
+                (event["type"], event["lead"]["id"], event["previous_agent_id"])
+                for event in published
+            ],
+            [("assigned", pk, agent_id) for pk, agent_id in previous_agents]
+            + [("updated", pk, self.other_agent.pk) for pk, _ in previous_agents],
+        )
+        self.assertEqual(published[0]["lead"]["agent_id"], self.other_agent.pk)
+        self.assertEqual(published[-1]["lead"]["category"], "Contacted")
+
+    def test_leaves_other_organisations_alone(self):
+        other_organisation = self.default_agent.user.userprofile
+        other_lead = Lead.objects.create(
+            first_name="Other", last_name="Lead", organisation=other_organisation
+        )
+        bulk_update_leads(
+            Lead.objects.all(), self.organisation, {"agent": self.other_agent}
+        )
+        other_lead.refresh_from_db()
+        self.assertIsNone(other_lead.agent)
+
+    def test_runs_a_constant_number_of_queries_per_chunk(self):
+        # per chunk: a savepoint and its release, the locked pk lookup, the
+        # current categories, the update, the category and uncategorised
+        # counters, the timeline events and the cache version bump; then the
+        # empty last lookup
+        with self.assertNumQueries(3 * 9 + 3):
+            bulk_update_leads(
+                Lead.objects.order_by("-pk"),
+                self.organisation,
+                {"category": self.other_category},
+                chunk_size=2,
+            )
+        self.assert_counters_match_the_leads()
+
+    def test_invalidates_caches(self):
+        self.organisation.refresh_from_db()
+        version = self.organisation.cache_version
+        generation = prefix_cache.make_key(self.organisation.pk)
+        bulk_update_leads(
+            Lead.objects.all(), self.organisation, {"agent": self.other_agent}
+        )
+        self.organisation.refresh_from_db()
+        self.assertEqual(self.organisation.cache_version, version + 1)
+        self.assertNotEqual(prefix_cache.make_key(self.organisation.pk), generation)
+
+    def test_updating_nothing_changes_nothing(self):
+        # the empty lookup and its savepoint
+        with self.assertNumQueries(3):
+            updated = bulk_update_leads(
+                Lead.objects.filter(first_name="Nobody"),
+                self.organisation,
+                {"agent": self.other_agent},
+            )
+        self.assertEqual(updated, 0)
@@ -0,0 +1,87 @@
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from leads.tests import CRMTestCase, ViewTestCase
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "tiered": {
+        "BACKEND": "leads.cache.TwoTierCache",
+        "LOCATION": "default",
+        "OPTIONS": {"LOCAL_TIMEOUT": 30, "STATS_FLUSH_EVERY": 2},
+    },
+}
+
+
+@override_settings(CACHES=CACHES)
+class TestTwoTierCache(SimpleTestCase):
+    def setUp(self):
+        self.cache = caches["tiered"]
+        self.cache.clear()
+        self.cache.reset_stats()
+
+    def test_reads_through_to_the_shared_cache(self):
+        caches["default"].set("key", "value")
+        self.assertEqual(self.cache.get("key"), "value")
+        caches["default"].delete("key")
+        # now served from the local tier
+        self.assertEqual(self.cache.get("key"), "value")
+        self.assertEqual(self.cache.get("other", "default"), "default")
+        self.assertEqual(
+            self.cache.get_stats(),
+            {"local_hits": 1, "shared_hits": 1, "misses": 1, "hit_rate": 2 / 3},
+        )
+
+    def test_writes_go_to_both_tiers(self):
+        self.cache.set("key", "value")
+        self.assertEqual(caches["default"].get("key"), "value")
+        self.assertTrue(self.cache.add("new", 1))
+        self.assertFalse(self.cache.add("new", 2))
+        self.assertEqual(self.cache.incr("new"), 2)
+        self.assertEqual(self.cache.get("new"), 2)
+        self.cache.delete("key")
+        self.assertFalse(self.cache.has_key("key"))
+
+    def test_local_copies_never_outlive_the_shared_one(self):
+        self.cache.set("key", "value", timeout=5)
+        with mock.patch("time.time", return_value=time.time() + 10):
+            self.assertIsNone(self.cache.get("key"))
+
+    def test_stats_are_flushed_to_the_shared_cache(self):
+        self.cache.get("a")
+        self.cache.get("b")
+        self.assertEqual(caches["default"].get("two-tier-stats:default:misses"), 2)
+
+    def test_cache_stats_command(self):
+        self.cache.get("a")
+        stdout = StringIO()
+        call_command("cache_stats", "--reset", stdout=stdout)
+        self.assertEqual(
+            stdout.getvalue(),
+            "tiered: 0 local hits, 0 shared hits, 1 misses, hit rate 0.0%.\n",
+        )
+        self.assertEqual(self.cache.get_stats()["misses"], 0)
+
+
+class TestSessions(ViewTestCase):
+    def test_are_read_from_the_cache(self):
+        self.client.get(reverse("leads:lead-list"))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("leads:lead-list"))
+        self.assertFalse(
+            [query for query in queries if "django_session" in query["sql"]]
+        )
+
+
+class TestSuiteCaches(CRMTestCase):
+    def test_tests_never_touch_the_configured_caches(self):
+        self.assertIsInstance(caches["default"], LocMemCache)
@@ -0,0 +1,231 @@
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase
+
+from leads.models import Lead, LeadRollup, User, UserProfile
+from leads.outbox import queue_mail
+from leads.tests import CRMTestCase
+
+
+class TestExplainLeadQueriesCommand(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.default_agent.user.is_organiser = False
+        self.default_agent.user.save()
+
+    def test_prints_a_plan_for_each_view(self):
+        out = StringIO()
+        call_command("explain_lead_queries", stdout=out)
+        output = out.getvalue()
+        for label in (
+            "LeadListView (organiser)",
+            "LeadListView (agent)",
+            "LeadListView unassigned leads (organiser)",
+            "LeadDetailView (organiser)",
+            "LeadDetailView (agent)",
+            "CategoryListView (organiser)",
+            "CategoryListView (agent)",
+            "AgentListView (organiser)",
+        ):
+            self.assertIn(label, output)
+
+    def test_list_view_uses_tenant_index(self):
+        out = StringIO()
+        call_command("explain_lead_queries", stdout=out)
+        self.assertIn("lead_org_", out.getvalue())
+
+    def test_unknown_agent_raises_error(self):
+        with self.assertRaises(CommandError):
+            call_command("explain_lead_queries", agent="nobody", stdout=StringIO())
+
+
+class TestExplainLeadQueriesCommandWithoutData(TestCase):
+    def test_no_organiser_raises_error(self):
+        User.objects.create_user(
+            username="agent", password="testpass", is_organiser=False
+        )
+        with self.assertRaises(CommandError):
+            call_command("explain_lead_queries", stdout=StringIO())
+
+
+class TestRecountLeadsCommand(CRMTestCase):
+    def test_repairs_drifted_counters(self):
+        UserProfile.objects.update(lead_count=10)
+        out = StringIO()
+        call_command("recount_leads", stdout=out)
+        self.assertIn("Repaired 2 lead counters.", out.getvalue())
+        self.default_user.userprofile.refresh_from_db()
+        self.assertEqual(self.default_user.userprofile.lead_count, 1)
+
+    def test_only_recounts_given_organisations(self):
+        UserProfile.objects.update(lead_count=10)
+        call_command("recount_leads", self.default_username, stdout=StringIO())
+        self.default_agent.user.userprofile.refresh_from_db()
+        self.assertEqual(self.default_agent.user.userprofile.lead_count, 10)
+
+
+class TestRouteLeadsCommand(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.unassigned_lead = Lead.objects.create(
+            first_name="Unassigned",
+            last_name="Lead",
+            organisation=self.default_user.userprofile,
+        )
+
+    def test_routes_unassigned_leads(self):
+        out = StringIO()
+        call_command("route_leads", strategy="round-robin", stdout=out)
+        self.assertIn("Routed 1 leads.", out.getvalue())
+        self.unassigned_lead.refresh_from_db()
+        self.assertEqual(self.unassigned_lead.agent, self.default_agent)
+
+    def test_only_routes_given_organisations(self):
+        call_command(
+            "route_leads", "agentuser", strategy="round-robin", stdout=StringIO()
+        )
+        self.unassigned_lead.refresh_from_db()
+        self.assertIsNone(self.unassigned_lead.agent)
+
+    def test_requires_a_strategy(self):
+        with self.assertRaises(CommandError):
+            call_command("route_leads", stdout=StringIO())
+
+
+class TestFindDuplicateLeadsCommand(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.leads = [
+            Lead.objects.create(
+                first_name=name,
+                last_name="Doe",
+                email="john@doe.com",
+                organisation=self.default_user.userprofile,
+            )
+            for name in ("John", "Johnny")
+        ]
+
+    def test_lists_duplicates(self):
+        out = StringIO()
+        call_command("find_duplicate_leads", stdout=out)
+        self.assertIn(
+            f"lead {self.leads[0].pk} is duplicated by {self.leads[1].pk}",
+            out.getvalue(),
+        )
+        self.assertIn("Found 1 duplicate leads in 1 clusters.", out.getvalue())
+        self.assertEqual(Lead.objects.filter(email="john@doe.com").count(), 2)
+
+    def test_merges_duplicates(self):
+        out = StringIO()
+        call_command("find_duplicate_leads", merge=True, stdout=out)
+        self.assertIn("Merged 1 duplicate leads in 1 clusters.", out.getvalue())
+        self.assertEqual(
+            list(Lead.objects.filter(email="john@doe.com")), self.leads[:1]
+        )
+
+    def test_only_looks_in_given_organisations(self):
+        out = StringIO()
+        call_command("find_duplicate_leads", "agentuser", stdout=out)
+        self.assertIn("Found 0 duplicate leads in 0 clusters.", out.getvalue())
+
+
+class TestRollupLeadsCommand(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        # older than the leads still being written, which are left for later
+        Lead.objects.update(date_added=F("date_added") - timedelta(hours=1))
+
+    def test_rolls_up_new_leads(self):
+        out = StringIO()
+        call_command("rollup_leads", stdout=out)
+        self.assertIn("Rolled up 1 leads.", out.getvalue())
+        call_command("rollup_leads", stdout=out)
+        self.assertIn("Rolled up 0 leads.", out.getvalue())
+        self.assertEqual(LeadRollup.objects.count(), 2)
+
+    def test_rebuilds_the_rollups(self):
+        call_command("rollup_leads", stdout=StringIO())
+        out = StringIO()
+        call_command("rollup_leads", full=True, stdout=out)
+        self.assertIn("Rolled up 1 leads.", out.getvalue())
+        self.assertEqual(LeadRollup.objects.count(), 2)
+
+    def test_only_rolls_up_given_organisations(self):
+        out = StringIO()
+        call_command("rollup_leads", "agentuser", stdout=out)
+        self.assertIn("Rolled up 0 leads.", out.getvalue())
+
+
+class TestImportLeadsCommand(CRMTestCase):
+    def write_file(self, content):
+        file = tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False)
+        with file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def test_imports_file(self):
+        path = self.write_file(
+            "first_name,last_name,email,phone_number\n"
+            "John,Doe,john@doe.com,123\n"
+            "Jane,Doe,not-an-email,456\n"
+        )
+        out, err = StringIO(), StringIO()
+        call_command(
+            "import_leads",
+            path,
+            organiser=self.default_username,
+            stdout=out,
+            stderr=err,
+        )
+        self.assertIn("Imported 1 leads, 1 errors.", out.getvalue())
+        self.assertIn("Line 3: email", err.getvalue())
+        self.assertTrue(Lead.objects.filter(first_name="John").exists())
+
+    def test_unknown_organiser_raises_error(self):
+        path = self.write_file("first_name\n")
+        with self.assertRaises(CommandError):
+            call_command("import_leads", path, organiser="nobody", stdout=StringIO())
+
+    def test_missing_file_raises_error(self):
+        with self.assertRaises(CommandError):
+            call_command(
+                "import_leads",
+                "/nonexistent.csv",
+                organiser=self.default_username,
+                stdout=StringIO(),
+            )
+
+
+class TestSendQueuedMailCommand(TestCase):
+    def test_drains_the_outbox(self):
+        for _ in range(3):
+            queue_mail("Subject", "Message", "djcrm@djcrm.com", ["general@djcrm.com"])
+        out = StringIO()
+        call_command("send_queued_mail", batch_size=2, stdout=out)
+        self.assertIn("Sent 3 emails, 0 failed.", out.getvalue())
+        self.assertEqual(len(mail.outbox), 3)
+
+
+class TestBenchmarkSQLiteCommand(SimpleTestCase):
+    def test_compares_default_and_tuned_pragmas(self):
+        out = StringIO()
+        call_command(
+            "benchmark_sqlite",
+            "--seconds=0.2",
+            "--readers=2",
+            "--writers=1",
+            "--rows=100",
+            stdout=out,
+        )
+        output = out.getvalue()
+        self.assertIn("SQLite defaults:", output)
+        self.assertIn("SQLITE_PRAGMAS:", output)
+        self.assertIn("reads/s", output)
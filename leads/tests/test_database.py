@@ -0,0 +1,119 @@
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+import psycopg2
+from django.db import connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+
+from djcrm.pooled_postgresql import base
+from leads.sqlite import apply_pragmas, configure_sqlite_signal
+
+
+@mock.patch.object(base.psycopg2_pool, "ThreadedConnectionPool")
+class TestConnectionPool(SimpleTestCase):
+    def test_waits_for_a_free_connection_then_times_out(self, threaded_pool):
+        pool = base.ConnectionPool(1, 1, 0.01, dbname="djcrm")
+        connection = pool.getconn()
+        with self.assertRaises(psycopg2.OperationalError):
+            pool.getconn()
+        pool.putconn(connection)
+        self.assertIsNotNone(pool.getconn())
+        threaded_pool.assert_called_once_with(1, 1, dbname="djcrm")
+
+    def test_replaces_connections_closed_while_idle(self, threaded_pool):
+        closed, fresh = mock.Mock(closed=1), mock.Mock(closed=0)
+        threaded_pool.return_value.getconn.side_effect = [closed, fresh]
+        pool = base.ConnectionPool(1, 1, 0.01)
+        self.assertIs(pool.getconn(), fresh)
+        threaded_pool.return_value.putconn.assert_called_once_with(closed, close=True)
+
+    def test_closes_instead_of_pooling_broken_connections(self, threaded_pool):
+        threaded_pool.return_value.getconn.return_value.closed = 0
+        pool = base.ConnectionPool(1, 1, 0.01)
+        connection = pool.getconn()
+        pool.putconn(connection, close=True)
+        threaded_pool.return_value.putconn.assert_called_once_with(
+            connection, close=True
+        )
+
+    def test_pools_are_shared_per_alias_and_parameters(self, threaded_pool):
+        with mock.patch.object(base, "pools", {}):
+            pool = base.get_pool("test", {}, {"dbname": "djcrm"})
+            self.assertIs(base.get_pool("test", {}, {"dbname": "djcrm"}), pool)
+            self.assertIsNot(base.get_pool("test", {}, {"dbname": "other"}), pool)
+        self.assertEqual(threaded_pool.call_count, 2)
+
+
+@mock.patch("psycopg2.extras.register_default_jsonb")
+@mock.patch.object(base.psycopg2_pool, "ThreadedConnectionPool")
+class TestDatabaseWrapper(SimpleTestCase):
+    settings_dict = {
+        "ENGINE": "djcrm.pooled_postgresql",
+        "NAME": "djcrm",
+        "USER": "",
+        "PASSWORD": "",
+        "HOST": "",
+        "PORT": "",
+        "OPTIONS": {},
+        "TIME_ZONE": None,
+        "CONN_MAX_AGE": 0,
+        "CONN_HEALTH_CHECKS": False,
+        "AUTOCOMMIT": True,
+        "ATOMIC_REQUESTS": False,
+        "TEST": {},
+        "POOL": {"MIN_SIZE": 1, "MAX_SIZE": 2, "TIMEOUT": 1},
+    }
+
+    def test_borrows_and_returns_pooled_connections(self, threaded_pool, _):
+        connection = threaded_pool.return_value.getconn.return_value
+        connection.closed = 0
+        wrapper = base.DatabaseWrapper(dict(self.settings_dict), "pooled")
+        with mock.patch.object(base, "pools", {}):
+            params = wrapper.get_connection_params()
+            self.assertIs(wrapper.get_new_connection(params), connection)
+            self.assertIs(wrapper.Database, psycopg2)
+            wrapper.connection = connection
+            wrapper.close()
+        threaded_pool.return_value.putconn.assert_called_once_with(
+            connection, close=False
+        )
+        connection.close.assert_not_called()
+
+
+class TestSQLitePragmas(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "db.sqlite3")
+
+    def get_pragma(self, cursor, name):
+        cursor.execute(f"PRAGMA {name}")
+        return cursor.fetchone()[0]
+
+    def test_applies_pragmas(self):
+        connection = sqlite3.connect(self.path)
+        self.addCleanup(connection.close)
+        cursor = connection.cursor()
+        apply_pragmas(
+            cursor, {"busy_timeout": 1234, "journal_mode": "wal", "synchronous": 1}
+        )
+        self.assertEqual(self.get_pragma(cursor, "busy_timeout"), 1234)
+        self.assertEqual(self.get_pragma(cursor, "journal_mode"), "wal")
+        self.assertEqual(self.get_pragma(cursor, "synchronous"), 1)
+
+    @override_settings(SQLITE_PRAGMAS={"journal_mode": "wal", "cache_size": -2000})
+    def test_configures_new_sqlite_connections(self):
+        settings_dict = {**connections["default"].settings_dict, "NAME": self.path}
+        wrapper = DatabaseWrapper(settings_dict, alias="pragmas")
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            self.assertEqual(self.get_pragma(cursor, "journal_mode"), "wal")
+            self.assertEqual(self.get_pragma(cursor, "cache_size"), -2000)
+
+    def test_leaves_other_databases_alone(self):
+        connection = mock.Mock(vendor="postgresql")
+        configure_sqlite_signal(sender=None, connection=connection)
+        connection.cursor.assert_not_called()
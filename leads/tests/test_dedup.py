@@ -0,0 +1,95 @@
+from leads.dedup import cluster_duplicates, find_duplicate, merge_duplicates
+from leads.models import Lead, LeadEvent, UserProfile
+from leads.tests import CRMTestCase
+
+
+class DedupTestCase(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organisation = self.default_user.userprofile
+
+    def make_lead(self, email="", phone_number="", **kwargs):
+        kwargs.setdefault("organisation", self.organisation)
+        return Lead.objects.create(
+            first_name="Lead",
+            last_name="Doe",
+            email=email,
+            phone_number=phone_number,
+            **kwargs,
+        )
+
+
+class TestFindDuplicate(DedupTestCase):
+    def test_matches_normalised_email_or_phone(self):
+        lead = self.make_lead("john@doe.com", "+1 (555) 123")
+        self.assertEqual(find_duplicate(self.organisation, " John@Doe.com", ""), lead)
+        self.assertEqual(find_duplicate(self.organisation, "", "1-555-123"), lead)
+        self.assertIsNone(find_duplicate(self.organisation, "jane@doe.com", "999"))
+
+    def test_ignores_blank_keys_other_organisations_and_the_lead_itself(self):
+        lead = self.make_lead("john@doe.com")
+        self.make_lead("jane@doe.com", organisation=self.default_agent.user.userprofile)
+        self.assertIsNone(find_duplicate(self.organisation, "", ""))
+        self.assertIsNone(find_duplicate(self.organisation, "jane@doe.com", ""))
+        self.assertIsNone(
+            find_duplicate(self.organisation, "john@doe.com", "", exclude_pk=lead.pk)
+        )
+
+
+class TestClusterDuplicates(DedupTestCase):
+    def test_clusters_leads_linked_by_email_or_phone(self):
+        first = self.make_lead("john@doe.com", "111")
+        same_email = self.make_lead("JOHN@doe.com", "222")
+        # linked to the first through same_email's phone
+        same_phone = self.make_lead("johnny@doe.com", "2-2-2")
+        other = self.make_lead("jane@doe.com", "333")
+        other_copy = self.make_lead("jane@doe.com", "")
+        self.make_lead("jim@doe.com", "444")
+
+        self.assertCountEqual(
+            cluster_duplicates(self.organisation),
+            [[first.pk, same_email.pk, same_phone.pk], [other.pk, other_copy.pk]],
+        )
+
+    def test_keeps_the_oldest_lead_first_when_clusters_join(self):
+        first = self.make_lead("a@doe.com", "111")
+        second = self.make_lead("b@doe.com", "222")
+        third = self.make_lead("b@doe.com", "333")
+        fourth = self.make_lead("a@doe.com", "333")
+        self.assertEqual(
+            cluster_duplicates(self.organisation),
+            [[first.pk, second.pk, third.pk, fourth.pk]],
+        )
+
+    def test_only_reads_the_duplicated_leads(self):
+        for i in range(5):
+            self.make_lead(f"lead{i}@doe.com", str(i))
+        # the grouped keys are a subquery of the one read of the leads
+        with self.assertNumQueries(1):
+            self.assertEqual(cluster_duplicates(self.organisation), [])
+
+
+class TestMergeDuplicates(DedupTestCase):
+    def test_merges_into_the_oldest_lead(self):
+        first = self.make_lead("john@doe.com")
+        second = self.make_lead(
+            "john@doe.com",
+            age=40,
+            agent=self.default_agent,
+            category=self.default_category,
+            description="Met at the fair.",
+        )
+        third = self.make_lead("john@doe.com", age=50)
+
+        lead = merge_duplicates([first.pk, second.pk, third.pk])
+
+        self.assertEqual(lead.pk, first.pk)
+        lead.refresh_from_db()
+        self.assertEqual(lead.age, 40)
+        self.assertEqual(lead.agent, self.default_agent)
+        self.assertEqual(lead.category, self.default_category)
+        self.assertEqual(lead.description, "Met at the fair.")
+        self.assertFalse(Lead.objects.filter(pk__in=[second.pk, third.pk]).exists())
+        organisation = UserProfile.objects.get(pk=self.organisation.pk)
+        self.assertEqual(organisation.recount_leads(), 0)
+        self.assertEqual(lead.events.get().kind, LeadEvent.MERGED)
@@ -0,0 +1,196 @@
+# the anext() builtin is new in Python 3.10
+# pylint: disable=unnecessary-dunder-call
+from unittest import mock
+
+from django.conf import settings
+from django.test import AsyncClient, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from leads import events
+from leads.async_views import LeadEventStreamView
+from leads.events import CacheBroker, LocalBroker, publish_lead_events
+from leads.models import Lead
+from leads.tests import CRMTestCase, ViewTestCase
+
+
+def make_event(event_type, agent_id, previous_agent_id=None):
+    return {
+        "type": event_type,
+        "previous_agent_id": previous_agent_id,
+        "lead": {"id": 1, "first_name": "Test", "agent_id": agent_id},
+    }
+
+
+class TestBrokers(SimpleTestCase):
+    async def test_local_broker_delivers_to_the_organisation(self):
+        broker = LocalBroker()
+        subscription = broker.subscribe(1, heartbeat=1)
+        other = broker.subscribe(2, heartbeat=0.01)
+        broker.publish(1, {"type": "created"})
+        self.assertEqual(await subscription.__anext__(), {"type": "created"})
+        self.assertIsNone(await other.__anext__())
+        subscription.close()
+        other.close()
+        self.assertFalse(broker.subscriptions[1] or broker.subscriptions[2])
+
+    async def test_slow_subscribers_lose_the_oldest_events(self):
+        subscription = LocalBroker(maxsize=1).subscribe(1, heartbeat=1)
+        subscription.deliver("first")
+        subscription.deliver("second")
+        self.assertEqual(await subscription.__anext__(), "second")
+
+    async def test_cache_broker_relays_events_through_the_cache(self):
+        broker = CacheBroker(poll_interval=0.01)
+        subscription = broker.subscribe(1, heartbeat=0.1)
+        poller = broker.pollers[(subscription.loop, 1)]
+        # events published before the poller starts are not relayed
+        self.assertIsNone(await subscription.__anext__())
+        # published by another process, i.e. straight into the cache
+        CacheBroker().publish(1, {"type": "created"})
+        CacheBroker().publish(1, {"type": "updated"})
+        self.assertEqual(await subscription.__anext__(), {"type": "created"})
+        self.assertEqual(await subscription.__anext__(), {"type": "updated"})
+        subscription.close()
+        await poller
+        self.assertNotIn((subscription.loop, 1), broker.pollers)
+
+
+@override_settings(LEAD_EVENTS_ENABLED=True)
+class TestLeadEventSignals(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(events, "broker")
+        self.broker = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def published(self):
+        return [call.args[1] for call in self.broker.publish.call_args_list]
+
+    def test_saving_and_deleting_leads_publish_events(self):
+        organisation = self.default_user.userprofile
+        with self.captureOnCommitCallbacks(execute=True):
+            lead = Lead.objects.create(
+                first_name="New",
+                last_name="Lead",
+                organisation=organisation,
+                category=self.default_category,
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            lead.agent = self.default_agent
+            lead.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            lead.first_name = "Renamed"
+            lead.save()
+        pk = lead.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            lead.delete()
+
+        published = self.published()
+        self.assertEqual(
+            [event["type"] for event in published],
+            ["created", "assigned", "updated", "deleted"],
+        )
+        self.assertEqual([event["lead"]["id"] for event in published], [pk] * 4)
+        self.assertEqual(published[0]["lead"]["category"], self.default_category.name)
+        self.assertEqual(published[1]["previous_agent_id"], None)
+        self.assertEqual(published[1]["lead"]["agent_id"], self.default_agent.pk)
+        self.assertEqual(published[2]["lead"]["first_name"], "Renamed")
+        self.broker.publish.assert_called_with(organisation.pk, published[3])
+
+    def test_loaded_leads_remember_their_agent(self):
+        lead = Lead.objects.get(pk=self.default_lead.pk)
+        lead.agent = None
+        with self.captureOnCommitCallbacks(execute=True):
+            lead.save()
+        [event] = self.published()
+        self.assertEqual(event["type"], "assigned")
+        self.assertEqual(event["previous_agent_id"], self.default_agent.pk)
+
+    @override_settings(LEAD_EVENTS_ENABLED=False)
+    def test_nothing_is_published_when_disabled(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.default_lead.save()
+            publish_lead_events(
+                self.default_lead.organisation_id, [("updated", 1, None)]
+            )
+        self.assertEqual(callbacks, [])
+
+    def test_rolled_back_saves_publish_nothing(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.default_lead.save()
+        self.assertEqual(len(callbacks), 1)
+        self.broker.publish.assert_not_called()
+
+
+@override_settings(LEAD_EVENTS_ENABLED=True)
+class TestLeadEventStreamView(ViewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.async_client.force_login(self.default_user)
+        self.agent_client = AsyncClient()
+        self.agent_client.force_login(self.default_agent.user)
+
+    async def read(self, stream, count):
+        return [await stream.__anext__() for _ in range(count)]
+
+    async def test_streams_server_sent_events(self):
+        response = await self.async_client.get(reverse("leads:lead-events"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Type"], "text/event-stream")
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+
+    def test_answers_wsgi_requests_straight_away(self):
+        # a WSGI server would otherwise collect the endless stream first
+        response = self.client.get(reverse("leads:lead-events"))
+        self.assertEqual(response.status_code, 204)
+
+    @override_settings(LEAD_EVENTS_ENABLED=False)
+    async def test_answers_204_when_disabled(self):
+        response = await self.async_client.get(reverse("leads:lead-events"))
+        self.assertEqual(response.status_code, 204)
+
+    async def test_agents_can_stream_their_events(self):
+        response = await self.agent_client.get(reverse("leads:lead-events"))
+        self.assertEqual(response.status_code, 200)
+
+    async def test_anonymous_users_are_redirected_to_login(self):
+        url = reverse("leads:lead-events")
+        response = await AsyncClient().get(url)
+        self.assertRedirects(
+            response, f"{settings.LOGIN_URL}?next={url}", fetch_redirect_response=False
+        )
+
+    async def test_organisers_see_every_assigned_lead(self):
+        organisation_id = self.default_user.userprofile.pk
+        stream = LeadEventStreamView().stream(organisation_id, None)
+        self.assertEqual(await stream.__anext__(), "retry: 5000\n\n")
+        events.broker.publish(organisation_id, make_event("created", None))
+        events.broker.publish(organisation_id, make_event("assigned", 7))
+        events.broker.publish(organisation_id, make_event("deleted", 7))
+        created, assigned, deleted = await self.read(stream, 3)
+        self.assertTrue(created.startswith("event: created\n"))
+        self.assertIn('"listed": false', created)
+        self.assertIn('"listed": true', assigned)
+        self.assertIn('"listed": false', deleted)
+        await stream.aclose()
+        self.assertFalse(events.broker.subscriptions[organisation_id])
+
+    async def test_agents_only_see_their_own_leads(self):
+        organisation_id = self.default_user.userprofile.pk
+        stream = LeadEventStreamView().stream(organisation_id, 7)
+        await stream.__anext__()
+        events.broker.publish(organisation_id, make_event("assigned", 8))
+        events.broker.publish(organisation_id, make_event("assigned", 7, 8))
+        events.broker.publish(organisation_id, make_event("assigned", 8, 7))
+        gained, lost = await self.read(stream, 2)
+        self.assertIn('"listed": true', gained)
+        self.assertIn('"previous_agent_id": 7', lost)
+        self.assertIn('"listed": false', lost)
+        await stream.aclose()
+
+    @override_settings(LEAD_EVENTS_HEARTBEAT=0.01)
+    async def test_idle_streams_are_kept_alive(self):
+        stream = LeadEventStreamView().stream(self.default_user.userprofile.pk, None)
+        await stream.__anext__()
+        self.assertEqual(await stream.__anext__(), ": keep-alive\n\n")
+        await stream.aclose()
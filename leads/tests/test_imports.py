@@ -0,0 +1,178 @@
+import csv
+import io
+from unittest import mock
+
+from django.test import override_settings
+
+from leads.imports import import_leads
+from leads.models import Lead, LeadEvent, QueuedEmail, UserProfile
+from leads.tests import CRMTestCase
+
+
+class TestImportLeads(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organisation = self.default_user.userprofile
+
+    def make_file(self, *rows):
+        header = "first_name,last_name,age,email,phone_number,category,agent\n"
+        return io.BytesIO((header + "\n".join(rows) + "\n").encode())
+
+    def test_imports_valid_rows(self):
+        file = self.make_file(
+            "John,Doe,33,john@doe.com,123,New,agentuser",
+            "Jane,Doe,,jane@doe.com,456,,",
+        )
+        result = import_leads(file, self.organisation)
+
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.errors, [])
+        john = Lead.objects.get(first_name="John")
+        self.assertEqual(john.organisation, self.organisation)
+        self.assertEqual(john.category, self.default_category)
+        self.assertEqual(john.agent, self.default_agent)
+        self.assertEqual(john.lookup_name, "john doe")
+        jane = Lead.objects.get(first_name="Jane")
+        self.assertIsNone(jane.age)
+        self.assertIsNone(jane.category)
+
+    def test_starts_the_timelines_of_the_new_leads(self):
+        file = self.make_file("John,Doe,33,john@doe.com,123,,")
+        import_leads(file, self.organisation, actor="testuser")
+        event = LeadEvent.objects.get()
+        self.assertEqual(event.lead, Lead.objects.get(first_name="John"))
+        self.assertEqual((event.kind, event.actor), (LeadEvent.CREATED, "testuser"))
+
+    def test_reports_invalid_rows_without_aborting(self):
+        file = self.make_file(
+            "John,Doe,33,not-an-email,123,,",
+            "Jane,Doe,28,jane@doe.com,456,Unknown,",
+            "Jim,Doe,28,jim@doe.com,789,,nobody",
+            "Joe,Doe,28,joe@doe.com,789,,",
+        )
+        result = import_leads(file, self.organisation)
+
+        self.assertEqual(result.created, 1)
+        self.assertEqual([line for line, _ in result.errors], [2, 3, 4])
+        self.assertTrue(Lead.objects.filter(first_name="Joe").exists())
+        self.assertFalse(Lead.objects.filter(first_name="John").exists())
+
+    def test_skips_rows_that_are_not_utf_8(self):
+        file = io.BytesIO(
+            b"first_name,last_name,email,phone_number\n"
+            b"Jos\xe9,Doe,jose@doe.com,123\n"
+            b"John,Doe,john@doe.com,456\n"
+        )
+        result = import_leads(file, self.organisation)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [(2, "The row isn't valid UTF-8.")])
+        self.assertTrue(Lead.objects.filter(first_name="John").exists())
+
+    def test_stops_at_malformed_csv_and_keeps_the_rows_before(self):
+        field_limit = csv.field_size_limit()
+        file = self.make_file(
+            "John,Doe,33,john@doe.com,123,,",
+            f"Jane,{'x' * (field_limit + 1)},28,jane@doe.com,456,,",
+            "Jim,Doe,28,jim@doe.com,789,,",
+        )
+        result = import_leads(file, self.organisation)
+        self.assertEqual(result.created, 1)
+        self.assertEqual([line for line, _ in result.errors], [3])
+        self.assertIn("the rest was not imported", result.errors[0][1])
+        self.assertTrue(Lead.objects.filter(first_name="John").exists())
+
+    def test_does_not_resolve_names_from_other_organisations(self):
+        other_user = self.default_agent.user
+        other_user.userprofile.category_set.create(name="Other")
+        result = import_leads(
+            self.make_file("John,Doe,33,john@doe.com,123,Other,"), self.organisation
+        )
+        self.assertEqual(result.created, 0)
+        self.assertEqual(len(result.errors), 1)
+
+    def test_batches_queries(self):
+        rows = [f"Lead{i},Doe,33,lead{i}@doe.com,{i},New,agentuser" for i in range(20)]
+        # per batch: three lookups, the insert, two counter updates, the agent
+        # counter update, the timeline events, the cache version bump and a
+        # savepoint
+        with self.assertNumQueries(2 * 11):
+            result = import_leads(
+                self.make_file(*rows), self.organisation, batch_size=10, notify=False
+            )
+        self.assertEqual(result.created, 20)
+
+    def test_updates_lead_counters(self):
+        import_leads(
+            self.make_file(
+                "John,Doe,33,john@doe.com,123,New,", "Jane,Doe,,jane@doe.com,456,,"
+            ),
+            self.organisation,
+        )
+        organisation = UserProfile.objects.get(pk=self.organisation.pk)
+        self.default_category.refresh_from_db()
+        self.assertEqual(organisation.lead_count, 3)
+        self.assertEqual(organisation.uncategorised_lead_count, 2)
+        self.assertEqual(self.default_category.lead_count, 1)
+
+    @override_settings(LEAD_ROUTING_STRATEGY="round-robin")
+    def test_routes_leads_without_an_agent(self):
+        import_leads(
+            self.make_file("John,Doe,33,john@doe.com,123,,"), self.organisation
+        )
+        self.assertEqual(Lead.objects.get(first_name="John").agent, self.default_agent)
+        self.default_agent.refresh_from_db()
+        self.assertEqual(self.default_agent.lead_count, 2)
+
+    @override_settings(LEAD_EVENTS_ENABLED=True, LEAD_ROUTING_STRATEGY="round-robin")
+    def test_publishes_the_new_leads_of_each_batch(self):
+        file = self.make_file(
+            "John,Doe,33,john@doe.com,123,,",
+            "Jane,Doe,,jane@doe.com,456,,",
+            "Jim,Doe,,jim@doe.com,789,,",
+        )
+        with mock.patch("leads.events.broker") as broker:
+            with self.captureOnCommitCallbacks(execute=True):
+                import_leads(file, self.organisation, batch_size=2)
+        published = [call.args[1] for call in broker.publish.call_args_list]
+        self.assertEqual(
+            [(event["type"], event["lead"]["first_name"]) for event in published],
+            [("created", "John"), ("created", "Jane"), ("created", "Jim")],
+        )
+        self.assertEqual(published[0]["lead"]["agent_id"], self.default_agent.pk)
+
+    def test_reports_duplicates_of_leads_and_earlier_rows(self):
+        Lead.objects.create(
+            first_name="Existing",
+            last_name="Lead",
+            email="john@doe.com",
+            phone_number="111",
+            organisation=self.organisation,
+        )
+        result = import_leads(
+            self.make_file(
+                "John,Doe,33,JOHN@doe.com,222,,",
+                "Jane,Doe,28,jane@doe.com,(333) 4,,",
+                "Janet,Doe,28,janet@doe.com,3-3-3-4,,",
+            ),
+            self.organisation,
+        )
+        self.assertEqual(result.created, 1)
+        self.assertEqual(
+            result.errors,
+            [
+                (2, "Duplicate of an existing lead."),
+                (4, "Duplicate of an existing lead."),
+            ],
+        )
+
+    def test_accepts_exported_headers(self):
+        file = io.BytesIO(
+            b"First Name,Last Name,Email,Phone Number\nJohn,Doe,john@doe.com,123\n"
+        )
+        self.assertEqual(import_leads(file, self.organisation).created, 1)
+
+    def test_queues_a_single_summary_email(self):
+        rows = [f"Lead{i},Doe,33,lead{i}@doe.com,{i},," for i in range(5)]
+        import_leads(self.make_file(*rows), self.organisation, batch_size=2)
+        self.assertEqual(QueuedEmail.objects.count(), 1)
+        self.assertIn("5 leads", QueuedEmail.objects.get().message)
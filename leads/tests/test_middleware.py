@@ -0,0 +1,51 @@
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+
+from leads.middleware import OrganisationMiddleware, resolve_organisation
+from leads.models import Agent, User
+from leads.tests import CRMTestCase
+
+
+class TestResolveOrganisation(CRMTestCase):
+    def test_organiser_resolves_to_their_profile(self):
+        user = User.objects.get(pk=self.default_user.pk)
+        with self.assertNumQueries(1):
+            organisation = resolve_organisation(user)
+        self.assertEqual(organisation, self.default_user.userprofile)
+
+    def test_agent_resolves_to_their_organisation_in_one_query(self):
+        agent_user = User.objects.create_user(
+            username="newagentuser", password="testpass", is_organiser=False
+        )
+        Agent.objects.create(
+            user=agent_user, organisation=self.default_user.userprofile
+        )
+        user = User.objects.get(pk=agent_user.pk)
+        with self.assertNumQueries(1):
+            organisation = resolve_organisation(user)
+        self.assertEqual(organisation, self.default_user.userprofile)
+
+    def test_anonymous_user_has_no_organisation(self):
+        with self.assertNumQueries(0):
+            self.assertIsNone(resolve_organisation(AnonymousUser()))
+
+
+class TestOrganisationMiddleware(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.request = RequestFactory().get("/")
+        self.request.user = self.user
+
+    def test_organisation_is_resolved_lazily_and_once(self):
+        def view(request):
+            with self.assertNumQueries(1):
+                self.assertEqual(request.organisation.pk, self.user.userprofile.pk)
+                self.assertEqual(request.organisation.user_id, self.user.pk)
+            return HttpResponse()
+
+        OrganisationMiddleware(view)(self.request)
+
+    def test_organisation_is_not_resolved_if_unused(self):
+        with self.assertNumQueries(0):
+            OrganisationMiddleware(lambda request: HttpResponse())(self.request)
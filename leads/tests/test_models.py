@@ -134,6 +134,11 @@ class TestLeadModel(TestCase):
         self.default_lead.save()
         self.assertEqual(self.default_lead.first_name, "Jani")
 
+    def test_updated_at_moves_on_save(self):
+        updated_at = self.default_lead.updated_at
+        self.default_lead.save()
+        self.assertGreater(self.default_lead.updated_at, updated_at)
+
     def test_lead_delete(self):
         initial_count = Lead.objects.count()
         john_doe = Lead.objects.create(
@@ -285,7 +290,7 @@ class TestCategoryModel(CRMTestCase):
         except Category.DoesNotExist:
             pass
 
-    def test_count_property(self):
+    def test_lead_count(self):
         test_category = Category.objects.create(
             name="Test Category",
             organisation=self.default_user.userprofile,
@@ -296,7 +301,8 @@ class TestCategoryModel(CRMTestCase):
             organisation=self.default_user.userprofile,
             category=test_category,
         )
-        self.assertEqual(test_category.count, 1)
+        test_category.refresh_from_db()
+        self.assertEqual(test_category.lead_count, 1)
 
     def test_name_should_be_mandatory(self):
         with self.assertRaises(IntegrityError):
@@ -307,3 +313,194 @@ class TestCategoryModel(CRMTestCase):
         with self.assertRaises(IntegrityError):
             self.default_category.organisation = None
             self.default_category.save()
+
+
+class TestLeadCounters(CRMTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.organisation = self.default_user.userprofile
+
+    def assert_counters(self, lead_count, uncategorised_lead_count, category_count):
+        self.organisation.refresh_from_db()
+        self.default_category.refresh_from_db()
+        self.assertEqual(self.organisation.lead_count, lead_count)
+        self.assertEqual(
+            self.organisation.uncategorised_lead_count, uncategorised_lead_count
+        )
+        self.assertEqual(self.default_category.lead_count, category_count)
+
+    def test_creating_leads_increments_counters(self):
+        Lead.objects.create(
+            first_name="John",
+            last_name="Doe",
+            organisation=self.organisation,
+            category=self.default_category,
+        )
+        self.assert_counters(2, 1, 1)
+
+    def test_changing_category_moves_lead_between_counters(self):
+        lead = Lead.objects.get(pk=self.default_lead.pk)
+        lead.category = self.default_category
+        lead.save()
+        self.assert_counters(1, 0, 1)
+
+        lead.category = None
+        lead.save()
+        self.assert_counters(1, 1, 0)
+
+    def test_saving_unchanged_lead_keeps_counters(self):
+        lead = Lead.objects.get(pk=self.default_lead.pk)
+        lead.first_name = "Jane"
+        lead.save()
+        self.assert_counters(1, 1, 0)
+
+    def test_deleting_lead_decrements_counters(self):
+        Lead.objects.get(pk=self.default_lead.pk).delete()
+        self.assert_counters(0, 0, 0)
+
+    def test_deleting_category_moves_its_leads_to_uncategorised(self):
+        self.default_lead.category = self.default_category
+        self.default_lead.save()
+        self.default_category.refresh_from_db()
+        self.default_category.delete()
+        self.organisation.refresh_from_db()
+        self.assertEqual(self.organisation.uncategorised_lead_count, 1)
+
+    def test_recount_leads_repairs_drift(self):
+        UserProfile.objects.filter(pk=self.organisation.pk).update(
+            lead_count=10, uncategorised_lead_count=5
+        )
+        Category.objects.filter(pk=self.default_category.pk).update(lead_count=3)
+        self.organisation.refresh_from_db()
+
+        self.assertEqual(self.organisation.recount_leads(), 3)
+        self.assert_counters(1, 1, 0)
+
+    def test_recount_leads_reports_no_drift(self):
+        self.assertEqual(self.organisation.recount_leads(), 0)
+
+    def assert_agent_lead_count(self, agent, lead_count):
+        agent.refresh_from_db()
+        self.assertEqual(agent.lead_count, lead_count)
+
+    def test_assigning_leads_moves_them_between_agent_counters(self):
+        other_agent = Agent.objects.create(
+            user=User.objects.create_user(username="otheragent", password="testpass"),
+            organisation=self.organisation,
+        )
+        self.assert_agent_lead_count(self.default_agent, 1)
+        lead = Lead.objects.get(pk=self.default_lead.pk)
+        lead.agent = other_agent
+        lead.save()
+        self.assert_agent_lead_count(self.default_agent, 0)
+        self.assert_agent_lead_count(other_agent, 1)
+
+        lead.agent = None
+        lead.save()
+        self.assert_agent_lead_count(other_agent, 0)
+
+    def test_deleting_lead_decrements_its_agents_counter(self):
+        Lead.objects.get(pk=self.default_lead.pk).delete()
+        self.assert_agent_lead_count(self.default_agent, 0)
+
+    def test_recount_leads_repairs_agent_counters(self):
+        Agent.objects.filter(pk=self.default_agent.pk).update(lead_count=7)
+        self.assertEqual(self.organisation.recount_leads(), 1)
+        self.assert_agent_lead_count(self.default_agent, 1)
+
+
+class TestTenantQuerySets(CRMTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.organisation = self.default_user.userprofile
+        self.agent_user = User.objects.create_user(
+            username="newagentuser", password="testpass", is_organiser=False
+        )
+        self.agent = Agent.objects.create(
+            user=self.agent_user, organisation=self.organisation
+        )
+        self.agent_lead = Lead.objects.create(
+            first_name="Agent",
+            last_name="Lead",
+            organisation=self.organisation,
+            agent=self.agent,
+        )
+        other_user = User.objects.create_user(username="otheruser", password="testpass")
+        Lead.objects.create(
+            first_name="Other", last_name="Lead", organisation=other_user.userprofile
+        )
+        Category.objects.create(name="Other", organisation=other_user.userprofile)
+
+    def test_organiser_sees_all_organisation_leads(self):
+        expected = [self.default_lead, self.agent_lead]
+        self.assertListEqual(list(Lead.objects.for_user(self.default_user)), expected)
+        self.assertListEqual(
+            list(Lead.objects.for_user(self.default_user, self.organisation)), expected
+        )
+
+    def test_agent_only_sees_their_leads(self):
+        self.assertListEqual(
+            list(Lead.objects.for_user(self.agent_user)), [self.agent_lead]
+        )
+        self.assertListEqual(
+            list(Lead.objects.for_user(self.agent_user, self.organisation)),
+            [self.agent_lead],
+        )
+
+    def test_categories_and_agents_are_scoped_to_the_organisation(self):
+        self.assertListEqual(
+            list(Category.objects.for_user(self.agent_user)), [self.default_category]
+        )
+        self.assertListEqual(
+            list(Agent.objects.for_user(self.default_user)),
+            [self.default_agent, self.agent],
+        )
+
+    def test_agent_leads_are_read_from_their_index(self):
+        leads = Lead.objects.for_user(self.agent_user, self.organisation)
+        self.assertNotIn("JOIN", str(leads.query))
+        self.assertIn("lead_org_agent_added_idx", leads.for_list().explain())
+
+    def test_for_list_defers_unlisted_columns(self):
+        lead = Lead.objects.for_list().get(pk=self.agent_lead.pk)
+        self.assertIn("description", lead.get_deferred_fields())
+        self.assertFalse(Lead._meta.get_field("agent").is_cached(lead))
+        with self.assertNumQueries(0):
+            self.assertIsNone(lead.category)
+
+    def test_for_detail_joins_related_rows(self):
+        lead = Lead.objects.for_detail().get(pk=self.agent_lead.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(lead.agent.user.username, "newagentuser")
+            self.assertIsNone(lead.category)
+
+
+class TestCacheVersion(CRMTestCase):
+    def get_version(self):
+        return UserProfile.objects.get(
+            pk=self.default_user.userprofile.pk
+        ).cache_version
+
+    def assert_bumps_version(self, change):
+        before = self.get_version()
+        change()
+        self.assertGreater(self.get_version(), before)
+
+    def test_lead_writes_bump_the_version(self):
+        self.assert_bumps_version(self.default_lead.save)
+        self.assert_bumps_version(self.default_lead.delete)
+
+    def test_category_writes_bump_the_version(self):
+        self.assert_bumps_version(self.default_category.save)
+        self.assert_bumps_version(self.default_category.delete)
+
+    def test_agent_writes_bump_the_version(self):
+        self.assert_bumps_version(self.default_agent.save)
+        self.assert_bumps_version(self.default_agent.delete)
+
+    def test_other_organisations_keep_their_version(self):
+        other_user = User.objects.create_user(username="otheruser", password="testpass")
+        before = other_user.userprofile.cache_version
+        self.default_lead.save()
+        other_user.userprofile.refresh_from_db()
+        self.assertEqual(other_user.userprofile.cache_version, before)
@@ -0,0 +1,69 @@
+from datetime import timedelta
+from smtplib import SMTPException
+from unittest import mock
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from leads.models import QueuedEmail
+from leads.outbox import get_backoff, queue_mail, send_queued_mail
+
+
+def queue_test_mail(**kwargs):
+    return queue_mail(
+        subject=kwargs.get("subject", "Subject"),
+        message="Message",
+        from_email="djcrm@djcrm.com",
+        recipient_list=["general@djcrm.com"],
+    )
+
+
+@override_settings(EMAIL_OUTBOX_RETRY_DELAY=60, EMAIL_OUTBOX_MAX_RETRY_DELAY=600)
+class TestOutbox(TestCase):
+    def test_queue_mail_does_not_send(self):
+        queue_test_mail()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(QueuedEmail.objects.filter(sent_at__isnull=True).count(), 1)
+
+    def test_sends_queued_mail(self):
+        queue_test_mail(subject="First")
+        queue_test_mail(subject="Second")
+
+        self.assertEqual(send_queued_mail(), (2, 0))
+        self.assertEqual([email.subject for email in mail.outbox], ["First", "Second"])
+        self.assertEqual(mail.outbox[0].to, ["general@djcrm.com"])
+        self.assertFalse(QueuedEmail.objects.filter(sent_at__isnull=True).exists())
+        self.assertEqual(send_queued_mail(), (0, 0))
+
+    def test_sends_in_batches(self):
+        for _ in range(3):
+            queue_test_mail()
+        self.assertEqual(send_queued_mail(batch_size=2), (2, 0))
+        self.assertEqual(send_queued_mail(batch_size=2), (1, 0))
+
+    def test_failed_mail_is_retried_later(self):
+        email = queue_test_mail()
+        with mock.patch(
+            "leads.outbox.EmailMessage.send", side_effect=SMTPException("down")
+        ):
+            self.assertEqual(send_queued_mail(), (0, 1))
+
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 1)
+        self.assertIn("down", email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(send_queued_mail(), (0, 0))
+
+        QueuedEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_mail(), (1, 0))
+
+    def test_gives_up_after_max_attempts(self):
+        queue_test_mail()
+        QueuedEmail.objects.update(attempts=5)
+        self.assertEqual(send_queued_mail(max_attempts=5), (0, 0))
+
+    def test_backoff_doubles_up_to_the_limit(self):
+        self.assertEqual(get_backoff(1), timedelta(seconds=60))
+        self.assertEqual(get_backoff(2), timedelta(seconds=120))
+        self.assertEqual(get_backoff(10), timedelta(seconds=600))
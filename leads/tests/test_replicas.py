@@ -0,0 +1,116 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from leads.models import Lead
+from leads.replicas import REPLICA, ReplicaRouter, read_alias, use_replica
+from leads.tests import ViewTestCase
+
+
+class TestReplicaRouter(SimpleTestCase):
+    def test_routes_reads_to_the_replica_inside_use_replica(self):
+        router = ReplicaRouter()
+        with mock.patch.dict(connections.settings, {REPLICA: {}}):
+            with use_replica():
+                self.assertEqual(router.db_for_read(Lead), REPLICA)
+                self.assertIsNone(router.db_for_write(Lead))
+            self.assertIsNone(router.db_for_read(Lead))
+
+    def test_stays_on_the_primary_without_a_replica(self):
+        with use_replica():
+            self.assertIsNone(read_alias.get())
+            self.assertIsNone(ReplicaRouter().db_for_read(Lead))
+
+
+class TestReplicaReads(ViewTestCase):
+    """Two SQLite files: a migrated replica that `replicate()` copies rows to.
+
+    Anything written after `replicate()` only exists on the primary, like a
+    change that hasn't reached a lagging replica yet.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        directory = Path(tempfile.mkdtemp())
+        cls.addClassCleanup(shutil.rmtree, directory)
+        cls.schema_path = directory / "schema.sqlite3"
+        cls.replica_path = directory / "replica.sqlite3"
+        # migrated once, before the alias exists for the test case's checks
+        with cls.replica_at(cls.schema_path):
+            call_command("migrate", database=REPLICA, verbosity=0)
+            cls.close_replica()
+        super().setUpClass()
+
+    @classmethod
+    def replica_at(cls, path):
+        settings = {**connections["default"].settings_dict, "NAME": str(path)}
+        return mock.patch.dict(connections.settings, {REPLICA: settings})
+
+    @classmethod
+    def close_replica(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+
+    def setUp(self):
+        super().setUp()
+        patcher = self.replica_at(self.replica_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.close_replica)
+        self.replicate()
+
+    def replicate(self):
+        connections[REPLICA].close()
+        shutil.copyfile(self.schema_path, self.replica_path)
+        replica = connections[REPLICA]
+        with transaction.atomic(using=REPLICA), replica.constraint_checks_disabled():
+            for model in apps.get_models(include_auto_created=True):
+                # pylint: disable=protected-access
+                manager = model._base_manager
+                table = replica.ops.quote_name(model._meta.db_table)
+                with replica.cursor() as cursor:
+                    # migrate filled in content types and permissions
+                    cursor.execute(f"DELETE FROM {table}")
+                manager.using(REPLICA).bulk_create(manager.using("default"))
+
+    def test_read_only_views_read_from_the_replica(self):
+        lead = Lead.objects.create(
+            first_name="Fresh",
+            last_name="Lead",
+            organisation=self.default_user.userprofile,
+            agent=self.default_agent,
+        )
+        response = self.client.get(reverse("leads:lead-list"))
+        self.assertNotContains(response, "Fresh")
+        response = self.client.get(reverse("leads:lead-detail", args=[lead.pk]))
+        self.assertEqual(response.status_code, 404)
+
+        self.replicate()
+        response = self.client.get(reverse("leads:lead-list"))
+        self.assertContains(response, "Fresh")
+
+    def test_writes_pin_the_session_to_the_primary(self):
+        self.client.post(
+            reverse("leads:category-create"), {"name": "Contacted"}, follow=True
+        )
+        response = self.client.get(reverse("leads:category-list"))
+        self.assertContains(response, "Contacted")
+
+        session = self.client.session
+        session["primary_pinned_until"] = 0
+        session.save()
+        response = self.client.get(reverse("leads:category-list"))
+        self.assertNotContains(response, "Contacted")
+
+    def test_failed_writes_do_not_pin_the_session(self):
+        self.client.post(
+            reverse("leads:lead-delete", args=[self.default_lead.pk + 100])
+        )
+        self.assertNotIn("primary_pinned_until", self.client.session)
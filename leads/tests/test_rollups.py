@@ -0,0 +1,159 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from leads.models import Lead, LeadRollup, UserProfile
+from leads.rollups import chart, get_buckets, read_charts, rollup_leads
+from leads.tests import CRMTestCase
+
+# a Wednesday
+NOON = datetime(2026, 10, 14, 12, tzinfo=dt_timezone.utc)
+
+
+class RollupTestCase(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organisation = self.default_user.userprofile
+        # the default lead, with the default agent, is added on a Monday
+        self.add_lead(NOON - timedelta(days=2), lead=self.default_lead)
+
+    def add_lead(self, date_added, lead=None, **kwargs):
+        if lead is None:
+            lead = Lead.objects.create(
+                first_name="Lead",
+                last_name="Doe",
+                organisation=self.organisation,
+                **kwargs,
+            )
+        Lead.objects.filter(pk=lead.pk).update(date_added=date_added)
+        return lead
+
+    def get_rollups(self, period):
+        return sorted(
+            LeadRollup.objects.filter(
+                organisation=self.organisation, period=period
+            ).values_list("bucket", "category_id", "agent_id", "lead_count"),
+            key=str,
+        )
+
+
+class TestRollupLeads(RollupTestCase):
+    def test_counts_leads_per_bucket_category_and_agent(self):
+        category, agent = self.default_category, self.default_agent
+        self.add_lead(NOON, category=category)
+        self.add_lead(NOON + timedelta(hours=1), category=category)
+        self.add_lead(NOON + timedelta(days=1), agent=agent)
+        # the next week
+        self.add_lead(NOON + timedelta(days=7), agent=agent)
+
+        counted = rollup_leads(self.organisation, NOON + timedelta(days=8))
+
+        self.assertEqual(counted, 5)
+        self.assertEqual(
+            self.get_rollups(LeadRollup.DAY),
+            sorted(
+                [
+                    (date(2026, 10, 12), None, agent.pk, 1),
+                    (date(2026, 10, 14), category.pk, None, 2),
+                    (date(2026, 10, 15), None, agent.pk, 1),
+                    (date(2026, 10, 21), None, agent.pk, 1),
+                ],
+                key=str,
+            ),
+        )
+        self.assertEqual(
+            self.get_rollups(LeadRollup.WEEK),
+            sorted(
+                [
+                    (date(2026, 10, 12), None, agent.pk, 2),
+                    (date(2026, 10, 12), category.pk, None, 2),
+                    (date(2026, 10, 19), None, agent.pk, 1),
+                ],
+                key=str,
+            ),
+        )
+        organisation = UserProfile.objects.get(pk=self.organisation.pk)
+        self.assertEqual(organisation.rolled_up_until, NOON + timedelta(days=8))
+
+    def test_only_reads_leads_added_since_the_high_water_mark(self):
+        rollup_leads(self.organisation, NOON)
+        self.add_lead(NOON + timedelta(hours=1), agent=self.default_agent)
+        self.add_lead(NOON + timedelta(hours=3), agent=self.default_agent)
+
+        self.assertEqual(rollup_leads(self.organisation, NOON + timedelta(hours=2)), 1)
+        self.assertEqual(rollup_leads(self.organisation, NOON + timedelta(hours=4)), 1)
+        self.assertEqual(rollup_leads(self.organisation, NOON + timedelta(hours=4)), 0)
+
+        self.assertEqual(
+            self.get_rollups(LeadRollup.WEEK),
+            [(date(2026, 10, 12), None, self.default_agent.pk, 3)],
+        )
+
+    def test_leaves_other_organisations_alone(self):
+        other_organisation = self.default_agent.user.userprofile
+        Lead.objects.create(
+            first_name="Other", last_name="Lead", organisation=other_organisation
+        )
+        rollup_leads(self.organisation, NOON)
+        self.assertFalse(
+            LeadRollup.objects.filter(organisation=other_organisation).exists()
+        )
+
+    def test_full_rebuild_takes_later_changes_in(self):
+        rollup_leads(self.organisation, NOON)
+        Lead.objects.filter(pk=self.default_lead.pk).update(agent=None)
+
+        rollup_leads(self.organisation, NOON, full=True)
+
+        self.assertEqual(
+            self.get_rollups(LeadRollup.DAY), [(date(2026, 10, 12), None, None, 1)]
+        )
+
+    def test_stops_short_of_leads_still_being_written(self):
+        with mock.patch("django.utils.timezone.now", return_value=NOON):
+            self.add_lead(NOON - timedelta(minutes=1))
+            rollup_leads(self.organisation)
+        self.assertEqual(
+            self.get_rollups(LeadRollup.DAY),
+            [(date(2026, 10, 12), None, self.default_agent.pk, 1)],
+        )
+
+
+class TestReadCharts(RollupTestCase):
+    def test_buckets_start_on_the_day_or_the_monday(self):
+        today = NOON.date()
+        self.assertEqual(
+            get_buckets(LeadRollup.DAY, 2, today),
+            [date(2026, 10, 13), date(2026, 10, 14)],
+        )
+        self.assertEqual(
+            get_buckets(LeadRollup.WEEK, 2, today),
+            [date(2026, 10, 5), date(2026, 10, 12)],
+        )
+
+    def test_lays_counts_out_by_bucket_and_label(self):
+        first, second = date(2026, 10, 13), date(2026, 10, 14)
+        rows = [(first, "b", 1), (first, "a", 2), (second, "a", 4), (first, "a", 1)]
+        self.assertEqual(
+            chart(rows, [first, second]),
+            {
+                "labels": ["a", "b"],
+                "rows": [(first, [3, 1], 4, 100), (second, [4, 0], 4, 100)],
+            },
+        )
+        self.assertEqual(
+            chart([], [first]), {"labels": [], "rows": [(first, [], 0, 0)]}
+        )
+
+    def test_reads_the_rollups_in_one_query(self):
+        self.add_lead(NOON, category=self.default_category)
+        rollup_leads(self.organisation, NOON)
+
+        with mock.patch("django.utils.timezone.localdate", return_value=NOON.date()):
+            with self.assertNumQueries(1):
+                charts = read_charts(self.organisation, LeadRollup.WEEK, 2)
+
+        (_, by_category), (_, by_agent) = charts
+        self.assertEqual(by_category["labels"], ["New", "Uncategorised"])
+        self.assertEqual(by_category["rows"][-1], (date(2026, 10, 12), [1, 1], 2, 100))
+        self.assertEqual(by_agent["labels"], ["Unassigned", "agentuser"])
+        self.assertEqual(by_agent["rows"][0], (date(2026, 10, 5), [0, 0], 0, 0))
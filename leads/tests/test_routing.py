@@ -0,0 +1,180 @@
+from unittest import mock
+
+from django.test import override_settings
+
+from leads.models import Agent, Category, Lead, LeadEvent, User, UserProfile
+from leads.routing import (
+    CategoryAffinityRouter,
+    LeastOpenLeadsRouter,
+    RoundRobinRouter,
+    get_router_class,
+    route_leads,
+    route_new_leads,
+)
+from leads.tests import CRMTestCase
+
+
+class RoutingTestCase(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organisation = self.default_user.userprofile
+        # the default agent already has the default lead
+        self.agents = [self.default_agent] + [
+            Agent.objects.create(
+                user=User.objects.create_user(username=f"agent{i}", password="pass"),
+                organisation=self.organisation,
+            )
+            for i in range(2)
+        ]
+
+    def make_leads(self, count, category=None):
+        return [
+            Lead.objects.create(
+                first_name=f"Lead{i}",
+                last_name="Doe",
+                organisation=self.organisation,
+                category=category,
+            )
+            for i in range(count)
+        ]
+
+    def route(self, router_class, leads):
+        router = router_class(self.organisation)
+        agents = [router.route(lead) for lead in leads]
+        router.save()
+        return agents
+
+
+class TestRouters(RoutingTestCase):
+    def test_round_robin_takes_agents_in_turn_across_batches(self):
+        leads = self.make_leads(4)
+        first = self.route(RoundRobinRouter, leads[:2])
+        second = self.route(RoundRobinRouter, leads[2:])
+        self.assertEqual(first + second, self.agents + self.agents[:1])
+
+    def test_least_open_leads_balances_the_load(self):
+        agents = self.route(LeastOpenLeadsRouter, self.make_leads(5))
+        self.assertEqual(
+            [agent.pk for agent in agents],
+            [self.agents[1].pk, self.agents[2].pk, self.agents[0].pk]
+            + [self.agents[1].pk, self.agents[2].pk],
+        )
+
+    def test_category_affinity_prefers_the_categorys_agents(self):
+        contacted = Category.objects.create(
+            name="Contacted", organisation=self.organisation
+        )
+        self.agents[0].categories.add(self.default_category)
+        self.agents[2].categories.add(self.default_category)
+        leads = self.make_leads(3, self.default_category) + self.make_leads(
+            2, contacted
+        )
+        agents = self.route(CategoryAffinityRouter, leads)
+        # agents[2] starts with no leads, then they take turns
+        self.assertEqual(
+            [agent.pk for agent in agents[:3]],
+            [self.agents[2].pk, self.agents[0].pk, self.agents[2].pk],
+        )
+        # nobody prefers Contacted, so it goes to the least loaded of all
+        self.assertEqual(
+            [agent.pk for agent in agents[3:]], [self.agents[1].pk, self.agents[1].pk]
+        )
+
+    def test_nothing_is_routed_without_agents(self):
+        Agent.objects.all().delete()
+        [lead] = self.make_leads(1)
+        self.assertEqual(self.route(RoundRobinRouter, [lead]), [None])
+        self.assertIsNone(lead.agent)
+
+    def test_strategies_are_named_or_dotted_paths(self):
+        self.assertIs(get_router_class("round-robin"), RoundRobinRouter)
+        self.assertIs(
+            get_router_class("leads.routing.LeastOpenLeadsRouter"),
+            LeastOpenLeadsRouter,
+        )
+        self.assertIsNone(get_router_class())
+
+
+class TestRouteLeads(RoutingTestCase):
+    def test_assigns_the_backlog_in_chunks(self):
+        self.make_leads(5)
+        # per chunk: a savepoint and its release, the locked lookup, the
+        # update, the agent counters, the timeline events, the routing cursor
+        # and the cache version bump; then the agents and the empty last lookup
+        with self.assertNumQueries(3 * 8 + 4):
+            routed = route_leads(self.organisation, RoundRobinRouter, chunk_size=2)
+        self.assertEqual(routed, 5)
+        self.assertFalse(Lead.objects.filter(agent__isnull=True).exists())
+        self.assertEqual(
+            UserProfile.objects.get(pk=self.organisation.pk).recount_leads(), 0
+        )
+        self.organisation.refresh_from_db()
+        self.assertEqual(self.organisation.routing_cursor, self.agents[1].pk)
+
+    def test_records_the_assignments(self):
+        lead = self.make_leads(1)[0]
+        route_leads(self.organisation, RoundRobinRouter)
+        event = LeadEvent.objects.get(lead=lead)
+        self.assertEqual(event.kind, LeadEvent.ASSIGNED)
+        self.assertEqual(event.changes, {"agent": ["", "agentuser"]})
+
+    @override_settings(LEAD_EVENTS_ENABLED=True)
+    def test_publishes_the_assignments_of_each_chunk(self):
+        leads = self.make_leads(3)
+        with self.captureOnCommitCallbacks() as callbacks:
+            route_leads(self.organisation, RoundRobinRouter, chunk_size=2)
+        self.assertEqual(len(callbacks), 2)
+        # each chunk's leads are read with one query
+        with mock.patch("leads.events.broker") as broker:
+            with self.assertNumQueries(2):
+                for callback in callbacks:
+                    callback()
+        published = {
+            event["lead"]["id"]: (
+                event["type"],
+                event["previous_agent_id"],
+                event["lead"]["agent_id"],
+            )
+            for (_, event), _ in broker.publish.call_args_list
+        }
+        self.assertEqual(
+            published,
+            {
+                lead.pk: ("assigned", None, agent.pk)
+                for lead, agent in zip(leads, self.agents)
+            },
+        )
+
+    def test_leaves_other_organisations_alone(self):
+        other_lead = Lead.objects.create(
+            first_name="Other",
+            last_name="Lead",
+            organisation=self.default_agent.user.userprofile,
+        )
+        route_leads(self.organisation, LeastOpenLeadsRouter)
+        other_lead.refresh_from_db()
+        self.assertIsNone(other_lead.agent)
+
+    def test_nothing_is_routed_without_agents(self):
+        Agent.objects.all().delete()
+        self.make_leads(1)
+        self.assertEqual(route_leads(self.organisation, RoundRobinRouter), 0)
+
+
+class TestRouteNewLeads(RoutingTestCase):
+    def make_unsaved_lead(self):
+        return Lead(first_name="New", last_name="Lead", organisation=self.organisation)
+
+    def test_does_nothing_without_a_strategy(self):
+        lead = self.make_unsaved_lead()
+        with self.assertNumQueries(0):
+            route_new_leads([lead], self.organisation)
+        self.assertIsNone(lead.agent)
+
+    @override_settings(LEAD_ROUTING_STRATEGY="least-open-leads")
+    def test_routes_leads_without_an_agent(self):
+        lead, assigned = self.make_unsaved_lead(), self.make_unsaved_lead()
+        assigned.agent = self.default_agent
+        route_new_leads([lead, assigned], self.organisation)
+        self.assertEqual(lead.agent, self.agents[1])
+        self.assertEqual(assigned.agent, self.default_agent)
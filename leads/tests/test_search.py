@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.db import connection
+
+from leads.apps import install_search_index_after_migrate
+from leads.models import Agent, Lead, User
+from leads.search import get_match_expression, install_search_index, search_leads
+from leads.tests import CRMTestCase
+
+
+class TestSearchLeads(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.organisation = self.default_user.userprofile
+        self.by_name = Lead.objects.create(
+            first_name="Ada",
+            last_name="Lovelace",
+            email="ada@engines.com",
+            organisation=self.organisation,
+            agent=self.default_agent,
+        )
+        self.by_description = Lead.objects.create(
+            first_name="Charles",
+            last_name="Babbage",
+            description="Met Ada at the engine demo.",
+            organisation=self.organisation,
+            agent=self.default_agent,
+        )
+
+    def search(self, query, queryset=None):
+        if queryset is None:
+            queryset = Lead.objects.filter(organisation=self.organisation)
+        return list(search_leads(queryset, query))
+
+    def test_matches_any_indexed_field(self):
+        self.assertEqual(self.search("lovelace"), [self.by_name])
+        self.assertEqual(self.search("engines.com"), [self.by_name])
+        self.assertEqual(self.search("demo"), [self.by_description])
+
+    def test_ranks_name_matches_above_description_matches(self):
+        self.assertEqual(self.search("ada"), [self.by_name, self.by_description])
+
+    def test_requires_every_term(self):
+        self.assertEqual(self.search("ada babbage"), [self.by_description])
+
+    def test_empty_query_matches_nothing(self):
+        self.assertEqual(self.search(""), [])
+        self.assertEqual(self.search('"*'), [])
+
+    def test_only_searches_the_given_queryset(self):
+        other_user = User.objects.create_user(username="otheruser", password="testpass")
+        Lead.objects.create(
+            first_name="Ada", last_name="Other", organisation=other_user.userprofile
+        )
+        self.assertEqual(self.search("ada"), [self.by_name, self.by_description])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.by_name.last_name = "King"
+        self.by_name.save()
+        self.assertEqual(self.search("lovelace"), [])
+        self.assertEqual(self.search("king"), [self.by_name])
+
+        Lead.objects.filter(pk=self.by_name.pk).update(last_name="Byron")
+        self.assertEqual(self.search("byron"), [self.by_name])
+
+        self.by_name.delete()
+        self.assertEqual(self.search("byron"), [])
+
+    def test_index_follows_bulk_creates(self):
+        agent = Agent.objects.get(pk=self.default_agent.pk)
+        (lead,) = Lead.objects.bulk_create(
+            [
+                Lead(
+                    first_name="Grace",
+                    last_name="Hopper",
+                    organisation=self.organisation,
+                    agent=agent,
+                )
+            ]
+        )
+        self.assertEqual([found.pk for found in self.search("hopper")], [lead.pk])
+
+    def test_install_is_idempotent(self):
+        install_search_index(connection)
+        self.assertEqual(self.search("lovelace"), [self.by_name])
+
+    def test_only_sqlite_is_reinstalled_after_migrate(self):
+        with mock.patch("leads.apps.install_search_index") as install:
+            with mock.patch.object(connection, "vendor", "postgresql"):
+                install_search_index_after_migrate(using=connection.alias)
+            install.assert_not_called()
+            with mock.patch.object(connection, "vendor", "sqlite"):
+                install_search_index_after_migrate(using=connection.alias)
+            install.assert_called_once_with(connection)
+
+
+class TestGetMatchExpression(CRMTestCase):
+    def test_quotes_terms_so_syntax_is_literal(self):
+        self.assertEqual(get_match_expression('ada OR "lo*'), '"ada" "OR" "lo"')
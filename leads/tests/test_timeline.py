@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from leads.models import Lead, LeadEvent
+from leads.tests import CRMTestCase
+from leads.timeline import change_events, record, snapshot, timeline_page
+
+
+class TestChangeEvents(CRMTestCase):
+    def test_records_nothing_without_changes(self):
+        before = snapshot(self.default_lead)
+        self.assertEqual(change_events(self.default_lead, before, before), [])
+
+    def test_splits_assignments_and_categories_from_other_changes(self):
+        before = snapshot(self.default_lead)
+        self.default_lead.agent = None
+        self.default_lead.category = self.default_category
+        self.default_lead.age = None
+        self.default_lead.description = "Called back."
+
+        events = change_events(
+            self.default_lead, before, snapshot(self.default_lead), "testuser"
+        )
+
+        self.assertEqual(
+            [(event.kind, event.actor, event.changes) for event in events],
+            [
+                (LeadEvent.ASSIGNED, "testuser", {"agent": ["agentuser", ""]}),
+                (LeadEvent.CATEGORISED, "testuser", {"category": ["", "New"]}),
+                (
+                    LeadEvent.UPDATED,
+                    "testuser",
+                    {"age": ["42", ""], "description": ["", "Called back."]},
+                ),
+            ],
+        )
+        self.assertEqual(
+            events[2].get_changes(),
+            [("age", "42", ""), ("description", "", "Called back.")],
+        )
+
+
+class TestTimelinePage(CRMTestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        record(
+            [
+                LeadEvent(
+                    lead=self.default_lead,
+                    kind=LeadEvent.UPDATED,
+                    # two events share each timestamp
+                    created_at=now + timedelta(seconds=i // 2),
+                    changes={"age": [str(i), str(i + 1)]},
+                )
+                for i in range(5)
+            ]
+        )
+        other_lead = Lead.objects.create(
+            first_name="Other",
+            last_name="Lead",
+            organisation=self.default_lead.organisation,
+        )
+        LeadEvent.objects.create(lead=other_lead, kind=LeadEvent.CREATED)
+
+    def test_pages_through_the_leads_events_newest_first(self):
+        seen = []
+        page = timeline_page(self.default_lead.pk, page_size=2)
+        self.assertFalse(page.has_previous())
+        while True:
+            seen += [event.changes["age"][0] for event in page]
+            if not page.has_next():
+                break
+            page = timeline_page(self.default_lead.pk, page.next_cursor, page_size=2)
+            self.assertTrue(page.has_previous())
+        self.assertEqual(seen, ["4", "3", "2", "1", "0"])
+
+    def test_reads_one_page_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(len(timeline_page(self.default_lead.pk, page_size=2)), 2)
+
+    def test_cursors_bound_the_created_at_range(self):
+        cursor = timeline_page(self.default_lead.pk, page_size=2).next_cursor
+        sql = str(timeline_page(self.default_lead.pk, cursor).queryset.query)
+        self.assertIn('"leads_leadevent"."created_at" <=', sql)
+
+    def test_rejects_malformed_cursors(self):
+        with self.assertRaises(ValueError):
+            timeline_page(self.default_lead.pk, "not-a-cursor")
@@ -1,9 +1,16 @@
 from django.urls import reverse, resolve
+from leads.async_views import LeadEventStreamView
 from leads.tests import CRMTestCase
 from leads.views import (
     LeadListView,
+    LeadExportView,
+    LeadSearchView,
+    LeadAutocompleteView,
+    LeadAnalyticsView,
     LeadDetailView,
     LeadCreateView,
+    LeadImportView,
+    LeadBulkUpdateView,
     LeadUpdateView,
     LeadDeleteView,
     CategoryListView,
@@ -19,6 +26,22 @@ class TestUrls(CRMTestCase):
         url = reverse("leads:lead-list")
         self.assertEqual(resolve(url).func.view_class, LeadListView)
 
+    def test_lead_export_url_resolves(self):
+        url = reverse("leads:lead-export")
+        self.assertEqual(resolve(url).func.view_class, LeadExportView)
+
+    def test_lead_search_url_resolves(self):
+        url = reverse("leads:lead-search")
+        self.assertEqual(resolve(url).func.view_class, LeadSearchView)
+
+    def test_lead_autocomplete_url_resolves(self):
+        url = reverse("leads:lead-autocomplete")
+        self.assertEqual(resolve(url).func.view_class, LeadAutocompleteView)
+
+    def test_lead_events_url_resolves(self):
+        url = reverse("leads:lead-events")
+        self.assertEqual(resolve(url).func.view_class, LeadEventStreamView)
+
     def test_lead_detail_url_resolves(self):
         url = reverse("leads:lead-detail", args=[1])
         self.assertEqual(resolve(url).func.view_class, LeadDetailView)
@@ -27,6 +50,18 @@ class TestUrls(CRMTestCase):
         url = reverse("leads:lead-create")
         self.assertEqual(resolve(url).func.view_class, LeadCreateView)
 
+    def test_lead_import_url_resolves(self):
+        url = reverse("leads:lead-import")
+        self.assertEqual(resolve(url).func.view_class, LeadImportView)
+
+    def test_lead_analytics_url_resolves(self):
+        url = reverse("leads:lead-analytics")
+        self.assertEqual(resolve(url).func.view_class, LeadAnalyticsView)
+
+    def test_lead_bulk_update_url_resolves(self):
+        url = reverse("leads:lead-bulk-update")
+        self.assertEqual(resolve(url).func.view_class, LeadBulkUpdateView)
+
     def test_lead_update_url_resolves(self):
         url = reverse("leads:lead-update", args=[1])
         self.assertEqual(resolve(url).func.view_class, LeadUpdateView)
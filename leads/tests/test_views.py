@@ -1,12 +1,25 @@
-from django.test import TestCase
+# pylint: disable=too-many-lines
+import csv
+import io
+from unittest import mock
+
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from leads.models import User, Lead, Agent, Category
+from django.utils import timezone
+from leads import events
+from leads.models import User, Lead, LeadEvent, Agent, Category, QueuedEmail
 from leads.forms import (
     LeadModelForm,
     UserCreationForm,
     CategoryModelForm,
 )
+from leads.rollups import rollup_leads
 from leads.tests import ViewTestCase
+from leads.views import LeadListView
 
 
 class SignupViewTestCase(TestCase):
@@ -36,12 +49,21 @@ class LandingPageViewTestCase(TestCase):
         self.assertTemplateUsed(response, "landing.html")
 
 
-class TestLeadListView(ViewTestCase):
+class TestLeadListView(ViewTestCase):  # pylint: disable=too-many-public-methods
     def test_correct_template_is_used(self):
         response = self.client.get(reverse("leads:lead-list"))
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, "leads/lead_list.html")
 
+    def test_only_opens_the_event_stream_when_enabled(self):
+        response = self.client.get(reverse("leads:lead-list"))
+        self.assertNotContains(response, "data-lead-events-url")
+        self.assertNotContains(response, "lead_events.js")
+        with override_settings(LEAD_EVENTS_ENABLED=True):
+            response = self.client.get(reverse("leads:lead-list"))
+        self.assertContains(response, "data-lead-events-url")
+        self.assertContains(response, "lead_events.js")
+
     def test_correct_leads_are_returned(self):
         initial_leads = list(Lead.objects.all())
 
@@ -149,6 +171,136 @@ class TestLeadListView(ViewTestCase):
             list(response.context["unassigned_leads"]), default_user_unassigned_leads
         )
 
+    def create_assigned_leads(self, count):
+        return [
+            Lead.objects.create(
+                first_name=f"Lead{i}",
+                last_name="Doe",
+                organisation=self.default_user.userprofile,
+                agent=self.default_agent,
+            )
+            for i in range(count)
+        ]
+
+    def test_leads_are_paginated(self):
+        self.create_assigned_leads(LeadListView.paginate_by)
+        response = self.client.get(reverse("leads:lead-list"))
+        self.assertEqual(len(response.context["leads"]), LeadListView.paginate_by)
+        self.assertTrue(response.context["is_paginated"])
+        self.assertTrue(response.context["page_obj"].has_next())
+        self.assertFalse(response.context["page_obj"].has_previous())
+
+    def test_next_cursor_returns_following_page(self):
+        self.create_assigned_leads(LeadListView.paginate_by)
+        all_leads = list(
+            Lead.objects.filter(agent__isnull=False).order_by("date_added", "id")
+        )
+
+        response = self.client.get(reverse("leads:lead-list"))
+        cursor = response.context["page_obj"].next_cursor
+        response = self.client.get(reverse("leads:lead-list"), {"cursor": cursor})
+
+        self.assertListEqual(
+            list(response.context["leads"]), all_leads[LeadListView.paginate_by :]
+        )
+        self.assertFalse(response.context["page_obj"].has_next())
+        self.assertTrue(response.context["page_obj"].has_previous())
+
+    def test_previous_cursor_returns_preceding_page(self):
+        self.create_assigned_leads(LeadListView.paginate_by)
+        response = self.client.get(reverse("leads:lead-list"))
+        first_page = list(response.context["leads"])
+
+        cursor = response.context["page_obj"].next_cursor
+        response = self.client.get(reverse("leads:lead-list"), {"cursor": cursor})
+        cursor = response.context["page_obj"].previous_cursor
+        response = self.client.get(reverse("leads:lead-list"), {"cursor": cursor})
+
+        self.assertListEqual(list(response.context["leads"]), first_page)
+        self.assertFalse(response.context["page_obj"].has_previous())
+
+    def test_cursors_bound_the_date_added_range(self):
+        # a plain range on date_added is what PostgreSQL seeks the index to
+        self.create_assigned_leads(LeadListView.paginate_by)
+
+        def get_page(cursor, bound):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(
+                    reverse("leads:lead-list"), {"cursor": cursor}
+                )
+            [sql] = [query["sql"] for query in queries if "LIMIT 51" in query["sql"]]
+            self.assertIn(f'"leads_lead"."date_added" {bound}', sql)
+            return response.context["page_obj"]
+
+        page = self.client.get(reverse("leads:lead-list")).context["page_obj"]
+        page = get_page(page.next_cursor, ">=")
+        get_page(page.previous_cursor, "<=")
+
+    def test_query_count_does_not_grow_with_assigned_leads(self):
+        def add_rows(count):
+            for i in range(count):
+                Lead.objects.create(
+                    first_name=f"Lead{i}",
+                    last_name="Doe",
+                    organisation=self.default_user.userprofile,
+                    agent=self.default_agent,
+                    category=self.default_category,
+                )
+
+        self.assert_query_count_is_flat(reverse("leads:lead-list"), add_rows)
+
+    def test_query_count_does_not_grow_with_unassigned_leads(self):
+        def add_rows(count):
+            for i in range(count):
+                Lead.objects.create(
+                    first_name=f"Lead{i}",
+                    last_name="Doe",
+                    organisation=self.default_user.userprofile,
+                )
+
+        self.assert_query_count_is_flat(reverse("leads:lead-list"), add_rows)
+
+    def test_repeat_views_are_served_from_the_cache(self):
+        self.client.get(reverse("leads:lead-list"))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("leads:lead-list"))
+        self.assertContains(response, "Test")
+        self.assertFalse([query for query in queries if "leads_lead" in query["sql"]])
+
+    def test_writes_invalidate_the_cache(self):
+        self.client.get(reverse("leads:lead-list"))
+        Lead.objects.create(
+            first_name="Fresh",
+            last_name="Lead",
+            organisation=self.default_user.userprofile,
+            agent=self.default_agent,
+        )
+        self.assertContains(self.client.get(reverse("leads:lead-list")), "Fresh")
+
+    def test_agents_do_not_get_the_organiser_fragment(self):
+        Lead.objects.create(
+            first_name="Unassigned",
+            last_name="Lead",
+            organisation=self.default_user.userprofile,
+        )
+        self.client.get(reverse("leads:lead-list"))
+        self.default_agent.user.is_organiser = False
+        self.default_agent.user.save()
+        self.client.login(username="agentuser", password="testpass")
+        response = self.client.get(reverse("leads:lead-list"))
+        self.assertNotContains(response, "Unassigned leads")
+
+    def test_answers_conditional_gets_until_a_lead_changes(self):
+        def change():
+            self.default_lead.first_name = "Changed"
+            self.default_lead.save()
+
+        self.assert_conditional_get_until(reverse("leads:lead-list"), change)
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse("leads:lead-list"), {"cursor": "invalid"})
+        self.assertEqual(response.status_code, 404)
+
     def test_only_authenticated_users_can_access_this_view(self):
         url = reverse("leads:lead-list")
         self.assert_only_authenticated_users_can_access_this_view(url)
@@ -159,6 +311,154 @@ class TestLeadListView(ViewTestCase):
         self.assert_unauthenticated_users_get_redirected_to(url, redirect_url)
 
 
+class TestLeadExportView(ViewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.async_client.force_login(self.default_user)
+
+    def get_rows(self, response):
+        content = b"".join(response.streaming_content).decode()
+        return list(csv.reader(io.StringIO(content)))
+
+    def test_streams_csv(self):
+        response = self.client.get(reverse("leads:lead-export"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.is_async)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn("attachment", response["Content-Disposition"])
+
+    def test_exports_assigned_leads_of_the_organisation(self):
+        self.default_lead.category = self.default_category
+        self.default_lead.save()
+        Lead.objects.create(
+            first_name="Unassigned",
+            last_name="Doe",
+            organisation=self.default_user.userprofile,
+        )
+        other_user = User.objects.create_user(username="otheruser", password="testpass")
+        Lead.objects.create(
+            first_name="Other",
+            last_name="Doe",
+            organisation=other_user.userprofile,
+            agent=Agent.objects.create(
+                user=User.objects.create_user(username="otheragent"),
+                organisation=other_user.userprofile,
+            ),
+        )
+
+        rows = self.get_rows(self.client.get(reverse("leads:lead-export")))
+        self.assertEqual(rows[0][:2], ["First Name", "Last Name"])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][0], "Test")
+        self.assertEqual(rows[1][5], self.default_category.name)
+        self.assertEqual(rows[1][6], self.default_agent.user.username)
+
+    async def test_streams_asynchronously_under_asgi(self):
+        # a sync iterator would be read whole before anything is sent
+        response = await self.async_client.get(reverse("leads:lead-export"))
+        self.assertTrue(response.is_async)
+        content = b"".join([part async for part in response.streaming_content])
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual([row[0] for row in rows], ["First Name", "Test"])
+
+    def test_agent_only_exports_their_leads(self):
+        agent_user = User.objects.create_user(
+            username="newagentuser", password="testpass", is_organiser=False
+        )
+        agent = Agent.objects.create(
+            user=agent_user, organisation=self.default_user.userprofile
+        )
+        Lead.objects.create(
+            first_name="Mine",
+            last_name="Doe",
+            organisation=self.default_user.userprofile,
+            agent=agent,
+        )
+
+        self.client.login(username="newagentuser", password="testpass")
+        rows = self.get_rows(self.client.get(reverse("leads:lead-export")))
+        self.assertEqual([row[0] for row in rows[1:]], ["Mine"])
+
+    def test_only_authenticated_users_can_access_this_view(self):
+        url = reverse("leads:lead-export")
+        self.assert_only_authenticated_users_can_access_this_view(url)
+
+
+class TestLeadSearchView(ViewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.agent_lead = self.default_lead
+        self.other_agent = Agent.objects.create(
+            user=User.objects.create_user(username="otheragent", password="testpass"),
+            organisation=self.default_user.userprofile,
+        )
+        self.other_agent_lead = Lead.objects.create(
+            first_name="Test",
+            last_name="Other",
+            organisation=self.default_user.userprofile,
+            agent=self.other_agent,
+        )
+
+    def test_correct_template_used(self):
+        response = self.client.get(reverse("leads:lead-search"), {"q": "test"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "leads/lead_search.html")
+
+    def test_returns_matching_leads_of_organisation(self):
+        other_user = User.objects.create_user(username="otheruser", password="testpass")
+        Lead.objects.create(
+            first_name="Test", last_name="Lead", organisation=other_user.userprofile
+        )
+        response = self.client.get(reverse("leads:lead-search"), {"q": "test"})
+        self.assertEqual(
+            list(response.context["leads"]), [self.agent_lead, self.other_agent_lead]
+        )
+        self.assertEqual(response.context["query"], "test")
+
+    def test_agents_only_find_their_own_leads(self):
+        self.client.login(username="agentuser", password="testpass")
+        self.default_agent.user.is_organiser = False
+        self.default_agent.user.save()
+        response = self.client.get(reverse("leads:lead-search"), {"q": "test"})
+        self.assertEqual(list(response.context["leads"]), [self.agent_lead])
+
+    def test_without_query_finds_nothing(self):
+        response = self.client.get(reverse("leads:lead-search"))
+        self.assertEqual(list(response.context["leads"]), [])
+
+    def test_only_authenticated_users_can_access_this_view(self):
+        self.client.logout()
+        url = reverse("leads:lead-search")
+        self.assert_only_authenticated_users_can_access_this_view(url)
+
+
+class TestLeadAutocompleteView(ViewTestCase):
+    def test_returns_matching_leads_as_json(self):
+        response = self.client.get(reverse("leads:lead-autocomplete"), {"q": "te"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "results": [
+                    {
+                        "id": self.default_lead.pk,
+                        "text": "Test Lead",
+                        "email": "",
+                        "url": reverse(
+                            "leads:lead-detail", kwargs={"pk": self.default_lead.pk}
+                        ),
+                    }
+                ]
+            },
+        )
+
+    def test_only_authenticated_users_can_access_this_view(self):
+        self.client.logout()
+        url = reverse("leads:lead-autocomplete")
+        self.assert_only_authenticated_users_can_access_this_view(url)
+
+
 class TestLeadDetailView(ViewTestCase):
     def test_correct_template_is_used(self):
         lead = Lead.objects.create(
@@ -171,6 +471,61 @@ class TestLeadDetailView(ViewTestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, "leads/lead_detail.html")
 
+    def test_answers_conditional_gets_until_the_lead_changes(self):
+        def change():
+            self.default_lead.description = "Called back."
+            self.default_lead.save()
+
+        url = reverse("leads:lead-detail", kwargs={"pk": self.default_lead.pk})
+        self.assert_conditional_get_until(url, change)
+
+    def test_etag_follows_category_renames(self):
+        self.default_lead.category = self.default_category
+        self.default_lead.save()
+
+        def change():
+            self.default_category.name = "Renamed"
+            self.default_category.save()
+
+        url = reverse("leads:lead-detail", kwargs={"pk": self.default_lead.pk})
+        self.assert_conditional_get_until(url, change)
+
+    def test_answers_if_modified_since(self):
+        url = reverse("leads:lead-detail", kwargs={"pk": self.default_lead.pk})
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_shows_the_timeline_a_page_at_a_time(self):
+        LeadEvent.objects.bulk_create(
+            LeadEvent(
+                lead=self.default_lead,
+                kind=LeadEvent.UPDATED,
+                actor="testuser",
+                changes={"age": [str(age), str(age + 1)]},
+            )
+            for age in range(25)
+        )
+        url = reverse("leads:lead-detail", kwargs={"pk": self.default_lead.pk})
+
+        response = self.client.get(url)
+        self.assertEqual(len(response.context["events"]), 20)
+        self.assertContains(response, "Age: 24 &rarr; 25")
+        self.assertNotContains(response, 'id="latest-events"')
+
+        older_url = f"{url}?events={response.context['events'].next_cursor}"
+        self.assertContains(response, 'id="older-events"')
+        response = self.client.get(older_url)
+        self.assertEqual(len(response.context["events"]), 5)
+        self.assertContains(response, "Age: 0 &rarr; 1")
+        self.assertContains(response, 'id="latest-events"')
+        self.assertNotContains(response, 'id="older-events"')
+
+    def test_rejects_malformed_timeline_cursors(self):
+        url = reverse("leads:lead-detail", kwargs={"pk": self.default_lead.pk})
+        response = self.client.get(f"{url}?events=not-a-cursor")
+        self.assertEqual(response.status_code, 404)
+
     def test_correct_lead_is_returned(self):
         lead = Lead.objects.create(
             first_name="John",
@@ -233,6 +588,57 @@ class TestLeadDetailView(ViewTestCase):
         self.assert_unauthenticated_users_get_redirected_to(url, redirect_url)
 
 
+class TestLeadAnalyticsView(ViewTestCase):
+    def test_correct_template_is_used(self):
+        response = self.client.get(reverse("leads:lead-analytics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "leads/lead_analytics.html")
+        self.assertContains(response, "No leads have been rolled up yet.")
+
+    def test_shows_the_rolled_up_leads_per_day_or_week(self):
+        rollup_leads(self.default_user.userprofile, timezone.now())
+        url = reverse("leads:lead-analytics")
+
+        response = self.client.get(url)
+        self.assertEqual(response.context["period"], "day")
+        (_, by_category), (_, by_agent) = response.context["charts"]
+        self.assertEqual(len(by_category["rows"]), 30)
+        self.assertEqual(by_category["rows"][-1][1:3], ([1], 1))
+        self.assertEqual(by_agent["labels"], ["agentuser"])
+
+        response = self.client.get(url, {"period": "week"})
+        (_, by_category), _ = response.context["charts"]
+        self.assertEqual(len(by_category["rows"]), 12)
+        self.assertContains(response, "Week of")
+
+        response = self.client.get(url, {"period": "year"})
+        self.assertEqual(response.context["period"], "day")
+
+    def test_query_count_does_not_grow_with_leads(self):
+        def add_rows(rows):
+            for number in range(rows):
+                Lead.objects.create(
+                    first_name=f"Lead{number}",
+                    last_name="Doe",
+                    organisation=self.default_user.userprofile,
+                    category=self.default_category,
+                )
+            rollup_leads(self.default_user.userprofile, timezone.now())
+
+        add_rows(1)
+        self.assert_query_count_is_flat(reverse("leads:lead-analytics"), add_rows)
+
+    def test_agents_cannot_see_analytics(self):
+        User.objects.create_user(
+            username="newagentuser", password="testpass", is_organiser=False
+        )
+        self.client.login(username="newagentuser", password="testpass")
+        response = self.client.get(reverse("leads:lead-analytics"))
+        self.assertRedirects(
+            response, reverse("leads:lead-list"), fetch_redirect_response=False
+        )
+
+
 class TestLeadCreateView(ViewTestCase):
     def test_correct_template_is_used(self):
         response = self.client.get(reverse("leads:lead-create"))
@@ -243,6 +649,16 @@ class TestLeadCreateView(ViewTestCase):
         response = self.client.get(reverse("leads:lead-create"))
         self.assertIsInstance(response.context["form"], LeadModelForm)
 
+    def test_does_not_render_every_agent(self):
+        for number in range(5):
+            Agent.objects.create(
+                user=User.objects.create_user(username=f"agent{number}"),
+                organisation=self.default_user.userprofile,
+            )
+        response = self.client.get(reverse("leads:lead-create"))
+        self.assertNotContains(response, "agent4")
+        self.assertContains(response, reverse("agents:agent-autocomplete"))
+
     def test_valid_form_data_creates_new_lead(self):
         data = {
             "first_name": "John",
@@ -261,6 +677,72 @@ class TestLeadCreateView(ViewTestCase):
         self.assertRedirects(response, reverse("leads:lead-list"))
         self.assertEqual(Lead.objects.count(), initial_lead_count + 1)
 
+    def test_starts_the_leads_timeline(self):
+        data = {
+            "first_name": "John",
+            "last_name": "Doe",
+            "phone_number": "123456789",
+            "email": "john@does.com",
+        }
+        self.client.post(reverse("leads:lead-create"), data=data)
+        event = Lead.objects.get(first_name="John").events.get()
+        self.assertEqual((event.kind, event.actor), (LeadEvent.CREATED, "testuser"))
+
+    @override_settings(LEAD_EVENTS_ENABLED=True)
+    def test_saves_the_lead_once(self):
+        data = {
+            "first_name": "John",
+            "last_name": "Doe",
+            "phone_number": "123456789",
+            "email": "john@does.com",
+        }
+        with mock.patch.object(events, "broker") as broker:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse("leads:lead-create"), data=data)
+        self.assertEqual(
+            [call.args[1]["type"] for call in broker.publish.call_args_list],
+            ["created"],
+        )
+
+    def test_queues_email_instead_of_sending_it(self):
+        data = {
+            "first_name": "John",
+            "last_name": "Doe",
+            "phone_number": "123456789",
+            "email": "john@does.com",
+        }
+        self.client.post(reverse("leads:lead-create"), data=data)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(QueuedEmail.objects.get().subject, "A lead has been created.")
+
+    def test_rejects_duplicates_of_existing_leads(self):
+        self.default_lead.email = "john@does.com"
+        self.default_lead.save()
+        data = {
+            "first_name": "John",
+            "last_name": "Doe",
+            "phone_number": "123456789",
+            "email": "John@Does.com",
+        }
+        response = self.client.post(reverse("leads:lead-create"), data=data)
+        self.assertContains(
+            response, "Test Lead already has this email address or phone number."
+        )
+        self.assertFalse(Lead.objects.filter(first_name="John").exists())
+
+    @override_settings(LEAD_ROUTING_STRATEGY="least-open-leads")
+    def test_routes_leads_created_without_an_agent(self):
+        data = {
+            "first_name": "John",
+            "last_name": "Doe",
+            "phone_number": "123456789",
+            "email": "john@does.com",
+        }
+        self.client.post(reverse("leads:lead-create"), data=data)
+        self.assertEqual(Lead.objects.get(first_name="John").agent, self.default_agent)
+        self.default_agent.refresh_from_db()
+        self.assertEqual(self.default_agent.lead_count, 2)
+
     def test_invalid_form_data_does_not_create_new_lead(self):
         data = {
             "first_name": "John",
@@ -308,6 +790,128 @@ class TestLeadCreateView(ViewTestCase):
         self.assert_unauthenticated_users_get_redirected_to(url, redirect_url)
 
 
+class TestLeadImportView(ViewTestCase):
+    def upload(self, content, encoding="utf-8"):
+        file = SimpleUploadedFile("leads.csv", content.encode(encoding), "text/csv")
+        return self.client.post(reverse("leads:lead-import"), {"file": file})
+
+    def test_correct_template_is_used(self):
+        response = self.client.get(reverse("leads:lead-import"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "leads/lead_import.html")
+
+    def test_imports_leads_and_reports_errors(self):
+        response = self.upload(
+            "first_name,last_name,email,phone_number,category\n"
+            "John,Doe,john@doe.com,123,New\n"
+            "Jane,Doe,not-an-email,456,\n"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["result"].created, 1)
+        self.assertContains(response, "Line 3: email")
+        lead = Lead.objects.get(first_name="John")
+        self.assertEqual(lead.organisation, self.default_user.userprofile)
+        self.assertEqual(lead.category, self.default_category)
+
+    def test_reports_rows_that_are_not_utf_8(self):
+        response = self.upload(
+            "first_name,last_name,email,phone_number\n"
+            "José,Doe,jose@doe.com,123\n"
+            "John,Doe,john@doe.com,456\n",
+            encoding="latin-1",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Line 2: The row isn&#x27;t valid UTF-8.")
+        self.assertFalse(Lead.objects.filter(email="jose@doe.com").exists())
+        self.assertTrue(Lead.objects.filter(first_name="John").exists())
+
+    def test_agents_cannot_import(self):
+        User.objects.create_user(
+            username="newagentuser", password="testpass", is_organiser=False
+        )
+        self.client.login(username="newagentuser", password="testpass")
+        response = self.upload("first_name,last_name,email,phone_number\n")
+        self.assertRedirects(
+            response, reverse("leads:lead-list"), fetch_redirect_response=False
+        )
+
+    def test_only_authenticated_users_can_access_this_view(self):
+        url = reverse("leads:lead-import")
+        self.assert_only_authenticated_users_can_access_this_view(url)
+
+
+class TestLeadBulkUpdateView(ViewTestCase):
+    def test_correct_template_is_used(self):
+        response = self.client.get(reverse("leads:lead-bulk-update"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "leads/lead_bulk_update.html")
+
+    def test_moves_the_matching_leads(self):
+        Lead.objects.create(
+            first_name="Unassigned",
+            last_name="Lead",
+            organisation=self.default_user.userprofile,
+        )
+        response = self.client.post(
+            reverse("leads:lead-bulk-update"),
+            {"unassigned": "on", "new_category": self.default_category.pk},
+        )
+        self.assertEqual(response.context["updated"], 1)
+        self.assertContains(response, "1 leads were updated.")
+        self.assertEqual(
+            Lead.objects.get(first_name="Unassigned").category, self.default_category
+        )
+        self.default_lead.refresh_from_db()
+        self.assertIsNone(self.default_lead.category)
+
+    def test_rejects_other_organisations_agents(self):
+        other_agent = Agent.objects.create(
+            user=User.objects.create_user(username="otheragent", password="testpass"),
+            organisation=self.default_agent.user.userprofile,
+        )
+        response = self.client.post(
+            reverse("leads:lead-bulk-update"), {"new_agent": other_agent.pk}
+        )
+        self.assertIn("new_agent", response.context["form"].errors)
+        self.default_lead.refresh_from_db()
+        self.assertEqual(self.default_lead.agent, self.default_agent)
+
+    def test_requires_a_change_and_one_agent_filter(self):
+        url = reverse("leads:lead-bulk-update")
+        response = self.client.post(url, {"agent": self.default_agent.pk})
+        self.assertContains(response, "Pick an agent or a category to move them to.")
+        response = self.client.post(
+            url,
+            {
+                "agent": self.default_agent.pk,
+                "unassigned": "on",
+                "new_category": self.default_category.pk,
+            },
+        )
+        self.assertContains(response, "Pick an agent or unassigned leads, not both.")
+
+    def test_requires_a_filter(self):
+        response = self.client.post(
+            reverse("leads:lead-bulk-update"),
+            {"new_category": self.default_category.pk},
+        )
+        self.assertContains(
+            response, "Pick the leads to move by agent, unassigned or category."
+        )
+        self.default_lead.refresh_from_db()
+        self.assertIsNone(self.default_lead.category)
+
+    def test_agents_cannot_move_leads(self):
+        User.objects.create_user(
+            username="newagentuser", password="testpass", is_organiser=False
+        )
+        self.client.login(username="newagentuser", password="testpass")
+        response = self.client.get(reverse("leads:lead-bulk-update"))
+        self.assertRedirects(
+            response, reverse("leads:lead-list"), fetch_redirect_response=False
+        )
+
+
 class TestLeadUpdateView(ViewTestCase):
     def setUp(self):
         super().setUp()
@@ -371,6 +975,55 @@ class TestLeadUpdateView(ViewTestCase):
         lead.refresh_from_db()
         self.assertEqual(lead.first_name, "Jane")
 
+    def test_records_the_changes_on_the_timeline(self):
+        data = {
+            "first_name": "Jane",
+            "last_name": "Doe",
+            "age": 33,
+            "agent": self.default_agent.pk,
+            "description": "Some description",
+            "phone_number": "123456789",
+            "email": "john@does.com",
+        }
+        self.client.post(
+            reverse("leads:lead-update", kwargs={"pk": self.default_lead.pk}), data
+        )
+        self.assertEqual(
+            [
+                (event.kind, event.actor, event.changes)
+                for event in self.default_lead.events.order_by("id")
+            ],
+            [
+                (LeadEvent.ASSIGNED, "testuser", {"agent": ["", "agentuser"]}),
+                (LeadEvent.UPDATED, "testuser", {"first_name": ["John", "Jane"]}),
+            ],
+        )
+
+    def test_existing_duplicates_stay_editable(self):
+        leads = [
+            Lead.objects.create(
+                first_name="John",
+                last_name="Doe",
+                organisation=self.default_user.userprofile,
+                phone_number="123456789",
+                email=email,
+            )
+            for email in ("john@does.com", "johnny@does.com")
+        ]
+        data = {
+            "first_name": "Jane",
+            "last_name": "Doe",
+            "phone_number": "123456789",
+            "email": "johnny@does.com",
+        }
+        url = reverse("leads:lead-update", kwargs={"pk": leads[1].pk})
+        response = self.client.post(url, data=data)
+        self.assertEqual(response.status_code, 302)
+
+        data["email"] = "john@does.com"
+        response = self.client.post(url, data=data)
+        self.assertContains(response, "already has this email address or phone number")
+
     def test_invalid_form_data_does_not_update_lead(self):
         lead = Lead.objects.create(
             first_name="John",
@@ -499,6 +1152,55 @@ class TestCategoryListView(ViewTestCase):
             list(response.context["categories"]), organization_categroy_list
         )
 
+    def test_lead_counts_are_correct(self):
+        self.default_lead.category = self.default_category
+        self.default_lead.save()
+        contacted = Category.objects.create(
+            name="Contacted", organisation=self.default_user.userprofile
+        )
+        Lead.objects.create(
+            first_name="John",
+            last_name="Doe",
+            organisation=self.default_user.userprofile,
+        )
+
+        response = self.client.get(reverse("leads:category-list"))
+        lead_counts = {
+            category: category.lead_count for category in response.context["categories"]
+        }
+        self.assertDictEqual(lead_counts, {self.default_category: 1, contacted: 0})
+        self.assertEqual(response.context["unassigned_lead_count"], 1)
+
+    def test_repeat_views_are_served_from_the_cache(self):
+        self.client.get(reverse("leads:category-list"))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("leads:category-list"))
+        self.assertContains(response, "New")
+        self.assertFalse(
+            [query for query in queries if "leads_category" in query["sql"]]
+        )
+
+    def test_writes_invalidate_the_cache(self):
+        self.client.get(reverse("leads:category-list"))
+        self.default_category.name = "Renamed"
+        self.default_category.save()
+        self.assertContains(self.client.get(reverse("leads:category-list")), "Renamed")
+
+    def test_query_count_does_not_grow_with_categories(self):
+        def add_rows(count):
+            for i in range(count):
+                category = Category.objects.create(
+                    name=f"Category{i}", organisation=self.default_user.userprofile
+                )
+                Lead.objects.create(
+                    first_name=f"Lead{i}",
+                    last_name="Doe",
+                    organisation=self.default_user.userprofile,
+                    category=category,
+                )
+
+        self.assert_query_count_is_flat(reverse("leads:category-list"), add_rows)
+
     def test_only_authenticated_users_can_access_this_view(self):
         url = reverse("leads:category-list")
         self.assert_only_authenticated_users_can_access_this_view(url)
@@ -516,6 +1218,14 @@ class TestCategoryDetailView(ViewTestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, "leads/category_detail.html")
 
+    def test_answers_conditional_gets_until_a_lead_changes(self):
+        def change():
+            self.default_lead.category = self.default_category
+            self.default_lead.save()
+
+        url = reverse("leads:category-detail", kwargs={"pk": self.default_category.pk})
+        self.assert_conditional_get_until(url, change)
+
     def test_correct_leads_are_returned(self):
         self.default_lead.category = self.default_category
         self.default_lead.save()
@@ -0,0 +1,76 @@
+"""The activity timeline of a lead, kept in the append-only `LeadEvent` table.
+
+Every path that changes leads builds its events in memory and inserts them
+with one `bulk_create`. A single change inserts a single row and no row is
+ever updated, so the timeline costs each write one index entry and nothing
+else. The events store the agent and category names as they were, so a page
+of the timeline is one range of `lead_event_timeline_idx` and no joins.
+"""
+from django.db.models import Q
+
+from .forms import LeadModelForm
+from .models import LeadEvent
+from .pagination import KeysetPage, decode_cursor
+
+# the fields edited through `LeadModelForm`, whose changes are recorded
+TRACKED_FIELDS = LeadModelForm.Meta.fields
+KIND_FIELDS = {"agent": LeadEvent.ASSIGNED, "category": LeadEvent.CATEGORISED}
+
+
+def describe(value):
+    """How the timeline shows a field's value."""
+    return "" if value is None else str(value)
+
+
+def snapshot(lead):
+    """The described values of the lead's tracked fields, to diff later."""
+    return {name: describe(getattr(lead, name)) for name in TRACKED_FIELDS}
+
+
+def change_events(lead, before, after, actor=""):
+    """The unsaved events for the changes between two snapshots of `lead`.
+
+    A new agent and a new category get an event each; the other changed
+    fields share one.
+    """
+    changes = {
+        name: [before[name], after[name]]
+        for name in TRACKED_FIELDS
+        if before[name] != after[name]
+    }
+    events = [
+        LeadEvent(lead=lead, kind=kind, actor=actor, changes={name: changes.pop(name)})
+        for name, kind in KIND_FIELDS.items()
+        if name in changes
+    ]
+    if changes:
+        events.append(
+            LeadEvent(lead=lead, kind=LeadEvent.UPDATED, actor=actor, changes=changes)
+        )
+    return events
+
+
+def record(events):
+    """Insert `events` with one query."""
+    if events:
+        LeadEvent.objects.bulk_create(events)
+
+
+def timeline_page(lead_id, cursor=None, page_size=20):
+    """A page of the lead's events, newest first, older than `cursor`.
+
+    Raises `ValueError` if the cursor is malformed.
+    """
+    events = (
+        LeadEvent.objects.filter(lead_id=lead_id)
+        .order_by("-created_at", "-id")
+        .only("created_at", "kind", "actor", "changes")
+    )
+    if cursor:
+        (created_at, pk), _ = decode_cursor(cursor)
+        # the redundant bound is what PostgreSQL can seek the index to
+        events = events.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk),
+            created_at__lte=created_at,
+        )
+    return KeysetPage(events, page_size, bool(cursor), False, "created_at")
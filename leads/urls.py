@@ -1,8 +1,22 @@
+from django.conf import settings
 from django.urls import path
+from .async_views import (
+    AsyncCategoryDetailView,
+    AsyncCategoryListView,
+    AsyncLeadDetailView,
+    AsyncLeadListView,
+    LeadEventStreamView,
+)
 from .views import (
     LeadListView,
+    LeadExportView,
+    LeadSearchView,
+    LeadAutocompleteView,
+    LeadAnalyticsView,
     LeadDetailView,
     LeadCreateView,
+    LeadImportView,
+    LeadBulkUpdateView,
     LeadUpdateView,
     LeadDeleteView,
     CategoryListView,
@@ -13,17 +27,41 @@ from .views import (
 )
 
 
+def read_view(view_class, async_view_class):
+    # the busiest read paths can be served natively under ASGI
+    return (async_view_class if settings.ASYNC_VIEWS else view_class).as_view()
+
+
 app_name = "leads"
 
 urlpatterns = [
-    path("", LeadListView.as_view(), name="lead-list"),
-    path("<int:pk>/", LeadDetailView.as_view(), name="lead-detail"),
+    path("", read_view(LeadListView, AsyncLeadListView), name="lead-list"),
+    path("export/", LeadExportView.as_view(), name="lead-export"),
+    path("search/", LeadSearchView.as_view(), name="lead-search"),
+    path("autocomplete/", LeadAutocompleteView.as_view(), name="lead-autocomplete"),
+    path("events/", LeadEventStreamView.as_view(), name="lead-events"),
+    path("analytics/", LeadAnalyticsView.as_view(), name="lead-analytics"),
+    path(
+        "<int:pk>/",
+        read_view(LeadDetailView, AsyncLeadDetailView),
+        name="lead-detail",
+    ),
     path("create/", LeadCreateView.as_view(), name="lead-create"),
+    path("import/", LeadImportView.as_view(), name="lead-import"),
+    path("bulk-update/", LeadBulkUpdateView.as_view(), name="lead-bulk-update"),
     path("<int:pk>/update/", LeadUpdateView.as_view(), name="lead-update"),
     path("<int:pk>/delete/", LeadDeleteView.as_view(), name="lead-delete"),
-    path("categories/", CategoryListView.as_view(), name="category-list"),
+    path(
+        "categories/",
+        read_view(CategoryListView, AsyncCategoryListView),
+        name="category-list",
+    ),
     path("create-category/", CategoryCreateView.as_view(), name="category-create"),
-    path("categories/<int:pk>/", CategoryDetailView.as_view(), name="category-detail"),
+    path(
+        "categories/<int:pk>/",
+        read_view(CategoryDetailView, AsyncCategoryDetailView),
+        name="category-detail",
+    ),
     path(
         "categories/<int:pk>/update/",
         CategoryUpdateView.as_view(),
@@ -1,25 +1,54 @@
+import csv
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.mail import send_mail
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import (
+    Http404,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.urls import reverse
+from django.utils.functional import cached_property
 from django.views.generic import (
     CreateView,
     DeleteView,
     DetailView,
+    FormView,
     ListView,
     TemplateView,
     UpdateView,
+    View,
 )
 import django.contrib.auth.views as auth_views
 from django.shortcuts import redirect
 
 from agents.mixins import OrganisorAndLoginRequiredMixin
 
+from .autocomplete import autocomplete_leads
+from .bulk import bulk_update_leads
 from .forms import (
     CategoryModelForm,
+    LeadBulkUpdateForm,
+    LeadImportForm,
     LeadModelForm,
     UserCreationForm,
 )
-from .models import Category, Lead, Agent
+from .conditional import ConditionalGetMixin, make_etag
+from .fragments import FragmentCacheMixin
+from .imports import import_leads
+from .models import Category, Lead, LeadEvent, LeadRollup, Agent
+from .outbox import queue_mail
+from .pagination import KeysetPaginationMixin
+from .replicas import PrimaryPinMixin, ReplicaReadMixin
+from .rollups import read_charts
+from .routing import route_new_leads
+from .search import search_leads
+from .timeline import change_events, record, snapshot, timeline_page
 
 
 class SinupView(CreateView):
@@ -46,57 +75,239 @@ class LandingPageView(TemplateView):
     template_name = "landing.html"
 
 
-class LeadListView(LoginRequiredMixin, ListView):
+class LeadListView(
+    LoginRequiredMixin,
+    ReplicaReadMixin,
+    ConditionalGetMixin,
+    FragmentCacheMixin,
+    KeysetPaginationMixin,
+    ListView,
+):
     template_name = "leads/lead_list.html"
     context_object_name = "leads"
+    paginate_by = 50
 
     def get_queryset(self):
-        user = self.request.user
-        if user.is_organiser:
-            queryset = Lead.objects.filter(
-                organisation=user.userprofile, agent__isnull=False
-            )
-        else:
-            queryset = Lead.objects.filter(
-                organisation=user.agent.organisation, agent__isnull=False
-            )
-            queryset = queryset.filter(agent__user=user)
-        return queryset
+        return (
+            Lead.objects.for_user(self.request.user, self.request.organisation)
+            .filter(agent__isnull=False)
+            .for_list()
+        )
+
+    def get_unassigned_queryset(self):
+        return Lead.objects.for_user(
+            self.request.user, self.request.organisation
+        ).filter(agent__isnull=True)
+
+    def get_fragment_cache_key(self):
+        cursor = self.request.GET.get(self.cursor_kwarg, "")
+        # the fragment only points at the event stream when it's enabled
+        events = int(settings.LEAD_EVENTS_ENABLED)
+        return f"{super().get_fragment_cache_key()}:{cursor}:{events}"
+
+    def get_etag(self):
+        # the username is rendered in the navbar
+        return make_etag(
+            "lead-list", self.get_fragment_cache_key(), self.request.user.username
+        )
+
+    def get_last_modified(self):
+        return self.request.organisation.changed_at
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
-        if user.is_organiser:
-            queryset = Lead.objects.filter(
-                organisation=user.userprofile, agent__isnull=True
-            )
-            context.update({"unassigned_leads": queryset})
+        context.update({"lead_events_enabled": settings.LEAD_EVENTS_ENABLED})
+        if self.request.user.is_organiser:
+            # left lazy so a cached fragment never runs it; the template's
+            # `if` fills its result cache and the `for` reuses it
+            context.update({"unassigned_leads": self.get_unassigned_queryset()})
         return context
 
 
-class LeadDetailView(LoginRequiredMixin, DetailView):
+class Echo:  # pylint: disable=too-few-public-methods
+    """A file-like object that hands back what's written to it, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+class LeadExportView(LeadListView):
+    """Stream the leads visible on the lead list as CSV.
+
+    Under ASGI the rows come from an async iterator, read `chunk_size` at a
+    time off the event loop; Django would read a sync one to the end before
+    sending any of it.
+    """
+
+    chunk_size = 2000
+    fields = (
+        ("first_name", "First Name"),
+        ("last_name", "Last Name"),
+        ("age", "Age"),
+        ("email", "Email"),
+        ("phone_number", "Phone Number"),
+        ("category__name", "Category"),
+        ("agent__user__username", "Agent"),
+        ("description", "Description"),
+        ("date_added", "Date Added"),
+    )
+
+    def get(self, request, *args, **kwargs):
+        rows = (
+            self.get_queryset()
+            .order_by("date_added", "id")
+            .values_list(*(field for field, _ in self.fields))
+        )
+        stream = self.astream if isinstance(request, ASGIRequest) else self.stream
+        return StreamingHttpResponse(
+            stream(rows),
+            content_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="leads.csv"'},
+        )
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow([header for _, header in self.fields])
+        for row in rows.iterator(chunk_size=self.chunk_size):
+            yield writer.writerow(row)
+
+    async def astream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow([header for _, header in self.fields])
+        # Django 4.2's aiterator() starts values_list() queries on the event loop
+        rows = rows.iterator(chunk_size=self.chunk_size)
+        read_chunk = sync_to_async(lambda: list(islice(rows, self.chunk_size)))
+        while chunk := await read_chunk():
+            for row in chunk:
+                yield writer.writerow(row)
+
+
+class LeadSearchView(LoginRequiredMixin, ListView):
+    """Ranked full-text search over the leads the user can see."""
+
+    template_name = "leads/lead_search.html"
+    context_object_name = "leads"
+    max_results = 50
+
+    def get_search_query(self):
+        return self.request.GET.get("q", "").strip()
+
+    def get_queryset(self):
+        queryset = Lead.objects.for_user(
+            self.request.user, self.request.organisation
+        ).for_list()
+        return search_leads(queryset, self.get_search_query())[: self.max_results]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update({"query": self.get_search_query()})
+        return context
+
+
+class LeadAutocompleteView(LoginRequiredMixin, View):
+    """JSON typeahead of the leads whose name or email starts with `q`."""
+
+    def get(self, request, *args, **kwargs):
+        results = autocomplete_leads(
+            request.user, request.organisation, request.GET.get("q", "")
+        )
+        return JsonResponse({"results": results})
+
+
+class LeadDetailView(
+    LoginRequiredMixin, ReplicaReadMixin, ConditionalGetMixin, DetailView
+):
     template_name = "leads/lead_detail.html"
     context_object_name = "lead"
+    events_kwarg = "events"
 
     def get_queryset(self):
-        user = self.request.user
-        if user.is_organiser:
-            queryset = Lead.objects.filter(organisation=user.userprofile)
-        else:
-            queryset = Lead.objects.filter(organisation=user.agent.organisation)
-            queryset = queryset.filter(agent__user=user)
-        return queryset
+        return Lead.objects.for_user(
+            self.request.user, self.request.organisation
+        ).for_detail()
+
+    def get_events_cursor(self):
+        return self.request.GET.get(self.events_kwarg, "")
+
+    def get_validators_queryset(self):
+        """What the page shows besides the lead's own columns, in one query."""
+        return (
+            self.get_queryset()
+            .filter(pk=self.kwargs["pk"])
+            .values_list("updated_at", "category__name", "agent__user__username")
+        )
+
+    @cached_property
+    def validators(self):
+        return self.get_validators_queryset().first()
+
+    def get_etag(self):
+        if self.validators is None:
+            return None
+        # every write that records an event also moves updated_at
+        return make_etag(
+            "lead-detail",
+            self.kwargs["pk"],
+            *self.validators,
+            self.request.user.username,
+            self.get_events_cursor(),
+        )
+
+    def get_last_modified(self):
+        if self.validators is None:
+            return None
+        updated_at, changed_at = (
+            self.validators[0],
+            self.request.organisation.changed_at,
+        )
+        # a renamed category or agent only moves the organisation's changed_at
+        return max(updated_at, changed_at) if changed_at else updated_at
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        try:
+            events = timeline_page(self.object.pk, self.get_events_cursor())
+        except ValueError as error:
+            raise Http404("Invalid cursor.") from error
+        context.update({"events": events})
+        return context
+
+
+class LeadAnalyticsView(OrganisorAndLoginRequiredMixin, ReplicaReadMixin, TemplateView):
+    """Leads added per day or week, by category and by agent, from the rollups."""
+
+    template_name = "leads/lead_analytics.html"
+    # how many buckets each period shows
+    bucket_counts = {LeadRollup.DAY: 30, LeadRollup.WEEK: 12}
+
+    def get_period(self):
+        period = self.request.GET.get("period", LeadRollup.DAY)
+        return period if period in self.bucket_counts else LeadRollup.DAY
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        period, organisation = self.get_period(), self.request.organisation
+        context.update(
+            {
+                "period": period,
+                "rolled_up_until": organisation.rolled_up_until,
+                "charts": read_charts(organisation, period, self.bucket_counts[period]),
+            }
+        )
+        return context
 
 
-class LeadCreateView(OrganisorAndLoginRequiredMixin, CreateView):
+class LeadCreateView(OrganisorAndLoginRequiredMixin, PrimaryPinMixin, CreateView):
     template_name = "leads/lead_create.html"
     form_class = LeadModelForm
 
     def get_form(self, form_class=None):
         form = super().get_form(form_class)
-        form.fields["agent"].queryset = Agent.objects.filter(
-            organisation=self.request.user.userprofile
-        )
+        form.fields["agent"].queryset = Agent.objects.for_user(
+            self.request.user, self.request.organisation
+        ).select_related("user")
+        # for the duplicate check
+        form.instance.organisation = self.request.organisation
         return form
 
     def get_success_url(self):
@@ -104,92 +315,169 @@ class LeadCreateView(OrganisorAndLoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         lead = form.save(commit=False)
-        lead.organisation = self.request.user.userprofile
-        lead.save()
-        send_mail(
-            subject="A lead has been created.",
-            message="Go to the site to see the new lead.",
-            from_email="djcrm@djcrm.com",
-            recipient_list=["general@djcrm.com"],
+        lead.organisation = self.request.organisation
+        with transaction.atomic():
+            route_new_leads([lead], lead.organisation)
+            lead.save()
+            record(
+                [
+                    LeadEvent(
+                        lead=lead,
+                        kind=LeadEvent.CREATED,
+                        actor=self.request.user.username,
+                    )
+                ]
+            )
+            queue_mail(
+                subject="A lead has been created.",
+                message="Go to the site to see the new lead.",
+                from_email="djcrm@djcrm.com",
+                recipient_list=["general@djcrm.com"],
+            )
+        # the lead is saved, so the redirect is all that's left of super()
+        self.object = lead  # pylint: disable=attribute-defined-outside-init
+        return HttpResponseRedirect(self.get_success_url())
+
+
+class LeadImportView(OrganisorAndLoginRequiredMixin, PrimaryPinMixin, FormView):
+    template_name = "leads/lead_import.html"
+    form_class = LeadImportForm
+
+    def form_valid(self, form):
+        result = import_leads(
+            form.cleaned_data["file"],
+            self.request.organisation,
+            actor=self.request.user.username,
         )
-        return super().form_valid(form)
+        return self.render_to_response(self.get_context_data(form=form, result=result))
+
 
+class LeadBulkUpdateView(OrganisorAndLoginRequiredMixin, PrimaryPinMixin, FormView):
+    template_name = "leads/lead_bulk_update.html"
+    form_class = LeadBulkUpdateForm
 
-class LeadUpdateView(OrganisorAndLoginRequiredMixin, UpdateView):
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        agents = Agent.objects.for_user(
+            self.request.user, self.request.organisation
+        ).select_related("user")
+        categories = Category.objects.for_user(
+            self.request.user, self.request.organisation
+        )
+        form.fields["agent"].queryset = form.fields["new_agent"].queryset = agents
+        form.fields["category"].queryset = categories
+        form.fields["new_category"].queryset = categories
+        return form
+
+    def form_valid(self, form):
+        updated = bulk_update_leads(
+            Lead.objects.filter(**form.get_filters()),
+            self.request.organisation,
+            form.get_changes(),
+            actor=self.request.user.username,
+        )
+        return self.render_to_response(
+            self.get_context_data(form=form, updated=updated)
+        )
+
+
+class LeadUpdateView(OrganisorAndLoginRequiredMixin, PrimaryPinMixin, UpdateView):
     template_name = "leads/lead_update.html"
     form_class = LeadModelForm
     context_object_name = "lead"
 
     def get_form(self, form_class=None):
         form = super().get_form(form_class)
-        form.fields["agent"].queryset = Agent.objects.filter(
-            organisation=self.request.user.userprofile
-        )
+        form.fields["agent"].queryset = Agent.objects.for_user(
+            self.request.user, self.request.organisation
+        ).select_related("user")
         return form
 
     def get_queryset(self):
-        user = self.request.user
-        return Lead.objects.filter(organisation=user.userprofile)
+        return Lead.objects.for_user(
+            self.request.user, self.request.organisation
+        ).for_detail()
+
+    def get_object(self, queryset=None):
+        lead = super().get_object(queryset)
+        # taken before the form writes the posted values onto the lead
+        self.before = snapshot(lead)  # pylint: disable=attribute-defined-outside-init
+        return lead
+
+    def form_valid(self, form):
+        with transaction.atomic():
+            response = super().form_valid(form)
+            record(
+                change_events(
+                    self.object,
+                    self.before,
+                    snapshot(self.object),
+                    self.request.user.username,
+                )
+            )
+        return response
 
     def get_success_url(self):
         return reverse("leads:lead-detail", kwargs={"pk": self.object.pk})
 
 
-class LeadDeleteView(OrganisorAndLoginRequiredMixin, DeleteView):
+class LeadDeleteView(OrganisorAndLoginRequiredMixin, PrimaryPinMixin, DeleteView):
     template_name = "leads/lead_delete.html"
     context_object_name = "lead"
 
     def get_queryset(self):
-        user = self.request.user
-        return Lead.objects.filter(organisation=user.userprofile)
+        return Lead.objects.for_user(self.request.user, self.request.organisation)
 
     def get_success_url(self):
         return reverse("leads:lead-list")
 
 
-class CategoryListView(LoginRequiredMixin, ListView):
+class CategoryListView(
+    LoginRequiredMixin, ReplicaReadMixin, FragmentCacheMixin, ListView
+):
     template_name = "leads/category_list.html"
     context_object_name = "categories"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
-
-        if user.is_organiser:
-            queryset = Lead.objects.filter(organisation=user.userprofile)
-        else:
-            queryset = Lead.objects.filter(organisation=user.agent.organisation)
-
-        context.update(
-            {"unassigned_lead_count": queryset.filter(category__isnull=True).count()}
-        )
+        organisation = self.request.organisation
+        context.update({"unassigned_lead_count": organisation.uncategorised_lead_count})
         return context
 
     def get_queryset(self):
-        user = self.request.user
-        # initial queryset of leads for the entire organisation
-        if user.is_organiser:
-            queryset = Category.objects.filter(organisation=user.userprofile)
-        else:
-            queryset = Category.objects.filter(organisation=user.agent.organisation)
-        return queryset
+        return Category.objects.for_user(self.request.user, self.request.organisation)
 
 
-class CategoryDetailView(LoginRequiredMixin, DetailView):
+class CategoryDetailView(
+    LoginRequiredMixin, ReplicaReadMixin, ConditionalGetMixin, DetailView
+):
     template_name = "leads/category_detail.html"
     context_object_name = "category"
 
     def get_queryset(self):
-        user = self.request.user
-        # initial queryset of leads for the entire organisation
-        if user.is_organiser:
-            queryset = Category.objects.filter(organisation=user.userprofile)
-        else:
-            queryset = Category.objects.filter(organisation=user.agent.organisation)
-        return queryset
+        return Category.objects.for_user(self.request.user, self.request.organisation)
+
+    def get_etag(self):
+        user, organisation = self.request.user, self.request.organisation
+        return make_etag(
+            "category-detail",
+            self.kwargs["pk"],
+            organisation.pk,
+            organisation.cache_version,
+            user.pk,
+            user.username,
+        )
+
+    def get_last_modified(self):
+        return self.request.organisation.changed_at
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update({"leads": self.object.leads.all()})
+        return context
 
 
-class CategoryCreateView(OrganisorAndLoginRequiredMixin, CreateView):
+class CategoryCreateView(OrganisorAndLoginRequiredMixin, PrimaryPinMixin, CreateView):
     template_name = "leads/category_create.html"
     form_class = CategoryModelForm
 
@@ -198,12 +486,12 @@ class CategoryCreateView(OrganisorAndLoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         category = form.save(commit=False)
-        category.organisation = self.request.user.userprofile
+        category.organisation = self.request.organisation
         category.save()
         return super().form_valid(form)
 
 
-class CategoryUpdateView(OrganisorAndLoginRequiredMixin, UpdateView):
+class CategoryUpdateView(OrganisorAndLoginRequiredMixin, PrimaryPinMixin, UpdateView):
     template_name = "leads/category_update.html"
     form_class = CategoryModelForm
 
@@ -211,26 +499,14 @@ class CategoryUpdateView(OrganisorAndLoginRequiredMixin, UpdateView):
         return reverse("leads:category-list")
 
     def get_queryset(self):
-        user = self.request.user
-        # initial queryset of leads for the entire organisation
-        if user.is_organiser:
-            queryset = Category.objects.filter(organisation=user.userprofile)
-        else:
-            queryset = Category.objects.filter(organisation=user.agent.organisation)
-        return queryset
+        return Category.objects.for_user(self.request.user, self.request.organisation)
 
 
-class CategoryDeleteView(OrganisorAndLoginRequiredMixin, DeleteView):
+class CategoryDeleteView(OrganisorAndLoginRequiredMixin, PrimaryPinMixin, DeleteView):
     template_name = "leads/category_delete.html"
 
     def get_success_url(self):
         return reverse("leads:category-list")
 
     def get_queryset(self):
-        user = self.request.user
-        # initial queryset of leads for the entire organisation
-        if user.is_organiser:
-            queryset = Category.objects.filter(organisation=user.userprofile)
-        else:
-            queryset = Category.objects.filter(organisation=user.agent.organisation)
-        return queryset
+        return Category.objects.for_user(self.request.user, self.request.organisation)
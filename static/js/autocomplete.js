@@ -0,0 +1,42 @@
+// Fills the datalist of every [data-autocomplete-url] box as the user types.
+// Boxes with a [data-autocomplete-value] input store the id of the picked
+// result in it; the others go to the url of the picked result.
+document.querySelectorAll('[data-autocomplete-url]').forEach((box) => {
+    const input = box.querySelector('[data-autocomplete-input]');
+    const value = box.querySelector('[data-autocomplete-value]');
+    const options = box.querySelector('datalist');
+    let results = {};
+    let timer;
+
+    const pick = () => {
+        const result = results[input.value];
+        if (value) {
+            value.value = result ? result.id : '';
+        } else if (result && result.url) {
+            window.location = result.url;
+        }
+    };
+
+    input.addEventListener('input', () => {
+        pick();
+        clearTimeout(timer);
+        timer = setTimeout(async () => {
+            const url = `${box.dataset.autocompleteUrl}?q=${encodeURIComponent(input.value)}`;
+            const response = await fetch(url, { headers: { Accept: 'application/json' } });
+            if (!response.ok) {
+                return;
+            }
+            const data = await response.json();
+            results = {};
+            options.replaceChildren(...data.results.map((result) => {
+                results[result.text] = result;
+                const option = document.createElement('option');
+                option.value = result.text;
+                return option;
+            }));
+            if (value) {
+                pick();
+            }
+        }, 200);
+    });
+});
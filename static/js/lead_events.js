@@ -0,0 +1,63 @@
+// Keeps every [data-lead-events-url] table of leads up to date with the
+// server-sent lead events: a listed lead's row is replaced, or added when the
+// table shows the last page, and an unlisted lead's row is removed.
+document.querySelectorAll('[data-lead-events-url]').forEach((table) => {
+    const body = table.querySelector('tbody');
+    const textCell = 'px-6 py-4 whitespace-nowrap text-sm text-gray-500';
+    const badge = 'px-2 inline-flex text-xs leading-5 font-semibold rounded-full';
+
+    const cell = (className, ...children) => {
+        const td = document.createElement('td');
+        td.className = className;
+        td.append(...children);
+        return td;
+    };
+
+    const element = (tag, className, text) => {
+        const node = document.createElement(tag);
+        node.className = className;
+        node.textContent = text;
+        return node;
+    };
+
+    const makeRow = (lead) => {
+        const row = document.createElement('tr');
+        row.className = 'bg-white';
+        row.dataset.leadId = lead.id;
+        const category = lead.category
+            ? element('span', `${badge} bg-green-100 text-green-800`, lead.category)
+            : element('span', `${badge} bg-gray-100 text-gray-800`, 'Unassigned');
+        const edit = element('a', 'text-indigo-600 hover:text-indigo-900', 'Edit');
+        edit.href = lead.update_url;
+        row.append(
+            cell('px-6 py-4 whitespace-nowrap text-sm font-medium text-gray-900', lead.first_name),
+            cell(textCell, lead.last_name),
+            cell(textCell, lead.age === null ? '' : String(lead.age)),
+            cell(textCell, lead.email),
+            cell(textCell, lead.phone_number),
+            cell('px-6 py-4 whitespace-nowrap', category),
+            cell('px-6 py-4 whitespace-nowrap text-right text-sm font-medium', edit),
+        );
+        return row;
+    };
+
+    const apply = (message) => {
+        const event = JSON.parse(message.data);
+        const row = body.querySelector(`tr[data-lead-id="${event.lead.id}"]`);
+        if (!event.listed) {
+            if (row) {
+                row.remove();
+            }
+        } else if (row) {
+            row.replaceWith(makeRow(event.lead));
+        } else if ('lastPage' in table.dataset) {
+            // rows are in the order leads were added, so new ones go last
+            body.append(makeRow(event.lead));
+        }
+    };
+
+    const source = new EventSource(table.dataset.leadEventsUrl);
+    ['created', 'assigned', 'updated', 'deleted'].forEach((type) => {
+        source.addEventListener(type, apply);
+    });
+});